@@ -0,0 +1,124 @@
+"""
+This example measures the run time and the peak memory of the image source
+model of an L-shaped room with a dense microphone array.
+
+The image sources found by the room engine are handed over to Python without
+copies, so that the peak memory is driven by the size of the image source
+arrays of a single source. The peak memory is the maximum resident set size
+of the process, as reported by the operating system (Unix only).
+
+The arrays are trimmed to the number of image sources before they are handed
+over, so that the heap retained after the run (glibc only) is close to the
+size of the arrays themselves.
+"""
+import argparse
+import ctypes
+import resource
+import sys
+import time
+
+import numpy as np
+
+import pyroomacoustics as pra
+
+
+def retained_memory_mb(room):
+    # the memory held by the image source arrays of all the sources
+    arrays = []
+    for s, source in enumerate(room.sources):
+        arrays += [source.images, source.orders, source.orders_xyz]
+        arrays += [source.walls, source.damping, room.visibility[s]]
+    return sum(a.nbytes for a in arrays) / 2**20
+
+
+class _MallInfo2(ctypes.Structure):
+    _fields_ = [
+        (name, ctypes.c_size_t)
+        for name in [
+            "arena",
+            "ordblks",
+            "smblks",
+            "hblks",
+            "hblkhd",
+            "usmblks",
+            "fsmblks",
+            "uordblks",
+            "fordblks",
+            "keepcost",
+        ]
+    ]
+
+
+def heap_in_use_mb():
+    # the memory allocated on the heap and not freed yet (glibc only)
+    try:
+        mallinfo2 = ctypes.CDLL("libc.so.6").mallinfo2
+    except (OSError, AttributeError):
+        return None
+    mallinfo2.restype = _MallInfo2
+    info = mallinfo2()
+    return (info.uordblks + info.hblkhd) / 2**20
+
+
+def peak_memory_mb():
+    # ru_maxrss is in kilobytes on Linux, but in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak / 2**20
+    else:
+        return peak / 2**10
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Measures the run time and peak memory of the image source model."
+    )
+    parser.add_argument(
+        "--max_order", type=int, default=6, help="The maximum reflection order"
+    )
+    parser.add_argument(
+        "--n_mics", type=int, default=32, help="The number of microphones"
+    )
+    parser.add_argument(
+        "--n_sources", type=int, default=4, help="The number of sources"
+    )
+    parser.add_argument(
+        "--n_threads",
+        type=int,
+        default=1,
+        help="The number of threads of the image source model (0: all cores)",
+    )
+    args = parser.parse_args()
+
+    corners = np.array([[0, 0], [6, 0], [6, 5], [3, 5], [3, 2.5], [0, 2.5]]).T
+    material = pra.Material(energy_absorption=0.2)
+
+    room = pra.Room.from_corners(
+        corners, fs=16000, materials=material, max_order=args.max_order
+    )
+    room.extrude(3.0, materials=material)
+    room.set_ism_options(n_threads=args.n_threads)
+
+    # a circular array in the large part of the room
+    R = pra.circular_2D_array([4.5, 1.2], args.n_mics, 0.0, 0.5)
+    room.add_microphone_array(np.concatenate((R, 1.5 * np.ones((1, args.n_mics)))))
+
+    rng = np.random.RandomState(0)
+    for s in range(args.n_sources):
+        room.add_source([rng.uniform(0.5, 2.5), rng.uniform(0.5, 2.0), 1.7])
+
+    memory_before = peak_memory_mb()
+    heap_before = heap_in_use_mb()
+    start = time.perf_counter()
+    room.image_source_model()
+    elapsed = time.perf_counter() - start
+
+    n_images = sum(source.images.shape[1] for source in room.sources)
+    print(f"Image sources: {n_images}")
+    print(f"Run time: {elapsed:.3f} s")
+    print(f"Peak memory: {peak_memory_mb():.1f} MB (before: {memory_before:.1f} MB)")
+    print(f"Size of the image source arrays: {retained_memory_mb(room):.1f} MB")
+    if heap_before is not None:
+        retained = heap_in_use_mb() - heap_before
+        print(f"Heap retained after the image source model: {retained:.1f} MB")
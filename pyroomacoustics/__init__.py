@@ -44,9 +44,15 @@ Available submodules
 :py:obj:`pyroomacoustics.acoustics`
     Acoustics and psychoacoustics routines, mel-scale, critcal bands, etc.
 
+:py:obj:`pyroomacoustics.batch`
+    Simulation of batches of rooms on a pool of worker processes.
+
 :py:obj:`pyroomacoustics.beamforming`
     Microphone arrays and beamforming routines.
 
+:py:obj:`pyroomacoustics.convolution`
+    Batched convolution of signals with banks of filters.
+
 :py:obj:`pyroomacoustics.directivities`
     Directivity pattern objects and routines.
 
@@ -68,6 +74,9 @@ Available submodules
 :py:obj:`pyroomacoustics.room`
     Abstraction of room and image source model.
 
+:py:obj:`pyroomacoustics.rir_cache`
+    On-disk cache of room impulse responses.
+
 :py:obj:`pyroomacoustics.soundsource`
     Abstraction for a sound source.
 
@@ -122,7 +131,7 @@ import warnings
 
 from . import adaptive, bss, datasets, denoise, doa, experimental
 from . import libroom as libroom
-from . import phase, transform
+from . import batch, convolution, phase, rir_cache, transform
 from .acoustics import *
 from .beamforming import *
 from .directivities import *
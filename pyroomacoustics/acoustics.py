@@ -27,11 +27,12 @@ from __future__ import division
 
 import itertools
 import math
+from collections import OrderedDict
 
 import numpy as np
-from scipy.fftpack import dct
+from scipy.fftpack import dct, next_fast_len
 from scipy.interpolate import interp1d
-from scipy.signal import butter, fftconvolve, sosfiltfilt
+from scipy.signal import butter, sosfiltfilt
 
 from .parameters import constants
 from .transform import stft
@@ -160,6 +161,9 @@ class OctaveBandsFactory(object):
         Use third octave bands if True (default: False)
     """
 
+    # the number of FFT lengths for which the spectra of the filters are kept
+    _max_filter_spectra = 8
+
     def __init__(self, base_frequency=125.0, fs=16000, n_fft=512):
 
         self.base_freq = base_frequency
@@ -175,6 +179,16 @@ class OctaveBandsFactory(object):
 
         self._make_filters()
 
+    def __getstate__(self):
+        # the filters are recomputed rather than pickled
+        state = self.__dict__.copy()
+        del state["filters"], state["_filter_spectra"], state["_delay_tables"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._make_filters()
+
     def get_bw(self):
         """Returns the bandwidth of the bands"""
         return np.array([b2 - b1 for b1, b2 in self.bands])
@@ -183,15 +197,21 @@ class OctaveBandsFactory(object):
         """
         Process a signal x through the filter bank
 
+        The input is transformed only once and the output of all the bands
+        is obtained with one batched inverse transform.
+
         Parameters
         ----------
-        x: ndarray (n_samples)
-            The input signal
+        x: ndarray (..., n_samples)
+            The input signal, or a batch of input signals
+        band: int, optional
+            Only return the output of this band
 
         Returns
         -------
-        ndarray (n_samples, n_bands)
-            The input signal filters through all the bands
+        ndarray (..., n_samples, n_bands)
+            The input signal filters through all the bands, or through the band
+            ``band`` only, in which case the last dimension is dropped
         """
 
         if band is None:
@@ -199,16 +219,128 @@ class OctaveBandsFactory(object):
         else:
             bands = [band]
 
-        output = np.zeros((x.shape[0], len(bands)), dtype=x.dtype)
-
-        for i, b in enumerate(bands):
-            output[:, i] = fftconvolve(x, self.filters[:, b], mode="same")
+        output = np.moveaxis(self._filter(x[..., None, :], bands), -2, -1)
+        output = np.ascontiguousarray(output, dtype=x.dtype)
 
-        if output.shape[1] == 1:
-            return output[:, 0]
+        if output.shape[-1] == 1:
+            return output[..., 0]
         else:
             return output
 
+    def filter_bands(self, x):
+        """
+        Filters every band of a signal that is split in octave bands with the
+        filter of the band. This is equivalent to, but faster than, calling
+        ``analysis(x[..., b, :], band=b)`` for every band ``b``.
+
+        Parameters
+        ----------
+        x: ndarray (..., n_bands, n_samples)
+            The band-wise signal, or a batch of band-wise signals
+
+        Returns
+        -------
+        ndarray (..., n_bands, n_samples)
+            The filtered signals
+        """
+        if x.shape[-2] != self.filters.shape[1]:
+            raise ValueError(
+                "The signal should have one row per octave band "
+                "(expected {}, got {})".format(self.filters.shape[1], x.shape[-2])
+            )
+
+        return self._filter(x, range(self.filters.shape[1])).astype(x.dtype, copy=False)
+
+    def synthesis(self, x):
+        """
+        Filters every band of a signal that is split in octave bands with the
+        filter of the band and sums the bands. The bands are summed in the
+        frequency domain so that a single inverse transform is needed.
+
+        Parameters
+        ----------
+        x: ndarray (..., n_bands, n_samples)
+            The band-wise signal, or a batch of band-wise signals
+
+        Returns
+        -------
+        ndarray (..., n_samples)
+            The full band signals
+        """
+        if x.shape[-2] != self.filters.shape[1]:
+            raise ValueError(
+                "The signal should have one row per octave band "
+                "(expected {}, got {})".format(self.filters.shape[1], x.shape[-2])
+            )
+
+        return self._filter(x, range(self.filters.shape[1]), sum_bands=True).astype(
+            x.dtype, copy=False
+        )
+
+    def _filter(self, x, bands, sum_bands=False):
+        """
+        Filters the rows of x, with shape (..., 1 or len(bands), n_samples), by
+        the filters of the bands, and optionally sums the bands. The output has
+        the same length as the input and is centered like
+        ``fftconvolve(..., mode="same")``.
+        """
+        n_samples = x.shape[-1]
+        filter_len = self.filters.shape[0]
+        n_fft = next_fast_len(n_samples + filter_len - 1)
+
+        spectra = self._get_filter_spectra(n_fft)[list(bands), :]
+        X = np.fft.rfft(x, n=n_fft, axis=-1)
+        if sum_bands:
+            output = np.fft.irfft(np.sum(X * spectra, axis=-2), n=n_fft, axis=-1)
+        else:
+            output = np.fft.irfft(X * spectra, n=n_fft, axis=-1)
+
+        start = (filter_len - 1) // 2
+        return output[..., start : start + n_samples]
+
+    def _get_filter_spectra(self, n_fft):
+        """
+        Returns the spectra of the filters, with shape (n_bands, n_fft // 2 + 1),
+        which are kept for the few most recently used FFT lengths
+        """
+        spectra = self._filter_spectra.pop(n_fft, None)
+        if spectra is None:
+            spectra = np.fft.rfft(self.filters.T, n=n_fft, axis=-1)
+            if len(self._filter_spectra) >= self._max_filter_spectra:
+                # evict the least recently used length
+                self._filter_spectra.popitem(last=False)
+
+        self._filter_spectra[n_fft] = spectra
+        return spectra
+
+    def get_delay_tables(self, fdl, lut_gran=20):
+        """
+        Returns the fractional delay filters of the RIR builders convolved with
+        the filters of the bands, which are computed once for every length and
+        granularity of the sinc interpolation table
+
+        Parameters
+        ----------
+        fdl: int
+            The length of the fractional delay filter (should be odd)
+        lut_gran: int, optional
+            The number of point per unit in the sinc interpolation table
+            (default: 20)
+
+        Returns
+        -------
+        ndarray (lut_gran + 2, n_bands, n_taps + fdl - 1)
+            The tables used by ``build_rir.fast_rir_builder_filtered``
+        """
+        from .build_rir import get_filtered_interpolation_tables
+
+        key = (fdl, lut_gran)
+        if key not in self._delay_tables:
+            self._delay_tables[key] = get_filtered_interpolation_tables(
+                self.filters, fdl, lut_gran
+            )
+        return self._delay_tables[key]
+
     def __call__(self, coeffs=0.0, center_freqs=None, interp_kind="linear", **kwargs):
         """
         Takes as input a list of values with optional corresponding center frequency.
@@ -315,6 +447,12 @@ class OctaveBandsFactory(object):
         # remove the first sample to make them odd-length symmetric filters
         self.filters = filters[1:, :]
 
+        # the spectra of the filters, by FFT length, in order of use
+        self._filter_spectra = OrderedDict()
+
+        # the filters combined with the fractional delays, by table parameters
+        self._delay_tables = {}
+
 
 def critical_bands():
     """
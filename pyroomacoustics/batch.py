@@ -0,0 +1,309 @@
+"""
+Batch simulation
+================
+
+Datasets of room impulse responses are generated by simulating a large number
+of rooms. The :py:class:`~pyroomacoustics.batch.BatchSimulator` computes the
+impulse responses of many rooms on a pool of worker processes that stay alive
+between the tasks. The impulse responses are written by the workers in memory
+mapped ``.npy`` files rather than sent back through pickling. A file is
+removed as soon as it is mapped, so that its disk space is freed when the
+arrays of the result are released. The random
+numbers of every task are derived from a single seed and the index of the task,
+so that the results do not depend on the number of workers or on the order of
+execution.
+
+A room is specified either by a dictionary with the keys ``room_dim``,
+``sources`` (a list of positions), and ``mics`` (an array of shape
+``(dim, n_mics)``), the other keys being keyword arguments of
+:py:class:`~pyroomacoustics.room.ShoeBox`, or by a function that takes a
+``numpy.random.Generator`` and returns a room. The function should be
+importable by the worker processes, e.g., defined at the top level of a module.
+
+.. code-block:: python
+
+    import numpy as np
+    import pyroomacoustics as pra
+
+    def random_room(rng):
+        room_dim = rng.uniform([3, 3, 2.5], [10, 8, 4])
+        room = pra.ShoeBox(room_dim, fs=16000, max_order=10)
+        room.add_source(rng.uniform(0.5, room_dim - 0.5))
+        room.add_microphone(rng.uniform(0.5, room_dim - 0.5))
+        return room
+
+    with pra.batch.BatchSimulator(n_workers=8, seed=42) as simulator:
+        for result in simulator.imap([random_room] * 100000, ordered=False):
+            if result.error is not None:
+                print("Room", result.index, "failed:", result.error)
+                continue
+            rir = result.rirs[0][0]
+"""
+import itertools
+import os
+import shutil
+import tempfile
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from .convolution import _stack_filters
+
+
+class BatchResult(object):
+    """
+    The result of the simulation of one room of a batch
+
+    Attributes
+    ----------
+    index: int
+        The index of the room in the batch
+    rirs: list of list of ndarray or None
+        The room impulse responses in the layout of ``Room.rir``, that are
+        read-only memory mapped arrays, or ``None`` if the simulation failed
+    error: str or None
+        The error message and traceback if the simulation failed
+    """
+
+    def __init__(self, index, rirs=None, error=None):
+        self.index = index
+        self.rirs = rirs
+        self.error = error
+
+
+def _init_worker():
+    # load the compiled extensions once per worker
+    from . import build_rir, libroom  # noqa: F401
+
+
+def _make_room(spec, rng):
+    """Creates the room of a specification"""
+    from .room import ShoeBox
+
+    if callable(spec):
+        return spec(rng)
+
+    kwargs = dict(spec)
+    room_dim = kwargs.pop("room_dim")
+    sources = kwargs.pop("sources", [])
+    mics = kwargs.pop("mics", None)
+
+    room = ShoeBox(room_dim, **kwargs)
+    for loc in sources:
+        room.add_source(loc)
+    if mics is not None:
+        room.add_microphone_array(np.asarray(mics, dtype=float))
+    return room
+
+
+def _simulate_task(path, index, spec, entropy, tail_sequence):
+    """
+    Simulates one room in a worker and writes the impulse responses in a
+    file. Returns the lengths of the responses, or the error message.
+    """
+    try:
+        seed_seq = np.random.SeedSequence(entropy, spawn_key=(index,))
+        rng = np.random.default_rng(seed_seq)
+
+        # some parts of the simulator use the global random state
+        np.random.seed(seed_seq.generate_state(4))
+
+        room = _make_room(spec, rng)
+        room.compute_rir(tail_sequence=tail_sequence, rng=rng)
+
+        lengths = [[len(h) for h in rir_mic] for rir_mic in room.rir]
+        np.save(path, _stack_filters(room.rir))
+        return lengths, None
+
+    except Exception:
+        return None, traceback.format_exc()
+
+
+class BatchSimulator(object):
+    """
+    Computes the room impulse responses of many rooms on a pool of worker
+    processes
+
+    Parameters
+    ----------
+    n_workers: int, optional
+        The number of worker processes (default: one per CPU core)
+    seed: int, optional
+        The seed from which the random numbers of every task are derived. By
+        default, a random seed is drawn, and is available in the ``seed``
+        attribute.
+    directory: str, optional
+        The directory where the impulse responses are written. The files are
+        removed once they are loaded, or, on the systems where mapped files
+        cannot be removed, by :py:meth:`close` if the directory is temporary.
+        By default, a temporary directory is created and deleted by
+        :py:meth:`close`.
+    tail_sequence: str, optional
+        The ``tail_sequence`` argument of ``Room.compute_rir``
+    max_pending: int, optional
+        The maximum number of tasks that are submitted to the workers or whose
+        results wait for the results of earlier tasks to be yielded, so that
+        the specifications can be generated lazily (default: four per worker)
+    """
+
+    def __init__(
+        self,
+        n_workers=None,
+        seed=None,
+        directory=None,
+        tail_sequence="independent",
+        max_pending=None,
+    ):
+
+        if n_workers is None:
+            n_workers = os.cpu_count() or 1
+        if n_workers <= 0:
+            raise ValueError("The number of workers should be positive")
+
+        self.n_workers = n_workers
+        self.seed = np.random.SeedSequence(seed).entropy
+        self.tail_sequence = tail_sequence
+        self.max_pending = 4 * n_workers if max_pending is None else max_pending
+
+        self._own_directory = directory is None
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="pra_batch_")
+        else:
+            os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+        self._n_batches = 0
+        self._executor = ProcessPoolExecutor(n_workers, initializer=_init_worker)
+
+    def imap(self, specs, ordered=True):
+        """
+        Simulates a batch of rooms
+
+        Parameters
+        ----------
+        specs: iterable
+            The specifications of the rooms, that can be generated lazily
+        ordered: bool, optional
+            If ``True`` (default), the results are yielded in the order of the
+            specifications, otherwise, as soon as they are available
+
+        Returns
+        -------
+        generator of BatchResult
+            The results of the simulations of the rooms
+        """
+        batch = self._n_batches
+        self._n_batches += 1
+
+        specs = enumerate(specs)
+        pending = {}
+        done = {}
+        next_index = 0
+
+        while True:
+
+            # keep the workers busy, counting the results that are not yielded
+            n_free = self.max_pending - len(pending) - len(done)
+            for index, spec in itertools.islice(specs, max(n_free, 0)):
+                path = os.path.join(
+                    self.directory, "rirs_{}_{}.npy".format(batch, index)
+                )
+                future = self._executor.submit(
+                    _simulate_task, path, index, spec, self.seed, self.tail_sequence
+                )
+                pending[future] = (index, path)
+
+            if len(pending) == 0:
+                break
+
+            finished, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+
+            for future in finished:
+                index, path = pending.pop(future)
+                result = self._collect(future, index, path)
+
+                if not ordered:
+                    yield result
+                else:
+                    done[index] = result
+
+            while next_index in done:
+                yield done.pop(next_index)
+                next_index += 1
+
+    def map(self, specs):
+        """
+        Simulates a batch of rooms and returns the list of the results in
+        the order of the specifications
+        """
+        return list(self.imap(specs, ordered=True))
+
+    def _collect(self, future, index, path):
+        """Loads the impulse responses written by a worker"""
+        try:
+            lengths, error = future.result()
+        except Exception:
+            # e.g., the specification could not be sent to the worker
+            return BatchResult(index, error=traceback.format_exc())
+
+        if error is not None:
+            return BatchResult(index, error=error)
+
+        rirs = np.load(path, mmap_mode="r")
+        try:
+            # the mapped arrays stay valid until they are released
+            os.remove(path)
+        except OSError:
+            pass
+
+        return BatchResult(
+            index,
+            rirs=[
+                [rirs[m, s, :n] for s, n in enumerate(lengths_mic)]
+                for m, lengths_mic in enumerate(lengths)
+            ],
+        )
+
+    def close(self):
+        """Stops the workers and deletes the temporary directory, if any"""
+        self._executor.shutdown()
+        if self._own_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+
+def simulate_batch(specs, n_workers=None, seed=None, **kwargs):
+    """
+    Computes the room impulse responses of a list of rooms on a pool of
+    worker processes. The impulse responses are loaded in memory.
+
+    Parameters
+    ----------
+    specs: iterable
+        The specifications of the rooms
+    n_workers: int, optional
+        The number of worker processes (default: one per CPU core)
+    seed: int, optional
+        The seed from which the random numbers of every task are derived
+    kwargs:
+        The other arguments of :py:class:`BatchSimulator`
+
+    Returns
+    -------
+    list of BatchResult
+        The results of the simulations of the rooms, in order
+    """
+    with BatchSimulator(n_workers=n_workers, seed=seed, **kwargs) as simulator:
+        results = []
+        for result in simulator.imap(specs):
+            if result.rirs is not None:
+                rirs = result.rirs
+                result.rirs = [[np.array(h) for h in rir_mic] for rir_mic in rirs]
+            results.append(result)
+    return results
@@ -1,20 +1,140 @@
 # cython: infer_types=True
 
+import os
+
 import numpy as np
 cimport cython
+from cython.parallel cimport prange
 
 from libc.math cimport floor, ceil
 
+# The impulse responses can be built in single or double precision
+ctypedef fused rir_t:
+    float
+    double
+
+# The look-up tables of the windowed sinc interpolation, indexed by the
+# length of the fractional delay filter and the granularity of the table
+_interpolation_tables = {}
+
+
+def get_interpolation_tables(fdl, lut_gran):
+    '''
+    Returns the look-up table of the sinc function and the Hann window used
+    to build the fractional delay filters. The tables are computed once for
+    every combination of parameters and then reused.
+
+    Parameters
+    ----------
+    fdl: int
+        The length of the fractional delay filter (should be odd)
+    lut_gran: int
+        The number of point per unit in the sinc interpolation table
+
+    Returns
+    -------
+    sinc_lut: ndarray (double)
+        The samples of the sinc function
+    hann: ndarray (double)
+        The Hann window of length ``fdl``
+    '''
+    key = (fdl, lut_gran)
+
+    if key not in _interpolation_tables:
+        fdl2 = (fdl - 1) // 2
+        lut_size = (fdl + 1) * lut_gran + 1
+        n = np.linspace(-fdl2 - 1, fdl2 + 1, lut_size)
+        sinc_lut = np.sinc(n)
+        hann = np.hanning(fdl)
+        sinc_lut.flags.writeable = False
+        hann.flags.writeable = False
+        _interpolation_tables[key] = (sinc_lut, hann)
+
+    return _interpolation_tables[key]
+
+
+def _get_n_threads(n_threads, n_tasks):
+    # 0 means one thread per core, and there is no point in having more
+    # threads than tasks
+    if n_threads <= 0:
+        n_threads = os.cpu_count() or 1
+    return max(1, min(n_threads, n_tasks))
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef inline int _fractional_delay(
+        double sample_frac,
+        const double [::1] sinc_lut,
+        const double [::1] hann,
+        int lut_gran,
+        double [::1] taps,
+        ) noexcept nogil:
+    '''
+    Computes the windowed sinc filter of a fractional delay by linear
+    interpolation of the look-up table and returns the integer part of the
+    delay
+    '''
+    cdef int time_ip = <int>floor(sample_frac)
+    cdef double time_fp = sample_frac - time_ip
+
+    # do the linear interpolation
+    cdef double x_off_frac = (1. - time_fp) * lut_gran
+    cdef int lut_pos = <int>floor(x_off_frac)
+    cdef double x_off = x_off_frac - lut_pos
+    cdef int k
+
+    for k in range(hann.shape[0]):
+        taps[k] = hann[k] * (sinc_lut[lut_pos]
+                + x_off * (sinc_lut[lut_pos + 1] - sinc_lut[lut_pos]))
+        lut_pos += lut_gran
+
+    return time_ip
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _add_image_sources(
+        rir_t [:] rir,
+        const double [:] time,
+        const double [:] alpha,
+        const int [:] visibility,
+        Py_ssize_t start,
+        Py_ssize_t stop,
+        int fs,
+        const double [::1] sinc_lut,
+        const double [::1] hann,
+        int lut_gran,
+        double [::1] taps,
+        ) noexcept nogil:
+    '''
+    Adds the fractional delays of the image sources ``start`` to ``stop`` to
+    the impulse response
+    '''
+    cdef int fdl = hann.shape[0]
+    cdef int fdl2 = (fdl - 1) // 2
+    cdef int time_ip, k
+    cdef Py_ssize_t i
+
+    for i in range(start, stop):
+        if visibility[i] == 1:
+            time_ip = _fractional_delay(fs * time[i], sinc_lut, hann, lut_gran, taps)
+            for k in range(fdl):
+                rir[time_ip - fdl2 + k] += <rir_t>(alpha[i] * taps[k])
+
+
 @cython.boundscheck(False)
 @cython.wraparound(False)
 def fast_rir_builder(
-        double [:] rir,
-        double [:] time,
-        double [:] alpha,
-        int [:] visibility,
+        rir_t [:] rir,
+        const double [:] time,
+        const double [:] alpha,
+        const int [:] visibility,
         int fs,
         int fdl,
         int lut_gran=20,
+        int n_threads=1,
         ):
     '''
     Fast impulse response builder. This function takes the image source delays
@@ -23,7 +143,7 @@ def fast_rir_builder(
 
     Parameters
     ----------
-    rir: ndarray (double)
+    rir: ndarray (float or double)
         The array to receive the impulse response. It should be filled with
         zero and of the correct size
     time: ndarray (double)
@@ -38,6 +158,10 @@ def fast_rir_builder(
         The length of the fractional delay filter (should be odd)
     lut_gran: int
         The number of point per unit in the sinc interpolation table
+    n_threads: int
+        The number of threads (0 for one per core). The image sources are
+        split among the threads, that build partial impulse responses which
+        are summed at the end.
     '''
 
     fdl2 = (fdl - 1) // 2
@@ -47,38 +171,401 @@ def fast_rir_builder(
     assert time.shape[0] == alpha.shape[0]
     assert fdl % 2 == 1
 
+    if n_times == 0:
+        return
+
     # check the size of the return array
     max_sample = ceil(fs * np.max(time)) + fdl2
     min_sample = floor(fs * np.min(time)) - fdl2
     assert min_sample >= 0
     assert max_sample < rir.shape[0]
 
-    # create a look-up table of the sinc function and
-    # then use linear interpolation
-    cdef float delta = 1. / lut_gran
-    cdef int lut_size = (fdl + 1) * lut_gran + 1
-    n = np.linspace(-fdl2-1, fdl2 + 1, lut_size)
+    sinc_lut_arr, hann_arr = get_interpolation_tables(fdl, lut_gran)
+    cdef const double [::1] sinc_lut = sinc_lut_arr
+    cdef const double [::1] hann = hann_arr
 
-    cdef double [:] sinc_lut = np.sinc(n)
-    cdef double [:] hann = np.hanning(fdl)
-    cdef int lut_pos, i, f, time_ip
-    cdef float x_off, x_off_frac, sample_frac
+    cdef int n_chunks = _get_n_threads(n_threads, n_times)
+    cdef double [:, ::1] taps = np.zeros((n_chunks, fdl))
+    cdef rir_t [:, ::1] partial
+    cdef Py_ssize_t c, n, n_samples = rir.shape[0]
 
-    for i in range(n_times):
-        if visibility[i] == 1:
-            # decompose integer and fractional delay
-            sample_frac = fs * time[i]
-            time_ip = int(floor(sample_frac))
-            time_fp = sample_frac - time_ip
-
-            # do the linear interpolation
-            x_off_frac = (1. - time_fp) * lut_gran
-            lut_gran_off = int(floor(x_off_frac))
-            x_off = (x_off_frac - lut_gran_off)
-            lut_pos = lut_gran_off
-            k = 0
-            for f in range(-fdl2, fdl2+1):
-                rir[time_ip + f] += alpha[i] * hann[k] * (sinc_lut[lut_pos] 
-                        + x_off * (sinc_lut[lut_pos+1] - sinc_lut[lut_pos]))
-                lut_pos += lut_gran
-                k += 1
+    if n_chunks == 1:
+        with nogil:
+            _add_image_sources[rir_t](
+                rir, time, alpha, visibility, 0, n_times,
+                fs, sinc_lut, hann, lut_gran, taps[0],
+            )
+        return
+
+    # every thread builds the response of a chunk of the image sources
+    if rir_t is float:
+        partial = np.zeros((n_chunks, n_samples), dtype=np.float32)
+    else:
+        partial = np.zeros((n_chunks, n_samples), dtype=np.float64)
+
+    for c in prange(n_chunks, nogil=True, num_threads=n_chunks, schedule="static"):
+        _add_image_sources[rir_t](
+            partial[c], time, alpha, visibility,
+            (c * n_times) // n_chunks, ((c + 1) * n_times) // n_chunks,
+            fs, sinc_lut, hann, lut_gran, taps[c],
+        )
+
+    for n in prange(n_samples, nogil=True, num_threads=n_chunks, schedule="static"):
+        for c in range(n_chunks):
+            rir[n] += partial[c, n]
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def fast_rir_builder_multi(
+        rir_t [:, :, ::1] rir,
+        const double [:, ::1] time,
+        const double [:, :, ::1] alpha,
+        const int [:, ::1] visibility,
+        int fs,
+        int fdl,
+        int lut_gran=20,
+        int n_threads=1,
+        ):
+    '''
+    Fast impulse response builder for all the microphones and frequency bands
+    of one source. This is equivalent to calling ``fast_rir_builder`` for
+    every microphone and band, but the fractional delay filter of every
+    image source is only computed once for all the bands.
+
+    Parameters
+    ----------
+    rir: ndarray (float or double), shape (n_mics, n_bands, n_samples)
+        The array to receive the impulse responses. It should be filled with
+        zero and of the correct size
+    time: ndarray (double), shape (n_mics, n_images)
+        The array of delays for the image sources
+    alpha: ndarray (double), shape (n_mics, n_bands, n_images)
+        The array of attenuations for the image sources
+    visibility: ndarray (int), shape (n_mics, n_images)
+        Contains 1 if the image source is visible, 0 if not
+    fs: int
+        The sampling frequency
+    fdl: int
+        The length of the fractional delay filter (should be odd)
+    lut_gran: int
+        The number of point per unit in the sinc interpolation table
+    n_threads: int
+        The number of threads (0 for one per core). The microphones are
+        split among the threads.
+    '''
+
+    fdl2 = (fdl - 1) // 2
+    n_mics = rir.shape[0]
+    n_bands = rir.shape[1]
+    n_times = time.shape[1]
+
+    assert time.shape[0] == n_mics and visibility.shape[0] == n_mics
+    assert alpha.shape[0] == n_mics and alpha.shape[1] == n_bands
+    assert time.shape[1] == visibility.shape[1]
+    assert time.shape[1] == alpha.shape[2]
+    assert fdl % 2 == 1
+
+    if n_times == 0 or n_mics == 0:
+        return
+
+    # check the size of the return array
+    max_sample = ceil(fs * np.max(time)) + fdl2
+    min_sample = floor(fs * np.min(time)) - fdl2
+    assert min_sample >= 0
+    assert max_sample < rir.shape[2]
+
+    sinc_lut_arr, hann_arr = get_interpolation_tables(fdl, lut_gran)
+    cdef const double [::1] sinc_lut = sinc_lut_arr
+    cdef const double [::1] hann = hann_arr
+
+    # one filter per microphone so that the threads do not share them
+    cdef double [:, ::1] taps = np.zeros((n_mics, fdl))
+    cdef int m, b, k, time_ip, offset
+    cdef Py_ssize_t i
+    cdef double a
+
+    n_threads = _get_n_threads(n_threads, n_mics)
+
+    for m in prange(n_mics, nogil=True, num_threads=n_threads, schedule="dynamic"):
+        for i in range(n_times):
+            if visibility[m, i] == 1:
+                time_ip = _fractional_delay(
+                    fs * time[m, i], sinc_lut, hann, lut_gran, taps[m]
+                )
+                offset = time_ip - fdl2
+
+                # the same filter is used for all the bands
+                for b in range(n_bands):
+                    a = alpha[m, b, i]
+                    if a == 0.:
+                        continue
+                    for k in range(fdl):
+                        rir[m, b, offset + k] += <rir_t>(a * taps[m, k])
+
+
+def get_filtered_interpolation_tables(filters, fdl, lut_gran):
+    '''
+    Returns the fractional delay filters of all the positions of the sinc
+    interpolation table convolved with band-pass filters. A fractional delay
+    filter of ``fast_rir_builder`` is the linear interpolation of two
+    consecutive positions of the table, so that it is also the case for its
+    convolution with any of the band-pass filters.
+
+    Parameters
+    ----------
+    filters: ndarray (double), shape (n_taps, n_bands)
+        The band-pass filters, with an odd number of taps
+    fdl: int
+        The length of the fractional delay filter (should be odd)
+    lut_gran: int
+        The number of point per unit in the sinc interpolation table
+
+    Returns
+    -------
+    ndarray (double), shape (lut_gran + 2, n_bands, n_taps + fdl - 1)
+        The filters, indexed by the position in the sinc table and the band
+    '''
+    sinc_lut, hann = get_interpolation_tables(fdl, lut_gran)
+
+    positions = np.arange(lut_gran + 2)[:, None] + lut_gran * np.arange(fdl)
+    delay_filters = hann * sinc_lut[positions]
+
+    tables = np.zeros((lut_gran + 2, filters.shape[1], filters.shape[0] + fdl - 1))
+    for p, delay_filter in enumerate(delay_filters):
+        for b, band_filter in enumerate(filters.T):
+            tables[p, b] = np.convolve(delay_filter, band_filter)
+
+    return tables
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def fast_rir_builder_filtered(
+        rir_t [:, ::1] rir,
+        const double [:, ::1] time,
+        const double [:, :, ::1] alpha,
+        const int [:, ::1] visibility,
+        const double [:, :, ::1] tables,
+        int fs,
+        int fdl,
+        int lut_gran=20,
+        int n_threads=1,
+        ):
+    '''
+    Fast impulse response builder for all the microphones of one source,
+    where the image sources have band-wise attenuations and the bands are
+    summed. This is equivalent to calling ``fast_rir_builder_multi``,
+    filtering every band by its band-pass filter with the output centered
+    like ``fftconvolve(..., mode="same")``, and summing the bands. Instead,
+    a single filter that combines the fractional delay and the band-pass
+    filters weighted by the attenuations is added for every image source,
+    so that a single impulse response is built per microphone.
+
+    Parameters
+    ----------
+    rir: ndarray (float or double), shape (n_mics, n_samples)
+        The array to receive the impulse responses. It should be filled with
+        zero and of the correct size
+    time: ndarray (double), shape (n_mics, n_images)
+        The array of delays for the image sources
+    alpha: ndarray (double), shape (n_mics, n_bands, n_images)
+        The array of attenuations for the image sources
+    visibility: ndarray (int), shape (n_mics, n_images)
+        Contains 1 if the image source is visible, 0 if not
+    tables: ndarray (double), shape (lut_gran + 2, n_bands, n_filter)
+        The fractional delay filters convolved with the band-pass filters, as
+        returned by ``get_filtered_interpolation_tables``
+    fs: int
+        The sampling frequency
+    fdl: int
+        The length of the fractional delay filter (should be odd)
+    lut_gran: int
+        The number of point per unit in the sinc interpolation table
+    n_threads: int
+        The number of threads (0 for one per core). The microphones are
+        split among the threads.
+    '''
+
+    cdef int fdl2 = (fdl - 1) // 2
+    cdef Py_ssize_t n_mics = rir.shape[0]
+    cdef Py_ssize_t n_samples = rir.shape[1]
+    cdef Py_ssize_t n_bands = alpha.shape[1]
+    cdef Py_ssize_t n_times = time.shape[1]
+    cdef Py_ssize_t n_filter = tables.shape[2]
+
+    assert time.shape[0] == n_mics and visibility.shape[0] == n_mics
+    assert alpha.shape[0] == n_mics and alpha.shape[2] == n_times
+    assert visibility.shape[1] == n_times
+    assert tables.shape[0] == lut_gran + 2 and tables.shape[1] == n_bands
+    assert fdl % 2 == 1
+    assert n_filter % 2 == 1
+
+    if n_times == 0 or n_mics == 0:
+        return
+
+    # the center of the band-pass filters, removed to center the output
+    cdef Py_ssize_t center = (n_filter - fdl) // 2
+
+    cdef Py_ssize_t m, i, b, k, k_min, k_max, offset, lut_pos
+    cdef double sample_frac, x_off_frac, x_off, a, a_pos, a_next
+    cdef int time_ip
+
+    n_threads = _get_n_threads(n_threads, n_mics)
+
+    for m in prange(n_mics, nogil=True, num_threads=n_threads, schedule="dynamic"):
+        for i in range(n_times):
+            if visibility[m, i] != 1:
+                continue
+
+            # the same interpolation as in _fractional_delay, applied to the
+            # filtered tables
+            sample_frac = fs * time[m, i]
+            time_ip = <int>floor(sample_frac)
+            x_off_frac = (1. - (sample_frac - time_ip)) * lut_gran
+            lut_pos = <Py_ssize_t>floor(x_off_frac)
+            x_off = x_off_frac - lut_pos
+
+            offset = time_ip - fdl2 - center
+            k_min = 0
+            if offset < 0:
+                k_min = -offset
+            k_max = n_filter
+            if offset + k_max > n_samples:
+                k_max = n_samples - offset
+            if k_min >= k_max:
+                continue
+
+            for b in range(n_bands):
+                a = alpha[m, b, i]
+                if a == 0.:
+                    continue
+                a_next = a * x_off
+                a_pos = a - a_next
+                for k in range(k_min, k_max):
+                    rir[m, offset + k] += <rir_t>(
+                        a_pos * tables[lut_pos, b, k]
+                        + a_next * tables[lut_pos + 1, b, k]
+                    )
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def fast_trajectory_render(
+        double [:, ::1] out,
+        const double [:, ::1] signals,
+        const double [::1] key_samples,
+        const double [:, :, ::1] delays,
+        const double [:, :, :, ::1] gains,
+        int fdl,
+        int lut_gran=20,
+        int n_threads=1,
+        ):
+    '''
+    Renders the signal of a moving source at moving microphones. The delays
+    and gains of the image sources are given at keyframes and interpolated
+    linearly in between, so that every output sample is a sum of fractional
+    delays of the source signal with time-varying delays and gains. Before
+    the first keyframe and after the last one, the delays and gains are those
+    of the closest keyframe.
+
+    Parameters
+    ----------
+    out: ndarray (double), shape (n_mics, n_samples)
+        The array to which the signals at the microphones are added
+    signals: ndarray (double), shape (n_bands, n_signal)
+        The frequency bands of the source signal
+    key_samples: ndarray (double), shape (n_keys,)
+        The increasing times of the keyframes, in samples
+    delays: ndarray (double), shape (n_mics, n_images, n_keys)
+        The delays of the image sources at the keyframes, in samples. As for
+        ``fast_rir_builder``, the delays should include the half length of
+        the fractional delay filter.
+    gains: ndarray (double), shape (n_mics, n_images, n_keys, n_bands)
+        The gains of the image sources in every band at the keyframes
+    fdl: int
+        The length of the fractional delay filter (should be odd)
+    lut_gran: int
+        The number of point per unit in the sinc interpolation table
+    n_threads: int
+        The number of threads (0 for one per core). The microphones are
+        split among the threads.
+    '''
+
+    cdef int fdl2 = (fdl - 1) // 2
+    cdef Py_ssize_t n_mics = out.shape[0]
+    cdef Py_ssize_t n_samples = out.shape[1]
+    cdef Py_ssize_t n_bands = signals.shape[0]
+    cdef Py_ssize_t n_signal = signals.shape[1]
+    cdef Py_ssize_t n_keys = key_samples.shape[0]
+    cdef Py_ssize_t n_images = delays.shape[1]
+
+    assert fdl % 2 == 1
+    assert n_keys > 0
+    assert delays.shape[0] == n_mics and gains.shape[0] == n_mics
+    assert delays.shape[2] == n_keys and gains.shape[2] == n_keys
+    assert gains.shape[1] == n_images and gains.shape[3] == n_bands
+
+    if n_images == 0 or n_mics == 0 or n_samples == 0:
+        return
+
+    sinc_lut_arr, hann_arr = get_interpolation_tables(fdl, lut_gran)
+    cdef const double [::1] sinc_lut = sinc_lut_arr
+    cdef const double [::1] hann = hann_arr
+
+    cdef double [:, ::1] taps = np.zeros((n_mics, fdl))
+    cdef Py_ssize_t m, i, n, j, b, k, k_min, k_max, idx0
+    cdef double u, d, g, acc
+    cdef int time_ip
+
+    n_threads = _get_n_threads(n_threads, n_mics)
+
+    for m in prange(n_mics, nogil=True, num_threads=n_threads, schedule="dynamic"):
+        for i in range(n_images):
+
+            # the keyframe interval of the current sample
+            j = 0
+
+            for n in range(n_samples):
+
+                while j < n_keys - 1 and n >= key_samples[j + 1]:
+                    j = j + 1
+
+                # the interpolation weight of the next keyframe
+                if j == n_keys - 1 or n <= key_samples[j]:
+                    u = 0.
+                else:
+                    u = (n - key_samples[j]) / (key_samples[j + 1] - key_samples[j])
+
+                if u == 0.:
+                    d = delays[m, i, j]
+                else:
+                    d = (1. - u) * delays[m, i, j] + u * delays[m, i, j + 1]
+
+                # the input samples that contribute to this output sample
+                idx0 = n - <Py_ssize_t>floor(d) + fdl2
+                k_min = idx0 - n_signal + 1
+                if k_min < 0:
+                    k_min = 0
+                k_max = idx0 + 1
+                if k_max > fdl:
+                    k_max = fdl
+                if k_min >= k_max:
+                    continue
+
+                time_ip = _fractional_delay(d, sinc_lut, hann, lut_gran, taps[m])
+
+                for b in range(n_bands):
+                    if u == 0.:
+                        g = gains[m, i, j, b]
+                    else:
+                        g = (1. - u) * gains[m, i, j, b] + u * gains[m, i, j + 1, b]
+                    if g == 0.:
+                        continue
+
+                    acc = 0.
+                    for k in range(k_min, k_max):
+                        acc = acc + taps[m, k] * signals[b, idx0 - k]
+                    out[m, n] += g * acc
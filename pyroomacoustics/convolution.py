@@ -0,0 +1,537 @@
+"""
+Convolution of many signals with a bank of filters
+==================================================
+
+This module implements the convolution of a set of signals with one filter per
+pair of signal and output channel, as needed to simulate the signals of the
+microphones of a room from the signals of the sources and the room impulse
+responses.
+
+All the signals and all the filters are transformed in a few batched FFTs of
+the same, fast, length, and the products are summed over the signals directly
+in the frequency domain. When the signals are much longer than the filters,
+the convolution is done block by block with the overlap-save method so that
+the memory does not grow with the length of the signals.
+
+The FFTs use ``scipy.fft`` when it is available, which allows to split them
+among several threads with the ``workers`` argument, and otherwise fall back
+to ``numpy.fft``.
+
+Example
+-------
+
+.. code-block:: python
+
+    import numpy as np
+    import pyroomacoustics as pra
+
+    signals = np.random.randn(2, 16000)  # two sources
+    filters = np.random.randn(4, 2, 1000)  # four channels
+
+    # the contribution of every source at every channel
+    premix = pra.convolution.fft_convolve(signals, filters)  # (2, 4, 16999)
+
+    # the mix of the sources at every channel
+    mix = pra.convolution.fft_convolve(signals, filters, sum_signals=True)  # (4, 16999)
+"""
+import time
+
+import numpy as np
+from scipy.fftpack import next_fast_len
+
+try:
+    import scipy.fft as scipy_fft
+
+    has_scipy_fft = True
+except ImportError:
+    has_scipy_fft = False
+
+# the overlap-save method is used when the signals are this many times
+# longer than the filters
+overlap_save_ratio = 16
+
+
+def _rfft(x, n, workers):
+    if has_scipy_fft:
+        return scipy_fft.rfft(x, n=n, axis=-1, workers=workers)
+    else:
+        return np.fft.rfft(x, n=n, axis=-1)
+
+
+def _irfft(x, n, workers):
+    if has_scipy_fft:
+        return scipy_fft.irfft(x, n=n, axis=-1, workers=workers)
+    else:
+        return np.fft.irfft(x, n=n, axis=-1)
+
+
+def fft_convolve(
+    signals, filters, sum_signals=False, method="auto", block_size=None, workers=None
+):
+    """
+    Convolves every signal with the filters of all the output channels.
+
+    Parameters
+    ----------
+    signals: ndarray (n_signals, n_samples)
+        The input signals
+    filters: ndarray (n_channels, n_signals, n_taps)
+        The filters from every signal to every output channel
+    sum_signals: bool, optional
+        If ``True``, the contributions of all the signals to an output channel
+        are summed (default: False)
+    method: str, optional
+        ``"direct"`` to transform the whole signals at once, ``"overlap-save"``
+        to process them block by block, or ``"auto"`` (default) to use the
+        overlap-save method when the signals are much longer than the filters
+    block_size: int, optional
+        The size of the FFT used by the overlap-save method. It should be
+        larger than the filters. By default, a fast size about four times the
+        length of the filters is used.
+    workers: int, optional
+        The number of threads used to compute the FFTs, as in ``scipy.fft``
+        (default: one)
+
+    Returns
+    -------
+    ndarray (n_signals, n_channels, n_samples + n_taps - 1)
+        The signals convolved with the filters, or an array of shape
+        ``(n_channels, n_samples + n_taps - 1)`` when ``sum_signals`` is
+        ``True``
+    """
+
+    signals = np.asarray(signals)
+    filters = np.asarray(filters)
+
+    if signals.ndim != 2 or filters.ndim != 3:
+        raise ValueError("The signals should be a 2D array and the filters a 3D array")
+    if filters.shape[1] != signals.shape[0]:
+        raise ValueError("There should be one filter per signal and channel")
+
+    if method == "auto":
+        if signals.shape[1] > overlap_save_ratio * filters.shape[2]:
+            method = "overlap-save"
+        else:
+            method = "direct"
+
+    if method == "direct":
+        return _direct_convolve(signals, filters, sum_signals, workers)
+    elif method == "overlap-save":
+        return _overlap_save_convolve(
+            signals, filters, sum_signals, block_size, workers
+        )
+    else:
+        raise ValueError("The method should be 'auto', 'direct', or 'overlap-save'")
+
+
+def _direct_convolve(signals, filters, sum_signals, workers):
+    """
+    Convolution with one FFT of every signal and every filter
+    """
+    n_out = signals.shape[1] + filters.shape[2] - 1
+    n_fft = next_fast_len(n_out)
+
+    X = _rfft(signals, n_fft, workers)
+    H = _rfft(np.swapaxes(filters, 0, 1), n_fft, workers)
+
+    if sum_signals:
+        Y = np.einsum("smf,sf->mf", H, X)
+    else:
+        Y = H
+        Y *= X[:, None, :]
+
+    return _irfft(Y, n_fft, workers)[..., :n_out]
+
+
+def _overlap_save_convolve(signals, filters, sum_signals, block_size, workers):
+    """
+    Convolution block by block with the overlap-save method. The filters are
+    only transformed once.
+    """
+    n_signals, n_samples = signals.shape
+    n_channels, _, n_taps = filters.shape
+    n_out = n_samples + n_taps - 1
+
+    if block_size is None:
+        n_fft = next_fast_len(4 * n_taps)
+    elif block_size < n_taps:
+        raise ValueError("The block size should be at least the length of the filters")
+    else:
+        n_fft = block_size
+
+    dtype = np.result_type(signals, filters)
+    if sum_signals:
+        output = np.zeros((n_channels, n_out), dtype=dtype)
+    else:
+        output = np.zeros((n_signals, n_channels, n_out), dtype=dtype)
+
+    hop = n_fft - n_taps + 1
+    offsets = [0] * n_signals
+    blocks = _overlap_save_blocks(
+        signals, offsets, filters, sum_signals, n_fft, hop, workers
+    )
+    for start, y in blocks:
+        output[..., start : start + y.shape[-1]] = y
+
+    return output
+
+
+def fft_convolve_stream(
+    signals, filters, offsets=None, block_size=None, n_samples=None, workers=None
+):
+    """
+    Convolves every signal with the filters of all the output channels and
+    sums the signals, block by block. This is equivalent to
+    ``fft_convolve(signals, filters, sum_signals=True)``, but the memory used
+    does not depend on the length of the signals.
+
+    Parameters
+    ----------
+    signals: list of ndarray
+        The input signals, that may have different lengths. They are only
+        accessed by slices, so that memory mapped arrays can be used.
+    filters: ndarray (n_channels, n_signals, n_taps)
+        The filters from every signal to every output channel
+    offsets: list of int, optional
+        The index of the first sample of every signal in the output
+        (default: 0)
+    block_size: int, optional
+        The number of samples of the output blocks. By default, the blocks are
+        about three times as long as the filters.
+    n_samples: int, optional
+        The total number of output samples. By default, the output stops at the
+        end of the convolution of the last signal. The output is zero-padded,
+        or truncated, to this length.
+    workers: int, optional
+        The number of threads used to compute the FFTs, as in ``scipy.fft``
+        (default: one)
+
+    Returns
+    -------
+    generator of ndarray (n_channels, block_size)
+        The consecutive blocks of the output. The last block may be shorter.
+    """
+    filters = np.asarray(filters)
+    n_channels, n_signals, n_taps = filters.shape
+
+    if len(signals) != n_signals:
+        raise ValueError("There should be one filter per signal and channel")
+    if offsets is None:
+        offsets = [0] * n_signals
+
+    if block_size is None:
+        n_fft = next_fast_len(4 * n_taps)
+        block_size = n_fft - n_taps + 1
+    elif block_size <= 0:
+        raise ValueError("The block size should be positive")
+    else:
+        n_fft = next_fast_len(block_size + n_taps - 1)
+
+    blocks = _overlap_save_blocks(
+        signals, offsets, filters, True, n_fft, block_size, workers, n_samples
+    )
+    return (y for _, y in blocks)
+
+
+def _overlap_save_blocks(
+    signals, offsets, filters, sum_signals, n_fft, hop, workers, n_out=None
+):
+    """
+    Generator of the consecutive output blocks of the overlap-save method.
+    Every block has ``hop`` samples, except possibly the last one, and is
+    yielded with the index of its first sample.
+    """
+    n_channels, n_signals, n_taps = filters.shape
+
+    if n_out is None:
+        n_out = max(o + len(x) for o, x in zip(offsets, signals)) + n_taps - 1
+
+    H = _rfft(np.swapaxes(filters, 0, 1), n_fft, workers)
+
+    dtype = np.result_type(*[np.asarray(x[:1]) for x in signals], filters)
+    block = np.zeros((n_signals, n_fft), dtype=dtype)
+
+    for start in range(0, n_out, hop):
+
+        # the input samples needed for the outputs start to start + hop
+        lo = start - n_taps + 1
+        hi = start + hop
+        block[:, :] = 0.0
+        for s, (x, offset) in enumerate(zip(signals, offsets)):
+            b = max(lo, offset)
+            e = min(hi, offset + len(x))
+            if e > b:
+                block[s, b - lo : e - lo] = x[b - offset : e - offset]
+
+        X = _rfft(block, n_fft, workers)
+
+        if sum_signals:
+            Y = np.einsum("smf,sf->mf", H, X)
+        else:
+            Y = H * X[:, None, :]
+
+        # the first n_taps - 1 samples are corrupted by the circular convolution
+        y = _irfft(Y, n_fft, workers)[..., n_taps - 1 : n_taps - 1 + hop]
+        n = min(hop, n_out - start)
+
+        yield start, y[..., :n]
+
+
+def _stack_filters(rirs):
+    """
+    Converts the room impulse responses in the layout of ``Room.rir``, a list
+    of lists of arrays indexed by microphone then source, to an array of shape
+    ``(n_mics, n_sources, n_taps)``, zero-padded to the longest response
+    """
+    if isinstance(rirs, np.ndarray):
+        return rirs
+
+    n_taps = max(len(h) for rir_mic in rirs for h in rir_mic)
+    filters = np.zeros((len(rirs), len(rirs[0]), n_taps))
+    for m, rir_mic in enumerate(rirs):
+        for s, h in enumerate(rir_mic):
+            filters[m, s, : len(h)] = h
+
+    return filters
+
+
+class PartitionedConvolver(object):
+    """
+    Low latency, block by block, convolution of the signals of several
+    sources with the room impulse responses to the microphones, e.g., for
+    real-time auralization.
+
+    The impulse responses are split into partitions of the size of the
+    blocks, and the convolution uses the uniformly partitioned overlap-save
+    method with a frequency domain delay line that holds the spectra of the
+    last input blocks. The latency is one block. All the buffers are
+    allocated once, so that processing a block does not allocate memory,
+    except for the outputs of the FFTs with versions of numpy that do not
+    support the ``out`` argument of ``numpy.fft``.
+
+    The impulse responses can be replaced while processing with
+    :py:meth:`set_rirs`. The output of the next block is then crossfaded from
+    the old to the new impulse responses.
+
+    Parameters
+    ----------
+    rirs: ndarray (n_mics, n_sources, n_taps) or list of list of ndarray
+        The room impulse responses, in the layout of ``Room.rir`` when given
+        as lists
+    block_size: int
+        The number of samples of the blocks
+    max_taps: int, optional
+        The maximum length of the impulse responses that can be set later
+        with :py:meth:`set_rirs` (default: the length of ``rirs``)
+
+    Attributes
+    ----------
+    n_blocks: int
+        The number of blocks processed
+    max_block_time: float
+        The worst-case processing time of a block, in seconds
+    total_time: float
+        The total processing time of all the blocks, in seconds
+    """
+
+    def __init__(self, rirs, block_size, max_taps=None):
+
+        filters = _stack_filters(rirs)
+
+        if block_size <= 0:
+            raise ValueError("The block size should be positive")
+
+        self.block_size = block_size
+        self.n_mics, self.n_sources, n_taps = filters.shape
+
+        if max_taps is None:
+            max_taps = n_taps
+        self.n_partitions = max(1, -(-max(n_taps, max_taps) // block_size))
+
+        self.n_fft = 2 * block_size
+        n_freq = block_size + 1
+
+        # the spectra of the partitions of the impulse responses
+        self._spectra = self._partition(filters)
+        self._next_spectra = None
+
+        # the last two blocks of the inputs
+        self._inputs = np.zeros((self.n_sources, self.n_fft))
+
+        # frequency domain delay line, the newest spectra are at self._head
+        # and the older ones follow, circularly
+        self._fdl = np.zeros(
+            (self.n_partitions, self.n_sources, n_freq), dtype=np.complex128
+        )
+        self._head = 0
+
+        # the work buffers
+        self._spectrum = np.zeros((self.n_mics, n_freq), dtype=np.complex128)
+        self._spectrum_tail = np.zeros_like(self._spectrum)
+        self._time = np.zeros((self.n_mics, self.n_fft))
+        self._output = np.zeros((self.n_mics, block_size))
+        self._crossfade_output = np.zeros_like(self._output)
+
+        # raised cosine from the old to the new impulse responses
+        ramp = np.arange(block_size) / block_size
+        self._fade_in = 0.5 * (1.0 - np.cos(np.pi * ramp))
+        self._fade_out = 1.0 - self._fade_in
+
+        # check if the FFTs can write in the buffers
+        try:
+            np.fft.rfft(self._inputs, axis=-1, out=self._fdl[0])
+            self._fft_out = True
+        except TypeError:
+            self._fft_out = False
+
+        self.reset_timing()
+
+    @classmethod
+    def from_room(cls, room, block_size, max_taps=None):
+        """
+        Creates a convolver for the room impulse responses of a room, that are
+        computed if needed
+
+        Parameters
+        ----------
+        room: Room
+            The room
+        block_size: int
+            The number of samples of the blocks
+        max_taps: int, optional
+            The maximum length of the impulse responses that can be set later
+        """
+        if room.rir is None or len(room.rir) == 0:
+            room.compute_rir()
+        return cls(room.rir, block_size, max_taps=max_taps)
+
+    def _partition(self, filters):
+        """Computes the spectra of the partitions of the impulse responses"""
+
+        n_mics, n_sources, n_taps = filters.shape
+
+        if (n_mics, n_sources) != (self.n_mics, self.n_sources):
+            raise ValueError(
+                "The impulse responses should be of shape ({}, {}, n_taps)".format(
+                    self.n_mics, self.n_sources
+                )
+            )
+        if n_taps > self.n_partitions * self.block_size:
+            raise ValueError(
+                "The impulse responses should have at most {} taps".format(
+                    self.n_partitions * self.block_size
+                )
+            )
+
+        B = self.block_size
+        partitions = np.zeros((self.n_partitions, n_sources, n_mics, B))
+        for p in range(self.n_partitions):
+            seg = filters[:, :, p * B : (p + 1) * B]
+            partitions[p, :, :, : seg.shape[2]] = np.swapaxes(seg, 0, 1)
+
+        return np.fft.rfft(partitions, n=self.n_fft, axis=-1)
+
+    def set_rirs(self, rirs):
+        """
+        Replaces the room impulse responses. The output of the next block is
+        crossfaded from the old to the new impulse responses.
+
+        Parameters
+        ----------
+        rirs: ndarray (n_mics, n_sources, n_taps) or list of list of ndarray
+            The new room impulse responses, with the same number of
+            microphones and sources, and at most ``max_taps`` taps
+        """
+        self._next_spectra = self._partition(_stack_filters(rirs))
+
+    def reset_timing(self):
+        """Resets the processing time statistics"""
+        self.n_blocks = 0
+        self.max_block_time = 0.0
+        self.total_time = 0.0
+
+    def process(self, blocks):
+        """
+        Processes one block of the signals of the sources
+
+        Parameters
+        ----------
+        blocks: ndarray (n_sources, block_size)
+            The next block of every source
+
+        Returns
+        -------
+        ndarray (n_mics, block_size)
+            The next block of every microphone. The array is reused by the
+            next call, and should be copied to be kept.
+        """
+        t_start = time.perf_counter()
+
+        if blocks.shape != (self.n_sources, self.block_size):
+            raise ValueError(
+                "The blocks should be of shape ({}, {})".format(
+                    self.n_sources, self.block_size
+                )
+            )
+
+        B = self.block_size
+
+        # slide the input buffer and insert the new blocks
+        self._inputs[:, :B] = self._inputs[:, B:]
+        self._inputs[:, B:] = blocks
+
+        # the delay line moves backward, so that the spectra from the newest
+        # to the oldest are at self._head, ..., n_partitions - 1, 0, ...
+        self._head = (self._head - 1) % self.n_partitions
+        if self._fft_out:
+            np.fft.rfft(self._inputs, axis=-1, out=self._fdl[self._head])
+        else:
+            self._fdl[self._head] = np.fft.rfft(self._inputs, axis=-1)
+
+        self._filter(self._spectra, self._output)
+
+        if self._next_spectra is not None:
+            self._filter(self._next_spectra, self._crossfade_output)
+            self._output *= self._fade_out
+            self._crossfade_output *= self._fade_in
+            self._output += self._crossfade_output
+            self._spectra = self._next_spectra
+            self._next_spectra = None
+
+        elapsed = time.perf_counter() - t_start
+        self.n_blocks += 1
+        self.total_time += elapsed
+        self.max_block_time = max(self.max_block_time, elapsed)
+
+        return self._output
+
+    def _filter(self, spectra, output):
+        """
+        Multiplies the delay line with the spectra of the partitions and
+        writes the output block
+        """
+        n_new = self.n_partitions - self._head
+
+        # the partitions of the impulse responses matched to the delay line
+        np.einsum(
+            "psf,psmf->mf",
+            self._fdl[self._head :],
+            spectra[:n_new],
+            out=self._spectrum,
+        )
+        if self._head > 0:
+            np.einsum(
+                "psf,psmf->mf",
+                self._fdl[: self._head],
+                spectra[n_new:],
+                out=self._spectrum_tail,
+            )
+            self._spectrum += self._spectrum_tail
+
+        if self._fft_out:
+            np.fft.irfft(self._spectrum, n=self.n_fft, axis=-1, out=self._time)
+        else:
+            self._time[:, :] = np.fft.irfft(self._spectrum, n=self.n_fft, axis=-1)
+
+        # the second half is free of circular aliasing
+        output[:, :] = self._time[:, self.block_size :]
@@ -0,0 +1,348 @@
+/* 
+ * Implementation of the bounding volume hierarchies over walls and receivers
+ * Copyright (C) 2022  The pyroomacoustics contributors
+ *
+ * Permission is hereby granted, free of charge, to any person obtaining a copy
+ * of this software and associated documentation files (the "Software"), to deal
+ * in the Software without restriction, including without limitation the rights
+ * to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+ * copies of the Software, and to permit persons to whom the Software is
+ * furnished to do so, subject to the following conditions:
+ *
+ * The above copyright notice and this permission notice shall be included in all
+ * copies or substantial portions of the Software.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ * IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+ * FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+ * AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+ * LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+ * OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+ * SOFTWARE.
+ *
+ * You should have received a copy of the MIT License along with this program. If
+ * not, see <https://opensource.org/licenses/MIT>.
+ */
+
+#include <algorithm>
+#include <cmath>
+#include "bvh.hpp"
+
+template<size_t D>
+void BVH<D>::build(
+    const std::vector<Vectorf<D>> &lower,
+    const std::vector<Vectorf<D>> &upper
+    )
+{
+  /*
+   * Builds the hierarchy over the boxes (lower[i], upper[i]).
+   * The boxes are split recursively at the median of their centers along
+   * the longest axis of the bounding box of the centers.
+   *
+   * The queries report the items by their position in lower and upper.
+   */
+  nodes.clear();
+  indices.resize(lower.size());
+
+  if (lower.size() == 0)
+    return;
+
+  item_lower = lower;
+  item_upper = upper;
+  item_center.resize(lower.size());
+  for (size_t i = 0 ; i < lower.size() ; i++)
+  {
+    indices[i] = int(i);
+    item_center[i] = 0.5f * (item_lower[i] + item_upper[i]);
+  }
+
+  nodes.reserve(2 * indices.size() / leaf_size + 1);
+  build_recursive(0, int(indices.size()));
+
+  // free the temporary storage
+  item_center.clear();
+}
+
+
+template<size_t D>
+int BVH<D>::build_recursive(int start, int end)
+{
+  int node_index = int(nodes.size());
+  nodes.push_back(Node());
+
+  // bounding box of all the items in the node
+  Vectorf<D> lower = item_lower[indices[start]];
+  Vectorf<D> upper = item_upper[indices[start]];
+  Vectorf<D> c_lower = item_center[indices[start]];
+  Vectorf<D> c_upper = item_center[indices[start]];
+  for (int i = start + 1 ; i < end ; i++)
+  {
+    lower = lower.cwiseMin(item_lower[indices[i]]);
+    upper = upper.cwiseMax(item_upper[indices[i]]);
+    c_lower = c_lower.cwiseMin(item_center[indices[i]]);
+    c_upper = c_upper.cwiseMax(item_center[indices[i]]);
+  }
+  nodes[node_index].lower = lower;
+  nodes[node_index].upper = upper;
+
+  if (end - start <= leaf_size)
+  {
+    nodes[node_index].start = start;
+    nodes[node_index].count = end - start;
+    return node_index;
+  }
+
+  // split along the longest axis of the centers
+  int axis = 0;
+  (c_upper - c_lower).maxCoeff(&axis);
+
+  int mid = (start + end) / 2;
+  std::nth_element(
+      indices.begin() + start, indices.begin() + mid, indices.begin() + end,
+      [this, axis](int a, int b) { return item_center[a][axis] < item_center[b][axis]; }
+      );
+
+  int left = build_recursive(start, mid);
+  int right = build_recursive(mid, end);
+  nodes[node_index].left = left;
+  nodes[node_index].right = right;
+
+  return node_index;
+}
+
+
+template<size_t D>
+bool BVH<D>::segment_hits_box(
+    const Vectorf<D> &p1,
+    const Vectorf<D> &dir,
+    const Vectorf<D> &lower,
+    const Vectorf<D> &upper,
+    float pad,
+    float t_pad
+    )
+{
+  /*
+   * Slab test between the segment p1 + t * dir, t in [-t_pad, 1 + t_pad],
+   * and the bounding box enlarged by pad in all directions.
+   */
+  float t_min = -t_pad, t_max = 1.f + t_pad;
+
+  for (size_t d = 0 ; d < D ; d++)
+  {
+    float lo = lower[d] - pad, hi = upper[d] + pad;
+
+    if (std::abs(dir[d]) < libroom_eps)
+    {
+      // the segment is parallel to the slab
+      if (p1[d] < lo || hi < p1[d])
+        return false;
+    }
+    else
+    {
+      float t1 = (lo - p1[d]) / dir[d];
+      float t2 = (hi - p1[d]) / dir[d];
+      if (t1 > t2)
+        std::swap(t1, t2);
+      t_min = std::max(t_min, t1);
+      t_max = std::min(t_max, t2);
+      if (t_min > t_max)
+        return false;
+    }
+  }
+
+  return true;
+}
+
+
+template<size_t D>
+template<class Func>
+void BVH<D>::segment_query(
+    const Vectorf<D> &p1,
+    const Vectorf<D> &p2,
+    float pad,
+    float t_pad,
+    Func callback
+    ) const
+{
+  /*
+   * Calls callback(k) for every item whose box, enlarged by pad, is crossed
+   * by the segment (p1, p2) extended by t_pad times its length at both
+   * ends. The traversal stops early when the callback returns true.
+   *
+   * The box of a node contains the boxes of the items below it, so that the
+   * items reported are exactly those reported by linear_query, possibly in
+   * a different order.
+   */
+  if (nodes.size() == 0)
+    return;
+
+  Vectorf<D> dir = p2 - p1;
+
+  int stack[64];
+  int stack_size = 0;
+  stack[stack_size++] = 0;
+
+  while (stack_size > 0)
+  {
+    const Node &node = nodes[stack[--stack_size]];
+
+    if (!segment_hits_box(p1, dir, node.lower, node.upper, pad, t_pad))
+      continue;
+
+    if (node.left < 0)
+    {
+      for (int i = node.start ; i < node.start + node.count ; i++)
+      {
+        int k = indices[i];
+        if (segment_hits_box(p1, dir, item_lower[k], item_upper[k], pad, t_pad)
+            && callback(k))
+          return;
+      }
+    }
+    else
+    {
+      stack[stack_size++] = node.right;
+      stack[stack_size++] = node.left;
+    }
+  }
+}
+
+
+template<size_t D>
+template<class Func>
+void BVH<D>::linear_query(
+    const Vectorf<D> &p1,
+    const Vectorf<D> &p2,
+    float pad,
+    float t_pad,
+    Func callback
+    ) const
+{
+  /*
+   * Same as segment_query, but tests the boxes of all the items in turn.
+   * This is the brute force reference of the hierarchy.
+   */
+  Vectorf<D> dir = p2 - p1;
+
+  for (size_t k = 0 ; k < item_lower.size() ; k++)
+    if (segment_hits_box(p1, dir, item_lower[k], item_upper[k], pad, t_pad)
+        && callback(int(k)))
+      return;
+}
+
+
+template<size_t D>
+void WallBVH<D>::build(const std::vector<Wall<D>> &walls, const std::vector<int> &subset)
+{
+  /*
+   * Builds the hierarchy over the walls whose indices are in subset.
+   * The queries report the walls by their position in subset.
+   */
+
+  // bounding boxes of all the walls, slightly enlarged for the short walls
+  // since the tolerance of the intersection routines grows as their length
+  // decreases
+  std::vector<Vectorf<D>> lower(subset.size()), upper(subset.size());
+  for (size_t i = 0 ; i < subset.size() ; i++)
+  {
+    const Wall<D> &w = walls[subset[i]];
+    lower[i] = w.corners.rowwise().minCoeff();
+    upper[i] = w.corners.rowwise().maxCoeff();
+
+    float extent = (upper[i] - lower[i]).norm();
+    float pad = 10.f * libroom_eps * (1.f + 1.f / std::max(extent, libroom_eps));
+    lower[i].array() -= pad;
+    upper[i].array() += pad;
+  }
+
+  BVH<D>::build(lower, upper);
+}
+
+
+template<size_t D>
+template<class Func>
+void WallBVH<D>::segment_query(
+    const Vectorf<D> &p1,
+    const Vectorf<D> &p2,
+    Func callback
+    ) const
+{
+  /*
+   * Calls callback(k) for every wall whose bounding box is crossed by the
+   * segment (p1, p2), where k is the position of the wall in the subset used
+   * to build the hierarchy. The traversal stops early when the callback
+   * returns true.
+   *
+   * The boxes are enlarged by a small margin so that the walls found by the
+   * tolerant intersection routines are never missed.
+   */
+  float pad = query_pad(p1, p2);
+  BVH<D>::segment_query(p1, p2, pad, pad, callback);
+}
+
+
+template<size_t D>
+template<class Func>
+void WallBVH<D>::linear_query(
+    const Vectorf<D> &p1,
+    const Vectorf<D> &p2,
+    Func callback
+    ) const
+{
+  /*
+   * Same as segment_query, but tests the bounding boxes of all the walls in
+   * turn, so that both report the same walls.
+   */
+  float pad = query_pad(p1, p2);
+  BVH<D>::linear_query(p1, p2, pad, pad, callback);
+}
+
+
+template<size_t D>
+float WallBVH<D>::query_pad(const Vectorf<D> &p1, const Vectorf<D> &p2)
+{
+  // the tolerance of the intersection routines grows as the segment
+  // length decreases
+  float length = (p2 - p1).norm();
+  return 10.f * libroom_eps * (1.f + 1.f / std::max(length, libroom_eps));
+}
+
+
+template<size_t D>
+void ReceiverBVH<D>::build(const std::vector<Microphone<D>> &receivers)
+{
+  /*
+   * Builds the hierarchy over the centers of the receivers. The queries
+   * report the receivers by their position in the vector.
+   */
+  std::vector<Vectorf<D>> locs(receivers.size());
+  for (size_t k = 0 ; k < receivers.size() ; k++)
+    locs[k] = receivers[k].get_loc();
+
+  BVH<D>::build(locs, locs);
+}
+
+
+template<size_t D>
+template<class Func>
+void ReceiverBVH<D>::segment_query(
+    const Vectorf<D> &p1,
+    const Vectorf<D> &p2,
+    float radius,
+    Func callback
+    ) const
+{
+  /*
+   * Calls callback(k) for every receiver k whose center may be within
+   * distance radius of the segment (p1, p2). The traversal stops early
+   * when the callback returns true.
+   *
+   * The margin covers the tolerance of the segment to sphere tests of the
+   * ray tracing.
+   */
+  float length = (p2 - p1).norm();
+  float margin = 10.f * libroom_eps;
+  BVH<D>::segment_query(
+      p1, p2, radius + margin, margin / std::max(length, libroom_eps), callback
+      );
+}
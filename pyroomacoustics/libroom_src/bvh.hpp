@@ -0,0 +1,162 @@
+/* 
+ * Bounding volume hierarchies over the walls and receivers of a room
+ * Copyright (C) 2022  The pyroomacoustics contributors
+ *
+ * Permission is hereby granted, free of charge, to any person obtaining a copy
+ * of this software and associated documentation files (the "Software"), to deal
+ * in the Software without restriction, including without limitation the rights
+ * to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+ * copies of the Software, and to permit persons to whom the Software is
+ * furnished to do so, subject to the following conditions:
+ *
+ * The above copyright notice and this permission notice shall be included in all
+ * copies or substantial portions of the Software.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ * IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+ * FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+ * AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+ * LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+ * OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+ * SOFTWARE.
+ *
+ * You should have received a copy of the MIT License along with this program. If
+ * not, see <https://opensource.org/licenses/MIT>.
+ */
+#ifndef __BVH_H__
+#define __BVH_H__
+
+#include <vector>
+#include <Eigen/Dense>
+
+#include "common.hpp"
+#include "wall.hpp"
+#include "microphone.hpp"
+
+template<size_t D>
+class BVH
+{
+  /*
+   * A bounding volume hierarchy (BVH) over a set of axis aligned boxes.
+   *
+   * Every node of the tree holds the bounding box of the items below it.
+   * Segment queries only visit the items whose box is crossed by the
+   * segment, which makes intersection tests sub-linear in the number of
+   * items.
+   */
+  public:
+    struct Node
+    {
+      Vectorf<D> lower, upper;  // the bounding box of the node
+      int left = -1, right = -1;  // the children, -1 for leaves
+      int start = 0, count = 0;  // the range of items in `indices` for leaves
+    };
+
+    static const int leaf_size = 4;
+
+    std::vector<Node> nodes;
+    std::vector<int> indices;  // the positions of the items, ordered by leaf
+
+    BVH() {}
+
+    void build(
+        const std::vector<Vectorf<D>> &lower,
+        const std::vector<Vectorf<D>> &upper
+        );
+
+    bool empty() const { return nodes.size() == 0; }
+
+    template<class Func>
+    void segment_query(
+        const Vectorf<D> &p1,
+        const Vectorf<D> &p2,
+        float pad,
+        float t_pad,
+        Func callback
+        ) const;
+
+    template<class Func>
+    void linear_query(
+        const Vectorf<D> &p1,
+        const Vectorf<D> &p2,
+        float pad,
+        float t_pad,
+        Func callback
+        ) const;
+
+  private:
+    // the boxes of the items, tested before reporting them
+    std::vector<Vectorf<D>> item_lower, item_upper;
+
+    // temporary storage used during the construction
+    std::vector<Vectorf<D>> item_center;
+
+    int build_recursive(int start, int end);
+
+    static bool segment_hits_box(
+        const Vectorf<D> &p1,
+        const Vectorf<D> &dir,
+        const Vectorf<D> &lower,
+        const Vectorf<D> &upper,
+        float pad,
+        float t_pad
+        );
+};
+
+
+template<size_t D>
+class WallBVH : public BVH<D>
+{
+  /*
+   * A bounding volume hierarchy over a subset of the walls of a room.
+   */
+  public:
+    WallBVH() {}
+
+    void build(const std::vector<Wall<D>> &walls, const std::vector<int> &subset);
+
+    template<class Func>
+    void segment_query(
+        const Vectorf<D> &p1,
+        const Vectorf<D> &p2,
+        Func callback
+        ) const;
+
+    template<class Func>
+    void linear_query(
+        const Vectorf<D> &p1,
+        const Vectorf<D> &p2,
+        Func callback
+        ) const;
+
+  private:
+    static float query_pad(const Vectorf<D> &p1, const Vectorf<D> &p2);
+};
+
+
+template<size_t D>
+class ReceiverBVH : public BVH<D>
+{
+  /*
+   * A bounding volume hierarchy over the centers of spherical receivers.
+   * Segment queries only visit the receivers close to the segment, so that
+   * the cost of logging the hits of a ray grows slowly with the number of
+   * receivers.
+   */
+  public:
+    ReceiverBVH() {}
+
+    void build(const std::vector<Microphone<D>> &receivers);
+
+    template<class Func>
+    void segment_query(
+        const Vectorf<D> &p1,
+        const Vectorf<D> &p2,
+        float radius,
+        Func callback
+        ) const;
+};
+
+#include "bvh.cpp"
+
+#endif // __BVH_H__
@@ -29,6 +29,7 @@
 #define __COMMON_HPP__
 
 #include <iostream>
+#include <thread>
 #include <Eigen/Dense>
 
 extern float libroom_eps;  // epsilon is the precision for floating point computations. It is defined in libroom.cpp
@@ -72,6 +73,18 @@ size_t get_new_size(size_t val, size_t cur_size)
   return new_size;
 }
 
+size_t get_n_threads(size_t requested, size_t n_tasks)
+{
+  /*
+   * Returns the number of worker threads to use for n_tasks tasks.
+   * A request of zero threads means one per hardware thread.
+   */
+  size_t n_threads = requested;
+  if (n_threads == 0)
+    n_threads = std::max(1u, std::thread::hardware_concurrency());
+  return std::max(size_t(1), std::min(n_threads, n_tasks));
+}
+
 class Histogram2D
 {
   size_t rows, cols;
@@ -165,6 +178,27 @@ class Histogram2D
         return 0.f;
     }
 
+    void scale(float factor)
+    {
+      array *= factor;
+    }
+
+    void merge(const Histogram2D &other)
+    {
+      /*
+       * Adds the content of another histogram to this one.
+       * The size of this histogram is grown if necessary.
+       */
+      if (other.array.rows() > array.rows())
+        resize_rows(other.array.rows());
+
+      if (other.array.cols() > array.cols())
+        resize_cols(other.array.cols());
+
+      array.topLeftCorner(other.array.rows(), other.array.cols()) += other.array;
+      counts.topLeftCorner(other.counts.rows(), other.counts.cols()) += other.counts;
+    }
+
     Eigen::ArrayXXf get_hist() const
     {
       return array;
@@ -24,6 +24,7 @@
  * not, see <https://opensource.org/licenses/MIT>.
  */
 
+#include <memory>
 #include <string>
 #include <vector>
 #include <pybind11/pybind11.h>
@@ -39,8 +40,177 @@
 
 namespace py = pybind11;
 
+/*
+ * The long running methods of the room engine (image source model, ray
+ * tracing, and geometric queries) release the GIL. They only use the state
+ * of the C++ object on which they are called so that several Python threads
+ * may run them concurrently on *distinct* room objects. Concurrent calls on
+ * the same room object are not safe.
+ */
+
 float libroom_eps = 1e-5;  // epsilon is set to 0.1 millimeter (100 um)
 
+template<class Matrix>
+Eigen::Map<const Matrix> used_columns(const Matrix &mat, size_t n)
+{
+  /*
+   * A view of the first n columns of a matrix, or of the first n entries of
+   * a vector. This is used to expose the image source arena without copies.
+   */
+  if (Matrix::ColsAtCompileTime == 1)
+    return Eigen::Map<const Matrix>(mat.data(), n, 1);
+  else
+    return Eigen::Map<const Matrix>(mat.data(), mat.rows(), n);
+}
+
+
+template<class Matrix>
+py::array owned_array(Matrix &&mat)
+{
+  /*
+   * Moves the matrix to the heap and returns a numpy array that owns it.
+   * There is no copy of the data, which is freed when the array is garbage
+   * collected. Vectors are returned as 1D arrays.
+   */
+  typedef typename std::decay<Matrix>::type M;
+  typedef typename M::Scalar Scalar;
+
+  M *owned = new M(std::move(mat));
+  py::capsule free_when_done(owned, [](void *p) { delete reinterpret_cast<M *>(p); });
+
+  if (M::ColsAtCompileTime == 1)
+    return py::array_t<Scalar>(
+        { size_t(owned->size()) }, { sizeof(Scalar) }, owned->data(), free_when_done
+        );
+  else
+    return py::array_t<Scalar>(
+        { size_t(owned->rows()), size_t(owned->cols()) },
+        { sizeof(Scalar), owned->rows() * sizeof(Scalar) },
+        owned->data(),
+        free_when_done
+        );
+}
+
+template<size_t D>
+py::dict release_image_sources(Room<D> &room)
+{
+  // the arena is trimmed so that the arrays do not keep unused columns alive
+  ImageSourceArena<D> arena = room.release_image_sources();
+
+  py::dict ret;
+  ret["sources"] = owned_array(std::move(arena.locs));
+  ret["orders"] = owned_array(std::move(arena.orders));
+  ret["orders_xyz"] = owned_array(std::move(arena.orders_xyz));
+  ret["attenuations"] = owned_array(std::move(arena.attenuations));
+  ret["gen_walls"] = owned_array(std::move(arena.gen_walls));
+  ret["visible_mics"] = owned_array(std::move(arena.visible_mics));
+  return ret;
+}
+
+// The walls are pickled as the arguments of their constructor
+template<size_t D>
+py::tuple wall_getstate(const Wall<D> &wall)
+{
+  return py::make_tuple(wall.corners, wall.absorption, wall.scatter, wall.name);
+}
+
+template<size_t D>
+Wall<D> wall_setstate(py::tuple state)
+{
+  if (state.size() != 4)
+    throw std::runtime_error("Invalid state of a wall");
+
+  std::string name = state[3].cast<std::string>();
+  return Wall<D>(
+      state[0].cast<Eigen::Matrix<float,D,Eigen::Dynamic>>(),
+      state[1].cast<Eigen::ArrayXf>(),
+      state[2].cast<Eigen::ArrayXf>(),
+      name
+      );
+}
+
+// The rooms are pickled as the arguments of their constructor, the
+// locations of the microphones, and the settings that are not constructor
+// arguments. The results of the simulations are not kept.
+template<size_t D>
+py::tuple room_getstate(const Room<D> &room)
+{
+  py::tuple geometry;
+  if (room.is_shoebox)
+    geometry = py::make_tuple(
+        room.shoebox_size, room.shoebox_absorption, room.shoebox_scattering
+        );
+  else
+    geometry = py::make_tuple(room.walls, room.obstructing_walls);
+
+  py::tuple params = py::make_tuple(
+      room.sound_speed, room.ism_order, room.energy_thres, room.time_thres,
+      room.mic_radius, room.mic_hist_res, room.is_hybrid_sim
+      );
+
+  std::vector<Vectorf<D>> mic_locs;
+  for (auto &mic : room.microphones)
+    mic_locs.push_back(mic.get_loc());
+
+  py::tuple settings = py::make_tuple(
+      room.ism_n_threads, room.ism_max_dist, room.ism_min_attenuation,
+      room.rt_n_threads, room.use_bvh
+      );
+
+  return py::make_tuple(geometry, params, mic_locs, settings);
+}
+
+template<size_t D>
+std::unique_ptr<Room<D>> room_setstate(py::tuple state)
+{
+  if (state.size() != 4)
+    throw std::runtime_error("Invalid state of a room");
+
+  py::tuple geometry = state[0].cast<py::tuple>();
+  py::tuple params = state[1].cast<py::tuple>();
+  py::tuple settings = state[3].cast<py::tuple>();
+  if (params.size() != 7 || settings.size() != 5)
+    throw std::runtime_error("Invalid state of a room");
+
+  std::vector<Microphone<D>> no_mics;
+  float sound_speed = params[0].cast<float>();
+  int ism_order = params[1].cast<int>();
+  float energy_thres = params[2].cast<float>();
+  float time_thres = params[3].cast<float>();
+  float mic_radius = params[4].cast<float>();
+  float mic_hist_res = params[5].cast<float>();
+  bool is_hybrid_sim = params[6].cast<bool>();
+
+  std::unique_ptr<Room<D>> room;
+  if (geometry.size() == 3)
+    room.reset(new Room<D>(
+          geometry[0].cast<Vectorf<D>>(),
+          geometry[1].cast<Eigen::Array<float,Eigen::Dynamic,2*D>>(),
+          geometry[2].cast<Eigen::Array<float,Eigen::Dynamic,2*D>>(),
+          no_mics, sound_speed, ism_order, energy_thres, time_thres,
+          mic_radius, mic_hist_res, is_hybrid_sim
+          ));
+  else if (geometry.size() == 2)
+    room.reset(new Room<D>(
+          geometry[0].cast<std::vector<Wall<D>>>(),
+          geometry[1].cast<std::vector<int>>(),
+          no_mics, sound_speed, ism_order, energy_thres, time_thres,
+          mic_radius, mic_hist_res, is_hybrid_sim
+          ));
+  else
+    throw std::runtime_error("Invalid state of a room");
+
+  for (auto &loc : state[2].cast<std::vector<Vectorf<D>>>())
+    room->add_mic(loc);
+
+  room->ism_n_threads = settings[0].cast<size_t>();
+  room->ism_max_dist = settings[1].cast<float>();
+  room->ism_min_attenuation = settings[2].cast<float>();
+  room->rt_n_threads = settings[3].cast<size_t>();
+  room->use_bvh = settings[4].cast<bool>();
+
+  return room;
+}
 
 PYBIND11_MODULE(libroom, m) {
   m.doc() = "Libroom room simulation extension plugin"; // optional module docstring
@@ -62,20 +232,41 @@ PYBIND11_MODULE(libroom, m) {
         >())
     .def("set_params", &Room<3>::set_params)
     .def("add_mic", &Room<3>::add_mic)
+    .def("set_mic_loc", &Room<3>::set_mic_loc)
     .def("reset_mics", &Room<3>::reset_mics)
-    .def("image_source_model", &Room<3>::image_source_model)
+    .def("image_source_model", &Room<3>::image_source_model,
+        py::call_guard<py::gil_scoped_release>())
     .def("get_wall", &Room<3>::get_wall)
     .def("get_max_distance", &Room<3>::get_max_distance)
-    .def("next_wall_hit", &Room<3>::next_wall_hit)
-    .def("scat_ray", &Room<3>::scat_ray)
-    .def("simul_ray", &Room<3>::simul_ray)
+    .def("next_wall_hit", &Room<3>::next_wall_hit,
+        py::call_guard<py::gil_scoped_release>())
+    .def("scat_ray",
+        (bool (Room<3>::*)(
+                             const Eigen::ArrayXf &transmitted,
+                             const Wall<3> &wall,
+                             const Vectorf<3> &prev_last_hit,
+                             const Vectorf<3> &hit_point,
+                             float travel_dist
+                             )
+        )
+        &Room<3>::scat_ray)
+    .def("simul_ray",
+        (void (Room<3>::*)(
+                             float phi,
+                             float theta,
+                             const Vectorf<3> source_pos,
+                             float energy_0
+                             )
+        )
+        &Room<3>::simul_ray)
     .def("ray_tracing",
         (void (Room<3>::*)(
                              const Eigen::Matrix<float,2,Eigen::Dynamic> &angles,
                              const Vectorf<3> source_pos
                              )
         )
-        &Room<3>::ray_tracing)
+        &Room<3>::ray_tracing,
+        py::call_guard<py::gil_scoped_release>())
     .def("ray_tracing",
         (void (Room<3>::*)(
                              size_t nb_phis,
@@ -83,28 +274,68 @@ PYBIND11_MODULE(libroom, m) {
                              const Vectorf<3> source_pos
                              )
         )
-        &Room<3>::ray_tracing)
+        &Room<3>::ray_tracing,
+        py::call_guard<py::gil_scoped_release>())
     .def("ray_tracing",
         (void (Room<3>::*)(
                              size_t nb_rays,
                              const Vectorf<3> source_pos
                              )
         )
-        &Room<3>::ray_tracing)
-    .def("contains", &Room<3>::contains)
+        &Room<3>::ray_tracing,
+        py::call_guard<py::gil_scoped_release>())
+    .def("ray_tracing_adaptive", &Room<3>::ray_tracing_adaptive,
+        py::arg("batch_size"), py::arg("max_rays"), py::arg("tolerance"),
+        py::arg("source_pos"),
+        py::call_guard<py::gil_scoped_release>(),
+        "Traces rays in batches until the energy decay curves of the "
+        "microphones converge, and returns the number of rays traced and the "
+        "last relative change of the curves")
+    .def("ray_tracing_reciprocal", &Room<3>::ray_tracing_reciprocal,
+        py::arg("mic"), py::arg("source_locs"), py::arg("n_rays"),
+        py::arg("batch_size") = 0, py::arg("tolerance") = 0.f,
+        py::call_guard<py::gil_scoped_release>(),
+        "Traces rays from a microphone to detectors at the locations of the "
+        "sources, and returns the number of rays traced and the last relative "
+        "change of the energy decay curves")
+    .def("contains", &Room<3>::contains,
+        py::call_guard<py::gil_scoped_release>())
+    .def("release_image_sources", &release_image_sources<3>,
+        "Returns the image sources found by the last call to image_source_model "
+        "as a dict of arrays that take over the storage of the engine")
     .def_property("is_hybrid_sim", &Room<3>::get_is_hybrid_sim, &Room<3>::set_is_hybrid_sim)
     .def_property_readonly_static("dim", [](py::object /* self */) { return 3; })
     .def_readonly("walls", &Room<3>::walls)
-    .def_readonly("sources", &Room<3>::sources)
-    .def_readonly("orders", &Room<3>::orders)
-    .def_readonly("orders_xyz", &Room<3>::orders_xyz)
-    .def_readonly("attenuations", &Room<3>::attenuations)
-    .def_readonly("gen_walls", &Room<3>::gen_walls)
-    .def_readonly("visible_mics", &Room<3>::visible_mics)
+    .def_property_readonly("sources",
+        [](const Room<3> &r) { return used_columns(r.image_sources.locs, r.image_sources.size); },
+        py::return_value_policy::reference_internal)
+    .def_property_readonly("orders",
+        [](const Room<3> &r) { return used_columns(r.image_sources.orders, r.image_sources.size); },
+        py::return_value_policy::reference_internal)
+    .def_property_readonly("orders_xyz",
+        [](const Room<3> &r) { return used_columns(r.image_sources.orders_xyz, r.image_sources.size); },
+        py::return_value_policy::reference_internal)
+    .def_property_readonly("attenuations",
+        [](const Room<3> &r) { return used_columns(r.image_sources.attenuations, r.image_sources.size); },
+        py::return_value_policy::reference_internal)
+    .def_property_readonly("gen_walls",
+        [](const Room<3> &r) { return used_columns(r.image_sources.gen_walls, r.image_sources.size); },
+        py::return_value_policy::reference_internal)
+    .def_property_readonly("visible_mics",
+        [](const Room<3> &r) { return used_columns(r.image_sources.visible_mics, r.image_sources.size); },
+        py::return_value_policy::reference_internal)
     .def_readonly("walls", &Room<3>::walls)
     .def_readonly("obstructing_walls", &Room<3>::obstructing_walls)
     .def_readonly("microphones", &Room<3>::microphones)
+    .def_readonly("detectors", &Room<3>::detectors)
     .def_readonly("max_dist", &Room<3>::max_dist)
+    .def_readwrite("ism_n_threads", &Room<3>::ism_n_threads)
+    .def_readwrite("ism_max_dist", &Room<3>::ism_max_dist)
+    .def_readwrite("ism_min_attenuation", &Room<3>::ism_min_attenuation)
+    .def_readwrite("rt_n_threads", &Room<3>::rt_n_threads)
+    .def_readwrite("use_bvh", &Room<3>::use_bvh)
+    .def_readonly("is_shoebox", &Room<3>::is_shoebox)
+    .def(py::pickle(&room_getstate<3>, &room_setstate<3>))
     ;
 
   // The 2D Room class
@@ -125,20 +356,41 @@ PYBIND11_MODULE(libroom, m) {
         >())
     .def("set_params", &Room<2>::set_params)
     .def("add_mic", &Room<2>::add_mic)
+    .def("set_mic_loc", &Room<2>::set_mic_loc)
     .def("reset_mics", &Room<2>::reset_mics)
-    .def("image_source_model", &Room<2>::image_source_model)
+    .def("image_source_model", &Room<2>::image_source_model,
+        py::call_guard<py::gil_scoped_release>())
     .def("get_wall", &Room<2>::get_wall)
     .def("get_max_distance", &Room<2>::get_max_distance)
-    .def("next_wall_hit", &Room<2>::next_wall_hit)
-    .def("scat_ray", &Room<2>::scat_ray)
-    .def("simul_ray", &Room<2>::simul_ray)
+    .def("next_wall_hit", &Room<2>::next_wall_hit,
+        py::call_guard<py::gil_scoped_release>())
+    .def("scat_ray",
+        (bool (Room<2>::*)(
+                             const Eigen::ArrayXf &transmitted,
+                             const Wall<2> &wall,
+                             const Vectorf<2> &prev_last_hit,
+                             const Vectorf<2> &hit_point,
+                             float travel_dist
+                             )
+        )
+        &Room<2>::scat_ray)
+    .def("simul_ray",
+        (void (Room<2>::*)(
+                             float phi,
+                             float theta,
+                             const Vectorf<2> source_pos,
+                             float energy_0
+                             )
+        )
+        &Room<2>::simul_ray)
     .def("ray_tracing",
         (void (Room<2>::*)(
                              const Eigen::Matrix<float,1,Eigen::Dynamic> &angles,
                              const Vectorf<2> source_pos
                             )
         )
-        &Room<2>::ray_tracing)
+        &Room<2>::ray_tracing,
+        py::call_guard<py::gil_scoped_release>())
     .def("ray_tracing",
         (void (Room<2>::*)(
                              size_t nb_phis,
@@ -146,28 +398,68 @@ PYBIND11_MODULE(libroom, m) {
                              const Vectorf<2> source_pos
                             )
         )
-        &Room<2>::ray_tracing)
+        &Room<2>::ray_tracing,
+        py::call_guard<py::gil_scoped_release>())
     .def("ray_tracing",
         (void (Room<2>::*)(
                              size_t n_rays,
                              const Vectorf<2> source_pos
                             )
         )
-        &Room<2>::ray_tracing)
-    .def("contains", &Room<2>::contains)
+        &Room<2>::ray_tracing,
+        py::call_guard<py::gil_scoped_release>())
+    .def("ray_tracing_adaptive", &Room<2>::ray_tracing_adaptive,
+        py::arg("batch_size"), py::arg("max_rays"), py::arg("tolerance"),
+        py::arg("source_pos"),
+        py::call_guard<py::gil_scoped_release>(),
+        "Traces rays in batches until the energy decay curves of the "
+        "microphones converge, and returns the number of rays traced and the "
+        "last relative change of the curves")
+    .def("ray_tracing_reciprocal", &Room<2>::ray_tracing_reciprocal,
+        py::arg("mic"), py::arg("source_locs"), py::arg("n_rays"),
+        py::arg("batch_size") = 0, py::arg("tolerance") = 0.f,
+        py::call_guard<py::gil_scoped_release>(),
+        "Traces rays from a microphone to detectors at the locations of the "
+        "sources, and returns the number of rays traced and the last relative "
+        "change of the energy decay curves")
+    .def("contains", &Room<2>::contains,
+        py::call_guard<py::gil_scoped_release>())
+    .def("release_image_sources", &release_image_sources<2>,
+        "Returns the image sources found by the last call to image_source_model "
+        "as a dict of arrays that take over the storage of the engine")
     .def_property_readonly_static("dim", [](py::object /* self */) { return 2; })
     .def_property("is_hybrid_sim", &Room<2>::get_is_hybrid_sim, &Room<2>::set_is_hybrid_sim)
     .def_readonly("walls", &Room<2>::walls)
-    .def_readonly("sources", &Room<2>::sources)
-    .def_readonly("orders", &Room<2>::orders)
-    .def_readonly("orders_xyz", &Room<2>::orders_xyz)
-    .def_readonly("attenuations", &Room<2>::attenuations)
-    .def_readonly("gen_walls", &Room<2>::gen_walls)
-    .def_readonly("visible_mics", &Room<2>::visible_mics)
+    .def_property_readonly("sources",
+        [](const Room<2> &r) { return used_columns(r.image_sources.locs, r.image_sources.size); },
+        py::return_value_policy::reference_internal)
+    .def_property_readonly("orders",
+        [](const Room<2> &r) { return used_columns(r.image_sources.orders, r.image_sources.size); },
+        py::return_value_policy::reference_internal)
+    .def_property_readonly("orders_xyz",
+        [](const Room<2> &r) { return used_columns(r.image_sources.orders_xyz, r.image_sources.size); },
+        py::return_value_policy::reference_internal)
+    .def_property_readonly("attenuations",
+        [](const Room<2> &r) { return used_columns(r.image_sources.attenuations, r.image_sources.size); },
+        py::return_value_policy::reference_internal)
+    .def_property_readonly("gen_walls",
+        [](const Room<2> &r) { return used_columns(r.image_sources.gen_walls, r.image_sources.size); },
+        py::return_value_policy::reference_internal)
+    .def_property_readonly("visible_mics",
+        [](const Room<2> &r) { return used_columns(r.image_sources.visible_mics, r.image_sources.size); },
+        py::return_value_policy::reference_internal)
     .def_readonly("walls", &Room<2>::walls)
     .def_readonly("obstructing_walls", &Room<2>::obstructing_walls)
     .def_readonly("microphones", &Room<2>::microphones)
+    .def_readonly("detectors", &Room<2>::detectors)
     .def_readonly("max_dist", &Room<2>::max_dist)
+    .def_readwrite("ism_n_threads", &Room<2>::ism_n_threads)
+    .def_readwrite("ism_max_dist", &Room<2>::ism_max_dist)
+    .def_readwrite("ism_min_attenuation", &Room<2>::ism_min_attenuation)
+    .def_readwrite("rt_n_threads", &Room<2>::rt_n_threads)
+    .def_readwrite("use_bvh", &Room<2>::use_bvh)
+    .def_readonly("is_shoebox", &Room<2>::is_shoebox)
+    .def(py::pickle(&room_getstate<2>, &room_setstate<2>))
     ;
 
   // The Wall class
@@ -194,6 +486,7 @@ PYBIND11_MODULE(libroom, m) {
     .def_readonly("normal", &Wall<3>::normal)
     .def_readonly("basis", &Wall<3>::basis)
     .def_readonly("flat_corners", &Wall<3>::flat_corners)
+    .def(py::pickle(&wall_getstate<3>, &wall_setstate<3>))
     ;
 
   py::enum_<Wall<3>::Isect>(wall_cls, "Isect")
@@ -227,6 +520,7 @@ PYBIND11_MODULE(libroom, m) {
     .def_readonly("normal", &Wall<2>::normal)
     .def_readonly("basis", &Wall<2>::basis)
     .def_readonly("flat_corners", &Wall<2>::flat_corners)
+    .def(py::pickle(&wall_getstate<2>, &wall_setstate<2>))
     ;
 
   // The different wall intersection cases
@@ -71,6 +71,19 @@ class Microphone
         h->reset();
     }
 
+    void merge_histograms(const Microphone<D> &other)
+    {
+      // accumulate the histograms of another copy of this microphone
+      for (size_t i = 0 ; i < histograms.size() ; i++)
+        histograms[i].merge(other.histograms[i]);
+    }
+
+    void scale_histograms(float factor)
+    {
+      for (auto &hist : histograms)
+        hist.scale(factor);
+    }
+
     const Vectorf<D> &get_loc() const
     {
       return loc;
@@ -32,21 +32,6 @@
 const double pi = 3.14159265358979323846;
 const double pi_2 = 1.57079632679489661923;
 
-size_t number_image_sources_2(size_t max_order) {
-  /*
-  ¦* The number of image sources for a given maximum order in 2D
-  ¦*/
-  return 1 + 2 * max_order * (max_order + 1);
-}
-
-size_t number_image_sources_3(size_t max_order) {
-  /*
-  ¦* The number of image sources for a given maximum order in 3D
-  ¦*/
-  size_t max_order_sq = max_order * max_order;
-  return 1 + 2 * max_order * (2 * max_order_sq + 3 * max_order + 4) / 3;
-}
-
 template<size_t D>
 Room<D>::Room(
     const std::vector<Wall<D>> &_walls,
@@ -197,6 +182,13 @@ void Room<D>::init()
 
   // Useful for ray tracing
   max_dist = get_max_distance();
+
+  // The spatial indices for the wall intersection queries
+  std::vector<int> all_walls(walls.size());
+  for (size_t i = 0 ; i < walls.size() ; i++)
+    all_walls[i] = int(i);
+  walls_bvh.build(walls, all_walls);
+  obstructing_walls_bvh.build(walls, obstructing_walls);
 }
 
 
@@ -208,8 +200,7 @@ int Room<D>::image_source_model(const Vectorf<D> &source_location)
    */
 
   // make sure the list is empty
-  while (visible_sources.size() > 0)
-    visible_sources.pop();
+  image_sources.clear(n_bands, microphones.size());
 
   if (is_shoebox)
   {
@@ -217,63 +208,43 @@ int Room<D>::image_source_model(const Vectorf<D> &source_location)
   }
   else
   {
-    // add the original (real) source
-    ImageSource<D> real_source(source_location, n_bands);
+    // The nodes on the path from the original (real) source to the
+    // current image source during the search
+    std::vector<ImageSource<D>> path(ism_order + 1, ImageSource<D>(n_bands));
+    path[0].loc = source_location;
 
     // Run the image source model algorithm
-    image_sources_dfs(real_source, ism_order);
-
-    // fill the sources array in room and return
-    return fill_sources();
-  }
-}
-
-
-template<size_t D>
-int Room<D>::fill_sources()
-{
-  int n_sources = visible_sources.size();
-
-  // Create linear arrays to store the image sources
-  if (n_sources > 0)
-  {
-    // resize all the arrays
-    sources.resize(D, n_sources);
-    orders.resize(n_sources);
-    gen_walls.resize(n_sources);
-    attenuations.resize(n_bands, n_sources);
-    visible_mics.resize(microphones.size(), n_sources);
-
-    for (int i = n_sources - 1 ; i >= 0 ; i--)
-    {
-      ImageSource<D> &top = visible_sources.top();  // sample top of stack
-
-      // fill the arrays
-      sources.col(i) = top.loc;
-      gen_walls.coeffRef(i) = top.gen_wall;
-      orders.coeffRef(i) = top.order;
-      attenuations.col(i) = top.attenuation;
-      visible_mics.col(i) = top.visible_mics;
+    if (get_n_threads(ism_n_threads, walls.size()) > 1 && ism_order > 0)
+      image_sources_dfs_parallel(path[0], ism_order);
+    else
+      image_sources_dfs(path, 0, ism_order, image_sources);
 
-      visible_sources.pop();  // unstack
-    }
+    return image_sources.size;
   }
-
-  return n_sources;
 }
 
 
 template<size_t D>
-void Room<D>::image_sources_dfs(ImageSource<D> &is, int max_order)
+void Room<D>::image_sources_dfs(
+    std::vector<ImageSource<D>> &path,
+    size_t depth,
+    int max_order,
+    ImageSourceArena<D> &output
+    )
 {
   /*
    * This function runs a depth first search (DFS) on the tree of image sources
+   *
+   * path: the image sources from the root of the search to the current one,
+   *   path[depth], the deeper nodes are used as scratch space
+   * output: where the visible image sources are appended
    */
 
-  ImageSource<D> new_is(n_bands);
+  ImageSource<D> &is = path[depth];
 
   // Check the visibility of the source from the different microphones
   bool any_visible = false;
+  size_t idx = 0;
   int m = 0;
   for (auto mic = microphones.begin() ; mic != microphones.end() ; ++mic, ++m)
   {
@@ -281,42 +252,171 @@ void Room<D>::image_sources_dfs(ImageSource<D> &is, int max_order)
     if (is_visible && !any_visible)
     {
       any_visible = is_visible;
-      is.visible_mics.resize(microphones.size());
-      is.visible_mics.setZero();
+      idx = output.push_back();
+      output.visible_mics.col(idx).setZero();
     }
     if (any_visible)
-      is.visible_mics.coeffRef(m) = is_visible;
+      output.visible_mics.coeffRef(m, idx) = is_visible;
   }
 
   if (any_visible)
-    visible_sources.push(is);  // this should push a copy onto the stack
+  {
+    // fill the arrays
+    output.locs.col(idx) = is.loc;
+    output.orders_xyz.col(idx).setZero();
+    output.attenuations.col(idx) = is.attenuation;
+    output.orders.coeffRef(idx) = is.order;
+    output.gen_walls.coeffRef(idx) = is.gen_wall;
+  }
   
   // If we reached maximal depth, stop
   if (max_order == 0)
     return;
 
+  // The children are built in the next node of the path
+  ImageSource<D> &new_is = path[depth + 1];
+
   // Then, check all the reflections across the walls
   for (size_t wi=0 ;  wi < walls.size() ; wi++)
   {
-    int dir = walls[wi].reflect(is.loc, new_is.loc);  // the reflected location
-
-    // We only check valid reflections (normals should point outward from the room
-    if (dir <= 0)
+    if (!reflect_image_source(is, wi, new_is) || is_pruned(new_is))
       continue;
 
-    // The reflection is valid, fill in the image source attributes
-    new_is.attenuation = is.attenuation * walls[wi].get_transmission();
-    if (walls[wi].scatter.maxCoeff() > 0.f && is_hybrid_sim)
-    {
-      new_is.attenuation *= (1 - walls[wi].scatter).sqrt();
-    }
-    new_is.order = is.order + 1;
-    new_is.gen_wall = wi;
-    new_is.parent = &is;
+    // Run the DFS recursion
+    image_sources_dfs(path, depth + 1, max_order - 1, output);
+  }
+}
 
-    // Run the DFS recursion (on the last element in the array, the one we just added)
-    image_sources_dfs(new_is, max_order - 1);
+
+template<size_t D>
+void Room<D>::image_sources_dfs_parallel(ImageSource<D> &is, int max_order)
+{
+  /*
+   * Runs the same depth first search as image_sources_dfs, but the subtrees
+   * rooted at the first order image sources (one per generating wall) are
+   * explored by ism_n_threads worker threads. Every subtree has its own
+   * output arena, and the arenas are concatenated in the order of the walls
+   * so that the result is identical to that of the serial search.
+   */
+
+  // The root source itself
+  std::vector<ImageSource<D>> root_path(1, is);
+  image_sources_dfs(root_path, 0, 0, image_sources);
+
+  // The first order image sources, the roots of the subtrees
+  std::vector<ImageSource<D>> subtrees;
+  for (size_t wi=0 ;  wi < walls.size() ; wi++)
+  {
+    ImageSource<D> new_is(n_bands);
+    if (reflect_image_source(is, wi, new_is) && !is_pruned(new_is))
+      subtrees.push_back(new_is);
   }
+
+  size_t n_threads = get_n_threads(ism_n_threads, subtrees.size());
+
+  // The subtrees have very different sizes, so they are handed out
+  // one at a time to the threads as they become available
+  std::vector<ImageSourceArena<D>> outputs(subtrees.size());
+  std::vector<std::exception_ptr> errors(n_threads, nullptr);
+  std::vector<std::thread> workers;
+  std::atomic<size_t> next_subtree(0);
+
+  for (size_t t(0) ; t < n_threads ; ++t)
+  {
+    workers.emplace_back(
+        [this, &subtrees, &outputs, &errors, &next_subtree, max_order, t]()
+        {
+          try
+          {
+            // every thread has its own scratch path
+            std::vector<ImageSource<D>> path(max_order, ImageSource<D>(n_bands));
+
+            size_t k;
+            while ((k = next_subtree++) < subtrees.size())
+            {
+              path[0] = subtrees[k];
+              outputs[k].clear(n_bands, microphones.size());
+              image_sources_dfs(path, 0, max_order - 1, outputs[k]);
+            }
+          }
+          catch (...)
+          {
+            errors[t] = std::current_exception();
+          }
+        }
+        );
+  }
+
+  for (auto &worker : workers)
+    worker.join();
+
+  for (auto &error : errors)
+    if (error)
+      std::rethrow_exception(error);
+
+  // concatenate the outputs in a fixed order
+  size_t n_sources = image_sources.size;
+  for (auto &output : outputs)
+    n_sources += output.size;
+  image_sources.reserve(n_sources);
+
+  for (auto &output : outputs)
+    image_sources.append(output);
+}
+
+
+template<size_t D>
+bool Room<D>::reflect_image_source(ImageSource<D> &is, size_t wi, ImageSource<D> &new_is)
+{
+  /*
+   * Fills new_is with the image of is across the wall wi
+   * Returns false if the reflection is not valid
+   */
+  int dir = walls[wi].reflect(is.loc, new_is.loc);  // the reflected location
+
+  // We only check valid reflections (normals should point outward from the room
+  if (dir <= 0)
+    return false;
+
+  // The reflection is valid, fill in the image source attributes
+  new_is.attenuation = is.attenuation * walls[wi].get_transmission();
+  if (walls[wi].scatter.maxCoeff() > 0.f && is_hybrid_sim)
+  {
+    new_is.attenuation *= (1 - walls[wi].scatter).sqrt();
+  }
+  new_is.order = is.order + 1;
+  new_is.gen_wall = wi;
+  new_is.parent = &is;
+
+  return true;
+}
+
+
+template<size_t D>
+bool Room<D>::is_pruned(const ImageSource<D> &is) const
+{
+  /*
+   * Returns true if neither the image source nor any of its descendants
+   * can contribute to the response at the microphones.
+   *
+   * The attenuation can only decrease along a branch of the tree.
+   * The distance of a visible descendant to a microphone is the length of a
+   * path going through the generating wall of the image source, which is at
+   * least the distance from the image source to the microphone (triangle
+   * inequality). The pruning is thus exact.
+   */
+  if (ism_min_attenuation > 0.f && is.attenuation.maxCoeff() < ism_min_attenuation)
+    return true;
+
+  if (std::isfinite(ism_max_dist))
+  {
+    for (auto mic = microphones.begin() ; mic != microphones.end() ; ++mic)
+      if ((mic->get_loc() - is.loc).norm() <= ism_max_dist)
+        return false;
+    return microphones.size() > 0;
+  }
+
+  return false;
 }
 
 
@@ -378,8 +478,8 @@ bool Room<D>::is_obstructed_dfs(const Vectorf<D> &p, ImageSource<D> &is)
      */
   int gen_wall_id = is.gen_wall;
 
-  // Check candidate walls for obstructions
-  for (size_t ow = 0 ; ow < obstructing_walls.size() ; ow++)
+  // Checks if one candidate wall obstructs the line of sight
+  auto obstructs = [this, &p, &is, gen_wall_id](int ow)
   {
     int wall_id = obstructing_walls[ow];
 
@@ -408,15 +508,48 @@ bool Room<D>::is_obstructed_dfs(const Vectorf<D> &p, ImageSource<D> &is)
           return true;
       }
     }
-  }
 
-  return false;
+    return false;
+  };
+
+  bool is_obstructed = false;
+
+  auto test_wall = [&obstructs, &is_obstructed](int ow)
+  {
+    is_obstructed = obstructs(ow);
+    return is_obstructed;  // stop at the first obstruction
+  };
+
+  // Check candidate walls for obstructions
+  if (use_bvh)
+    obstructing_walls_bvh.segment_query(is.loc, p, test_wall);
+  else
+    obstructing_walls_bvh.linear_query(is.loc, p, test_wall);
+
+  return is_obstructed;
 }
 
 
 template<size_t D>
 int Room<D>::image_source_shoebox(const Vectorf<D> &source)
 {
+  /*
+   * The image sources of a shoebox room are on a lattice indexed by the
+   * number of reflections along every axis. We walk the points of the L1
+   * ball of radius ism_order of the lattice in the z/y/x order.
+   *
+   * When ism_max_dist is finite, only the image sources within this
+   * distance of the bounding box of the microphones are generated. The
+   * image coordinate along an axis is non-decreasing with the lattice index
+   * so that the admissible indices form an interval along every axis.
+   *
+   * When ism_min_attenuation is positive, the image sources attenuated
+   * below it in all the bands are dropped.
+   *
+   * The lattice is walked twice, first to count the image sources, then to
+   * fill the arena directly.
+   */
+
   // precompute powers of the transmission coefficients
   std::vector<Eigen::ArrayXXf> transmission_pwr;
   for (int i(0) ; i <= ism_order ; ++i)
@@ -434,91 +567,186 @@ int Room<D>::image_source_shoebox(const Vectorf<D> &source)
   for (int i = 2 ; i <= ism_order ; ++i)
     transmission_pwr[i] = transmission_pwr[i-1] * transmission_pwr[1];
 
-  // make sure the list is empty
-  int n_image_sources = number_image_sources_3(ism_order);
-  if (D == 2)
-    n_image_sources = number_image_sources_2(ism_order);
+  // the bounding box of the microphones
+  bool is_bounded = std::isfinite(ism_max_dist) && microphones.size() > 0;
+  Vectorf<D> mic_lower, mic_upper;
+  if (is_bounded)
+  {
+    mic_lower = microphones[0].get_loc();
+    mic_upper = microphones[0].get_loc();
+    for (auto mic = microphones.begin() ; mic != microphones.end() ; ++mic)
+    {
+      mic_lower = mic_lower.cwiseMin(mic->get_loc());
+      mic_upper = mic_upper.cwiseMax(mic->get_loc());
+    }
+  }
 
-  std::vector<ImageSource<D>> image_sources(n_image_sources, ImageSource<D>(n_bands));
-  int img_src_index = 0;
-  
-  // L1 ball of room images
-  int point[3] = {0, 0, 0};
+  // The coordinate of the image source along axis d for lattice index p
+  auto image_coord = [this, &source](size_t d, int p)
+  {
+    float step = abs(p) % 2 == 1 ? shoebox_size.coeff(d) - source.coeff(d) : source.coeff(d);
+    return p * shoebox_size.coeff(d) + step;
+  };
+
+  // The distance along axis d from the image source to the bounding box
+  auto axis_gap = [&](size_t d, int p)
+  {
+    float x = image_coord(d, p);
+    return std::max(0.f, std::max(mic_lower.coeff(d) - x, x - mic_upper.coeff(d)));
+  };
+
+  // Restricts [p_min, p_max] to the indices whose images are within radius
+  // of the bounding box along axis d
+  auto axis_range = [&](size_t d, float radius_sq, int &p_min, int &p_max)
+  {
+    if (!is_bounded || p_min > p_max)
+      return;
+
+    if (radius_sq < 0.f)
+    {
+      p_max = p_min - 1;  // empty range
+      return;
+    }
+
+    // The image of index p is in [p * L, (p + 1) * L] so that we can jump
+    // close to the bounds of the interval before refining
+    float radius = sqrt(radius_sq);
+    float lower = mic_lower.coeff(d) - radius;
+    float upper = mic_upper.coeff(d) + radius;
+    float size = shoebox_size.coeff(d);
+
+    p_min = std::max(p_min, int(std::floor(lower / size)) - 1);
+    p_max = std::min(p_max, int(std::floor(upper / size)) + 1);
+
+    while (p_min <= p_max && image_coord(d, p_min) < lower)
+      p_min++;
+    while (p_min <= p_max && image_coord(d, p_max) > upper)
+      p_max--;
+  };
+
+  // The squared remaining radius after moving along axis d
+  auto residual = [&](size_t d, int p, float radius_sq)
+  {
+    if (!is_bounded)
+      return radius_sq;
+    float gap = axis_gap(d, p);
+    return radius_sq - gap * gap;
+  };
+
+  // The attenuation of the image source of index point
+  auto image_attenuation = [&](const int *point, Eigen::Ref<Eigen::VectorXf> attenuation)
+  {
+    attenuation.setOnes();
+    for (size_t d = 0 ; d < D ; d++)
+    {
+      int p1 = 0, p2 = 0;
+      if (point[d] > 0)
+      {
+        p1 = point[d]/2; 
+        p2 = (point[d]+1)/2;
+      }
+      else if (point[d] < 0)
+      {
+        p1 = abs((point[d]-1)/2);
+        p2 = abs(point[d]/2);
+      }
+      attenuation.array() *= transmission_pwr[p1].col(2*d);  // 'west' absorption factor
+      attenuation.array() *= transmission_pwr[p2].col(2*d+1);  // 'east' absorption factor
+    }
+  };
+
+  // The image sources attenuated below ism_min_attenuation in all the bands
+  // are dropped, as in the pruning of the tree of image sources
+  Eigen::VectorXf attenuation_buf(n_bands);
+  auto is_kept = [&](const int *point)
+  {
+    if (ism_min_attenuation <= 0.f)
+      return true;
+    image_attenuation(point, attenuation_buf);
+    return attenuation_buf.maxCoeff() >= ism_min_attenuation;
+  };
+
+  // Fills column idx of the output arrays with the image source of index point
+  auto fill_image_source = [&](int idx, const int *point)
+  {
+    int order = 0;
+
+    // Now compute the reflection, the order, and the multiplicative constant
+    for (size_t d = 0 ; d < D ; d++)
+    {
+      // Compute the reflected source
+      image_sources.locs.coeffRef(d, idx) = image_coord(d, point[d]);
+      image_sources.orders_xyz.coeffRef(d, idx) = point[d];
+
+      // source order is just the sum of absolute values of reflection indices
+      order += abs(point[d]);
+    }
+
+    image_attenuation(point, image_sources.attenuations.col(idx));
+
+    image_sources.orders.coeffRef(idx) = order;
+    image_sources.gen_walls.coeffRef(idx) = -1;
+    image_sources.visible_mics.col(idx).setOnes();  // everything is visible
+  };
+
+  float max_dist_sq = is_bounded ? ism_max_dist * ism_max_dist : 0.f;
+  int n_image_sources = 0;
 
   // Take 2D case into account
   int z_max = ism_order;
   if (D == 2)
     z_max = 0;
 
-  // Walk on all the points of the discrete L! ball of radius ism_order
-  for (point[2] = -z_max ; point[2] <= z_max ; point[2]++)
+  for (int pass = 0 ; pass < 2 ; pass++)
   {
-    int y_max = ism_order - abs(point[2]);
-    for (point[1] = -y_max ; point[1] <= y_max ; point[1]++)
+    if (pass == 1)
+      image_sources.resize(n_image_sources);
+
+    // L1 ball of room images
+    int point[3] = {0, 0, 0};
+    int img_src_index = 0;
+
+    // Walk on all the points of the discrete L1 ball of radius ism_order
+    int z_min = -z_max, z_top = z_max;
+    if (D == 3)
+      axis_range(2, max_dist_sq, z_min, z_top);
+
+    for (point[2] = z_min ; point[2] <= z_top ; point[2]++)
     {
-      int x_max = y_max - abs(point[1]);
-      if (x_max < 0) x_max = 0;
+      float radius_sq_z = (D == 3) ? residual(2, point[2], max_dist_sq) : max_dist_sq;
+
+      int y_max = ism_order - abs(point[2]);
+      int y_min = -y_max, y_top = y_max;
+      axis_range(1, radius_sq_z, y_min, y_top);
 
-      for (point[0] = -x_max ; point[0] <= x_max ; point[0]++)
+      for (point[1] = y_min ; point[1] <= y_top ; point[1]++)
       {
-        ImageSource<D> &is = image_sources[img_src_index++];
-        is.visible_mics.resize(microphones.size());
-        is.visible_mics.setOnes();  // everything is visible
+        float radius_sq_y = residual(1, point[1], radius_sq_z);
 
-        // Now compute the reflection, the order, and the multiplicative constant
-        for (size_t d = 0 ; d < D ; d++)
-        {
-          // Compute the reflected source
-          float step = abs(point[d]) % 2 == 1 ? shoebox_size.coeff(d) - source.coeff(d) : source.coeff(d);
-          is.loc[d] = point[d] * shoebox_size.coeff(d) + step;
-          is.order_xyz[d] = point[d];
+        int x_max = y_max - abs(point[1]);
+        if (x_max < 0) x_max = 0;
+        int x_min = -x_max, x_top = x_max;
+        axis_range(0, radius_sq_y, x_min, x_top);
 
-          // source order is just the sum of absolute values of reflection indices
-          is.order += abs(point[d]);
+        if (pass == 0 && ism_min_attenuation <= 0.f)
+        {
+          n_image_sources += std::max(0, x_top - x_min + 1);
+          continue;
+        }
 
-          // attenuation can also be computed this way
-          int p1 = 0, p2 = 0;
-          if (point[d] > 0)
-          {
-            p1 = point[d]/2; 
-            p2 = (point[d]+1)/2;
-          }
-          else if (point[d] < 0)
-          {
-            p1 = abs((point[d]-1)/2);
-            p2 = abs(point[d]/2);
-          }
-          is.attenuation *= transmission_pwr[p1].col(2*d);  // 'west' absorption factor
-          is.attenuation *= transmission_pwr[p2].col(2*d+1);  // 'east' absorption factor
+        for (point[0] = x_min ; point[0] <= x_top ; point[0]++)
+        {
+          if (!is_kept(point))
+            continue;
+          if (pass == 0)
+            n_image_sources++;
+          else
+            fill_image_source(img_src_index++, point);
         }
       }
     }
   }
 
-  // Create linear arrays to store the image sources
-  if (n_image_sources > 0)
-  {
-    // resize all the arrays
-    sources.resize(D, n_image_sources);
-    orders.resize(n_image_sources);
-    orders_xyz.resize(D, n_image_sources);
-    gen_walls.resize(n_image_sources);
-    attenuations.resize(n_bands, n_image_sources);
-    visible_mics.resize(microphones.size(), n_image_sources);
-
-    for (std::vector<int>::size_type idx = 0; idx < image_sources.size(); ++idx) {
-      ImageSource<D> &top = image_sources[idx];  // sample top of stack
-
-      // fill the arrays
-      sources.col(idx) = top.loc;
-      gen_walls.coeffRef(idx) = top.gen_wall;
-      orders.coeffRef(idx) = top.order;
-      orders_xyz.col(idx) = top.order_xyz;
-      attenuations.col(idx) = top.attenuation;
-      visible_mics.col(idx) = top.visible_mics;
-    }
-  }
-
   // return number images
   return n_image_sources;
 }
@@ -664,6 +892,10 @@ std::tuple < Vectorf<D>, int, float > Room<D>::next_wall_hit(
 
     for (auto& d : shoebox_orders)
     {
+      // there is no third axis in 2D rooms
+      if (d[0] >= int(D))
+        continue;
+
       float abs_dir0 = std::abs(dir[d[0]]);
       if (abs_dir0 < libroom_eps)
         continue;
@@ -720,9 +952,7 @@ next_plane:
     // Upperbound on the min distance that we could find
 
     // For a scattered ray, we only check the obstructing walls
-    size_t n_walls = scattered_ray ? obstructing_walls.size() : walls.size();
-
-    for (size_t i(0) ; i < n_walls ; ++i)
+    auto test_wall = [&](int i)
     {
       Wall<D> & w = scattered_ray ? walls[obstructing_walls[i]] : walls[i];
 
@@ -740,14 +970,26 @@ next_plane:
         // Compare to libroom_eps to be sure that this wall w is not the wall
         //   where 'start' is located ('intersects' could be true because of
         //   rounding errors)
-        if (temp_dist > libroom_eps && temp_dist < hit_dist)
+        // In case of a tie, the wall with the smallest index is kept so
+        //   that the result does not depend on the order of the tests
+        if (temp_dist > libroom_eps
+            && (temp_dist < hit_dist
+              || (temp_dist == hit_dist && next_wall_index > i)))
         {
           hit_dist = temp_dist;
           result = temp_hit;
           next_wall_index = i;
         }
       }
-    }
+
+      return false;  // we need to check all the candidates
+    };
+
+    const WallBVH<D> &bvh = scattered_ray ? obstructing_walls_bvh : walls_bvh;
+    if (use_bvh)
+      bvh.segment_query(start, end, test_wall);
+    else
+      bvh.linear_query(start, end, test_wall);
 
   }
 
@@ -756,13 +998,98 @@ next_plane:
 }
 
 
+template<size_t D>
+void Room<D>::build_receiver_index(
+    const std::vector<Microphone<D>> &mics,
+    ReceiverIndex<D> &index
+    ) const
+{
+  /*
+   * Builds the spatial indices over the receivers mics.
+   *
+   * A receiver is marked unobstructed from a wall when every obstructing
+   * wall is separated from the convex hull of the wall and the receiver by
+   * one of the planes of the two walls, or by their bounding boxes. All the
+   * scattered rays from that wall to the receiver are then unobstructed.
+   */
+  index.bvh.build(mics);
+
+  if (!use_bvh || is_shoebox || obstructing_walls.size() == 0)
+  {
+    index.unobstructed.resize(0, 0);
+    return;
+  }
+
+  // margin larger than the tolerance of the intersection routines
+  float margin = 10.f * libroom_eps;
+
+  // signed distances of the points to the plane of the wall
+  auto distances = [](const Wall<D> &wall, const Eigen::Matrix<float,D,Eigen::Dynamic> &points)
+  {
+    return Eigen::ArrayXf(wall.normal.transpose() * (points.colwise() - wall.origin));
+  };
+
+  index.unobstructed.resize(walls.size(), mics.size());
+
+  for (size_t w = 0 ; w < walls.size() ; w++)
+  {
+    const Wall<D> &wall = walls[w];
+    size_t n_corners = wall.corners.cols();
+
+    // the wall corners and the receiver
+    Eigen::Matrix<float,D,Eigen::Dynamic> hull(D, n_corners + 1);
+    hull.leftCols(n_corners) = wall.corners;
+
+    for (size_t k = 0 ; k < mics.size() ; k++)
+    {
+      hull.col(n_corners) = mics[k].get_loc();
+      Vectorf<D> lower = hull.rowwise().minCoeff();
+      Vectorf<D> upper = hull.rowwise().maxCoeff();
+      float mic_side = distances(wall, hull.rightCols(1))(0) > 0.f ? 1.f : -1.f;
+
+      bool unobstructed = true;
+      for (auto o : obstructing_walls)
+      {
+        // the scattered rays start on the wall itself
+        if (size_t(o) == w)
+          continue;
+
+        const Wall<D> &other = walls[o];
+
+        // the bounding boxes are disjoint
+        if ((other.corners.rowwise().minCoeff() - upper).maxCoeff() > margin
+            || (lower - other.corners.rowwise().maxCoeff()).maxCoeff() > margin)
+          continue;
+
+        // the hull is on one side of the plane of the other wall
+        Eigen::ArrayXf d_hull = distances(other, hull);
+        if (d_hull.minCoeff() > margin || d_hull.maxCoeff() < -margin)
+          continue;
+
+        // the other wall is behind the wall, as seen from the receiver
+        if ((mic_side * distances(wall, other.corners)).maxCoeff() < -margin)
+          continue;
+
+        unobstructed = false;
+        break;
+      }
+
+      index.unobstructed(w, k) = unobstructed;
+    }
+  }
+}
+
+
 template<size_t D>
 bool Room<D>::scat_ray(
     const Eigen::ArrayXf &transmitted,
     const Wall<D> &wall,
+    int wall_index,
     const Vectorf<D> &prev_last_hit,
     const Vectorf<D> &hit_point,
-    float travel_dist
+    float travel_dist,
+    std::vector<Microphone<D>> &mics,
+    const ReceiverIndex<D> &index
     )
 {
 
@@ -774,10 +1101,13 @@ bool Room<D>::scat_ray(
     float energy: The energy of the ray right after last_wall has absorbed
       a part of it
     wall: The wall object where last_hit is located
+    wall_index: The index of the wall in the room, or -1 if unknown
     prev_last_hit: (array size 2 or 3) the previous last wall hit_point position (needed to check that 
       the wall normal is correctly oriented)
     hit_point: (array size 2 or 3) defines the last wall hit position
     travel_dist: The total distance travelled by the ray from source to hit_point
+    mics: The microphones where the hits are logged
+    index: The receiver index built from mics
 
   :return : true if the scattered ray reached ALL the microphones, false otw
   */
@@ -785,17 +1115,23 @@ bool Room<D>::scat_ray(
   // Convert the energy threshold to transmission threshold (make this more efficient at some point)
   float distance_thres = time_thres * sound_speed;
 
+  // The quantities shared by all the microphones, computed once per bounce
+  int prev_side = wall.side(prev_last_hit);
+  Eigen::ArrayXf scat_energy = wall.scatter * transmitted;
+  float scat_energy_max = scat_energy.maxCoeff();
+  Eigen::ArrayXf energy(scat_energy.size());
+
   bool ret = true;  
-  for(size_t k(0); k < microphones.size(); ++k)
+  for(size_t k(0); k < mics.size(); ++k)
   {
 
-    Vectorf<D> mic_pos = microphones[k].get_loc();
+    Vectorf<D> mic_pos = mics[k].get_loc();
 
     /* 
      * We also need to check that both the microphone and the
      * previous hit point are on the same side of the wall
      */
-    if (wall.side(mic_pos) != wall.side(prev_last_hit))
+    if (wall.side(mic_pos) != prev_side)
     {
       ret = false;
       continue;
@@ -806,7 +1142,13 @@ bool Room<D>::scat_ray(
     int next_wall_index(-1);
     float hit_distance(0.);
 
-    if (!is_shoebox)
+    // The occlusion test is not needed when the receiver is known to be
+    // visible from the whole wall
+    bool unobstructed = is_shoebox
+      || (wall_index >= 0 && index.unobstructed.size() > 0
+          && index.unobstructed(wall_index, k));
+
+    if (!unobstructed)
       std::tie(dont_care, next_wall_index, hit_distance) = next_wall_hit(hit_point, mic_pos, true);
 
     // If no wall obstructs the scattered ray
@@ -824,18 +1166,17 @@ bool Room<D>::scat_ray(
       // cosine angle should be positive, but could be negative if normal is
       // facing out of room so we take abs
       float p_lambert = 2 * std::abs(wall.cosine_angle(hit_point_to_mic));
-      Eigen::VectorXf scat_trans = wall.scatter * transmitted * p_hit_equal * p_lambert;
 
       // We add an entry to output and we increment the right element
       // of scat_per_slot
-      if (travel_dist_at_mic < distance_thres && scat_trans.maxCoeff() > energy_thres)
+      // The largest band is found before scaling since the factors are positive
+      if (travel_dist_at_mic < distance_thres
+          && scat_energy_max * p_hit_equal * p_lambert > energy_thres)
       {
-        //output[k].push_back(Hit(travel_dist_at_mic, scat_trans));        
-        //microphones[k].log_histogram(output[k].back(), hit_point);
         double r_sq = double(travel_dist_at_mic) * travel_dist_at_mic;
         auto p_hit = (1 - sqrt(1 - mic_radius_sq / std::max(mic_radius_sq, r_sq)));
-        Eigen::ArrayXf energy = scat_trans / (r_sq * p_hit) ;
-        microphones[k].log_histogram(travel_dist_at_mic, energy, hit_point);
+        energy = scat_energy * p_hit_equal * p_lambert / (r_sq * p_hit);
+        mics[k].log_histogram(travel_dist_at_mic, energy, hit_point);
       }
       else
         ret = false;
@@ -854,7 +1195,9 @@ void Room<D>::simul_ray(
     float phi,
     float theta,
     const Vectorf<D> source_pos,
-    float energy_0
+    float energy_0,
+    std::vector<Microphone<D>> &mics,
+    const ReceiverIndex<D> &index
     )
 {
 
@@ -865,7 +1208,8 @@ void Room<D>::simul_ray(
    phi (azimuth) and theta (colatitude) : give the orientation of the ray (2D or 3D)
    source_pos: (array size 2 or 3) is the location of the sound source (NOT AN IMAGE SOURCE)
   energy_0: (float) the initial energy of one ray
-   output: is the std::vector that contains the entries for all the simulated rays */
+   mics: the microphones where the entries produced by the ray are logged
+   index: the receiver index built from mics */
 
   // ------------------ INIT --------------------
   // What we need to trace the ray
@@ -919,11 +1263,11 @@ void Room<D>::simul_ray(
     // Check if the specular ray hits any of the microphone
     if (!(is_hybrid_sim && specular_counter < ism_order))
     {
-      for(size_t k(0) ; k < microphones.size() ; k++)
+      auto test_mic = [&](int k)
       {
         // Compute the distance between the line defined by (start, hit_point)
         // and the center of the microphone (mic_pos)
-        Vectorf<D> to_mic = microphones[k].get_loc() - start;
+        Vectorf<D> to_mic = mics[k].get_loc() - start;
         float impact_distance = to_mic.dot(dir);
 
         bool impacts = -libroom_eps < impact_distance && impact_distance < hit_distance + libroom_eps;
@@ -945,9 +1289,18 @@ void Room<D>::simul_ray(
           auto p_hit = (1 - sqrt(1 - mic_radius_sq / std::max(mic_radius_sq, r_sq)));
           energy = transmitted / (r_sq * p_hit);
           // energy = transmitted / (travel_dist_at_mic - sqrtf(fmaxf(0.f, travel_dist_at_mic * travel_dist_at_mic - mic_radius_sq)));
-          microphones[k].log_histogram(travel_dist_at_mic, energy, start);
+          mics[k].log_histogram(travel_dist_at_mic, energy, start);
         }
-      }
+
+        return false;  // all the receivers close to the segment are tested
+      };
+
+      // Only the receivers close to the segment can be hit
+      if (use_bvh)
+        index.bvh.segment_query(start, hit_point, mic_radius, test_mic);
+      else
+        for (size_t k(0) ; k < mics.size() ; k++)
+          test_mic(int(k));
     }
 
     // Update the characteristics
@@ -961,9 +1314,12 @@ void Room<D>::simul_ray(
       scat_ray(
           transmitted,
           wall,
+          next_wall_index,
           start,
           hit_point,
-          travel_dist
+          travel_dist,
+          mics,
+          index
           );
 
       // The overall ray's energy gets decreased by the total
@@ -983,6 +1339,91 @@ void Room<D>::simul_ray(
 }
 
 
+template<size_t D>
+template<class Func>
+void Room<D>::trace_rays(
+    size_t n_rays,
+    const Vectorf<D> &source_pos,
+    float energy_0,
+    std::vector<Microphone<D>> &mics,
+    Func ray_angles
+    )
+{
+  /*
+   * Traces n_rays rays from source_pos and logs the hits in mics.
+   *
+   * ray_angles: a function that returns the pair (phi, theta) of the
+   *   orientation of the i-th ray
+   *
+   * The rays are split in contiguous blocks over rt_n_threads worker
+   * threads. Every thread logs in its own copy of the microphones that are
+   * merged, in order, at the end. The result is thus deterministic for a
+   * fixed number of threads.
+   */
+
+  size_t n_threads = get_n_threads(rt_n_threads, n_rays);
+
+  // the receivers do not move during the run, all the threads share the index
+  ReceiverIndex<D> index;
+  build_receiver_index(mics, index);
+
+  if (n_threads == 1)
+  {
+    for (size_t i(0) ; i < n_rays ; ++i)
+    {
+      auto angles = ray_angles(i);
+      simul_ray(angles.first, angles.second, source_pos, energy_0, mics, index);
+    }
+    return;
+  }
+
+  // private accumulators for all the threads
+  std::vector<std::vector<Microphone<D>>> thread_mics(n_threads, mics);
+  for (auto &mics : thread_mics)
+    for (auto &mic : mics)
+      mic.reset();
+
+  std::vector<std::exception_ptr> errors(n_threads, nullptr);
+  std::vector<std::thread> workers;
+
+  for (size_t t(0) ; t < n_threads ; ++t)
+  {
+    size_t block_start = (t * n_rays) / n_threads;
+    size_t block_end = ((t + 1) * n_rays) / n_threads;
+
+    workers.emplace_back(
+        [this, &thread_mics, &errors, &ray_angles, &source_pos, &index, energy_0, t, block_start, block_end]()
+        {
+          try
+          {
+            for (size_t i = block_start ; i < block_end ; ++i)
+            {
+              auto angles = ray_angles(i);
+              simul_ray(angles.first, angles.second, source_pos, energy_0, thread_mics[t], index);
+            }
+          }
+          catch (...)
+          {
+            errors[t] = std::current_exception();
+          }
+        }
+        );
+  }
+
+  for (auto &worker : workers)
+    worker.join();
+
+  for (auto &error : errors)
+    if (error)
+      std::rethrow_exception(error);
+
+  // merge the histograms in a fixed order
+  for (size_t t(0) ; t < n_threads ; ++t)
+    for (size_t k(0) ; k < mics.size() ; ++k)
+      mics[k].merge_histograms(thread_mics[t][k]);
+}
+
+
 template<size_t D>
 void Room<D>::ray_tracing(
   const Eigen::Matrix<float,D-1,Eigen::Dynamic> &angles,
@@ -992,16 +1433,18 @@ void Room<D>::ray_tracing(
   // float energy_0 = 2.f / (mic_radius * mic_radius * angles.cols());
   float energy_0 = 2.f / angles.cols();
 
-  for (int k(0) ; k < angles.cols() ; k++)
-  {
-    float phi = angles.coeff(0,k);
-    float theta = pi_2;
+  trace_rays(angles.cols(), source_pos, energy_0, microphones,
+      [&angles](size_t k)
+      {
+        float phi = angles.coeff(0,k);
+        float theta = pi_2;
 
-    if (D == 3)
-      theta = angles.coeff(1,k);
+        if (D == 3)
+          theta = angles.coeff(1,k);
 
-    simul_ray(phi, theta, source_pos, energy_0);
-  }
+        return std::make_pair(phi, theta);
+      }
+      );
 }
 
 
@@ -1032,34 +1475,30 @@ void Room<D>::ray_tracing(
   // initial energy of one ray
   float energy_0 = 2.f / (nb_phis * nb_thetas);
 
+  // if we work in 2D rooms, only 1 elevation angle is needed
+  size_t n_thetas = (D == 2) ? 1 : nb_thetas;
+
   // ------------------ RAY TRACING --------------------
 
-  for (size_t i(0); i < nb_phis; ++i)
-  {
-    float phi = 2 * pi * (float) i / nb_phis;
+  trace_rays(nb_phis * n_thetas, source_pos, energy_0, microphones,
+      [nb_phis, nb_thetas, n_thetas](size_t k)
+      {
+        size_t i = k / n_thetas;
+        size_t j = k % n_thetas;
 
-    for (size_t j(0); j < nb_thetas; ++j)
-    {
-      // Having a 3D uniform sampling of the sphere surrounding the room
-      float theta = std::acos(2 * ((float) j / nb_thetas) - 1);
+        float phi = 2 * pi * (float) i / nb_phis;
 
-      // For 2D, this parameter means nothing, but we set it to
-      // PI/2 to be consistent
-      if (D == 2) {
-        theta = pi_2;
-      }
+        // Having a 3D uniform sampling of the sphere surrounding the room
+        float theta = std::acos(2 * ((float) j / nb_thetas) - 1);
 
-      // Trace this ray
-      simul_ray(phi, theta, source_pos, energy_0);
+        // For 2D, this parameter means nothing, but we set it to
+        // PI/2 to be consistent
+        if (D == 2)
+          theta = pi_2;
 
-      // if we work in 2D rooms, only 1 elevation angle is needed
-      // => get out of the theta loop
-      if (D == 2)
-      {
-        break;
+        return std::make_pair(phi, theta);
       }
-    }
-  }
+      );
 }
 
 
@@ -1083,33 +1522,196 @@ void Room<D>::ray_tracing(
   float energy_0 = 2.f / n_rays;
 
   // ------------------ RAY TRACING --------------------
+  trace_fibonacci_rays(n_rays, source_pos, energy_0, 0.5f, 0.f, microphones);
+}
+
+
+template<size_t D>
+void Room<D>::trace_fibonacci_rays(
+    size_t n_rays,
+    const Vectorf<D> &source_pos,
+    float energy_0,
+    float z_shift,
+    float phi_shift,
+    std::vector<Microphone<D>> &mics
+    )
+{
   if (D == 3)
   {
     auto offset = 2.f / n_rays;
     auto increment = pi * (3.f - sqrt(5.f));  // phi increment
 
-    for (size_t i(0); i < n_rays ; ++i)
-    {
-      auto z = (i * offset - 1) + offset / 2.f;
-      auto rho = sqrt(1.f - z * z);
+    trace_rays(n_rays, source_pos, energy_0, mics,
+        [offset, increment, z_shift, phi_shift](size_t i)
+        {
+          auto z = (i * offset - 1) + offset * z_shift;
+          auto rho = sqrt(1.f - z * z);
 
-      float phi = i * increment;
+          float phi = i * increment + phi_shift;
 
-      auto x = cos(phi) * rho;
-      auto y = sin(phi) * rho;
+          auto x = cos(phi) * rho;
+          auto y = sin(phi) * rho;
 
-      auto azimuth = atan2(y, x);
-      auto colatitude = atan2(sqrt(x * x + y * y), z);
+          float azimuth = atan2(y, x);
+          float colatitude = atan2(sqrt(x * x + y * y), z);
 
-      simul_ray(azimuth, colatitude, source_pos, energy_0);
-    }
+          return std::make_pair(azimuth, colatitude);
+        }
+        );
   }
   else if (D == 2)
   {
     float offset = 2. * pi / n_rays;
-    for (size_t i(0) ; i < n_rays ; ++i)
-      simul_ray(i * offset, 0.f, source_pos, energy_0);
+    trace_rays(n_rays, source_pos, energy_0, mics,
+        [offset, phi_shift](size_t i)
+        {
+          return std::make_pair(i * offset + phi_shift * offset, 0.f);
+        }
+        );
+  }
+}
+
+
+template<size_t D>
+std::tuple<size_t, float> Room<D>::ray_tracing_adaptive(
+    size_t batch_size,
+    size_t max_rays,
+    float tolerance,
+    const Vectorf<D> source_pos
+    )
+{
+  return trace_adaptive(batch_size, max_rays, tolerance, source_pos, microphones);
+}
+
+
+template<size_t D>
+std::tuple<size_t, float> Room<D>::ray_tracing_reciprocal(
+    size_t mic,
+    const Eigen::Matrix<float,D,Eigen::Dynamic> &source_locs,
+    size_t n_rays,
+    size_t batch_size,
+    float tolerance
+    )
+{
+  /*
+   * Traces the rays from a microphone and logs the hits in spherical
+   * detectors, of the same radius as the microphones, at the locations of
+   * the sources. For omnidirectional sources and receivers, the histogram of
+   * a detector is, by reciprocity, the histogram of the microphone for rays
+   * traced from the source. This needs fewer rays than tracing from all the
+   * sources when there are more sources than microphones.
+   *
+   * When tolerance is positive, the rays are traced in batches as in
+   * ray_tracing_adaptive, otherwise, n_rays rays are traced as in
+   * ray_tracing(n_rays, ...).
+   */
+  const Vectorf<D> emitter = microphones.at(mic).get_loc();
+
+  detectors.clear();
+  for (Eigen::Index s(0) ; s < source_locs.cols() ; ++s)
+    detectors.push_back(
+        Microphone<D>(
+          source_locs.col(s), n_bands, mic_hist_res * sound_speed, time_thres * sound_speed
+          )
+        );
+
+  if (tolerance > 0.f)
+    return trace_adaptive(batch_size, n_rays, tolerance, emitter, detectors);
+
+  trace_fibonacci_rays(n_rays, emitter, 2.f / n_rays, 0.5f, 0.f, detectors);
+  return std::make_tuple(n_rays, std::numeric_limits<float>::infinity());
+}
+
+
+template<size_t D>
+std::tuple<size_t, float> Room<D>::trace_adaptive(
+    size_t batch_size,
+    size_t max_rays,
+    float tolerance,
+    const Vectorf<D> &source_pos,
+    std::vector<Microphone<D>> &mics
+    )
+{
+  /*
+   * Traces the rays in batches, and stops when the estimate of the energy
+   * decay curves (backward integrals of the histograms) of all the bands of
+   * all the microphones changes by less than `tolerance`, relative to its
+   * value, between two batches. Only the bins within 60 dB of the total
+   * energy are compared. The histograms are the average over all batches.
+   *
+   * Every batch uses the Fibonacci sphere of `ray_tracing(n_rays, ...)`
+   * shifted in elevation and rotated in azimuth by quasi-random amounts, so
+   * that the directions of the batches do not repeat. The first batch is the
+   * same as `ray_tracing(batch_size, ...)`.
+   */
+  if (batch_size == 0)
+    throw std::runtime_error("The batch size should be positive");
+
+  const float golden = 0.5f * (std::sqrt(5.f) - 1.f);
+  const float silver = std::sqrt(2.f) - 1.f;
+  const float dynamic_range = 1e-6f;
+
+  size_t n_batches_max = std::max<size_t>(1, max_rays / batch_size);
+  float energy_0 = 2.f / batch_size;
+
+  std::vector<Eigen::ArrayXXf> prev_edc(mics.size());
+  float change = std::numeric_limits<float>::infinity();
+  size_t n_batches = 0;
+
+  while (n_batches < n_batches_max)
+  {
+    float z_shift = std::fmod(0.5f + n_batches * golden, 1.f);
+    float phi_shift = z_shift - 0.5f;
+    if (D == 3)
+      phi_shift = 2.f * pi * std::fmod(n_batches * silver, 1.f);
+    trace_fibonacci_rays(batch_size, source_pos, energy_0, z_shift, phi_shift, mics);
+    n_batches++;
+
+    // the energy decay curves of the current estimate (up to a factor)
+    float batch_change = 0.f;
+    for (size_t k(0) ; k < mics.size() ; ++k)
+    {
+      Eigen::ArrayXXf edc;
+      for (auto &hist : mics[k].histograms)
+      {
+        Eigen::ArrayXXf h = hist.get_hist() / float(n_batches);
+        if (edc.size() == 0)
+          edc = Eigen::ArrayXXf::Zero(h.rows(), h.cols());
+        edc += h;
+      }
+      for (Eigen::Index c = edc.cols() - 2 ; c >= 0 ; --c)
+        edc.col(c) += edc.col(c + 1);
+
+      if (n_batches > 1)
+      {
+        auto &prev = prev_edc[k];
+        for (Eigen::Index b(0) ; b < edc.rows() ; ++b)
+        {
+          float floor = dynamic_range * edc(b, 0);
+          for (Eigen::Index c(0) ; c < edc.cols() && edc(b, c) > floor ; ++c)
+          {
+            float p = (c < prev.cols()) ? prev(b, c) : 0.f;
+            batch_change = std::max(batch_change, std::abs(edc(b, c) - p) / edc(b, c));
+          }
+        }
+      }
+
+      prev_edc[k] = std::move(edc);
+    }
+
+    if (n_batches > 1)
+    {
+      change = batch_change;
+      if (change <= tolerance)
+        break;
+    }
   }
+
+  // average the histograms of all the batches
+  for (auto &mic : mics)
+    mic.scale_histograms(1.f / n_batches);
+
+  return std::make_tuple(n_batches * batch_size, change);
 }
 
 
@@ -1177,9 +1779,8 @@ bool Room<D>::contains(const Vectorf<D> point)
       outside_point[2] -= (float)(rand() % 24 / 47);
     }
 
-    for (size_t i(0); i < n_walls; ++i)
+    auto test_wall = [&](int i)
     {
-
       Wall<D> & w = walls[i];
       int result = w.intersects(outside_point, point);
       ambiguous_intersection = ambiguous_intersection || (result > 0);
@@ -1188,7 +1789,15 @@ bool Room<D>::contains(const Vectorf<D> point)
       {
         n_intersections++;
       }
-    }
+
+      return false;  // count all the intersections
+    };
+
+    if (use_bvh)
+      walls_bvh.segment_query(outside_point, point, test_wall);
+    else
+      walls_bvh.linear_query(outside_point, point, test_wall);
+
   } while (ambiguous_intersection);
 
   // If an odd number of walls have been intersected,
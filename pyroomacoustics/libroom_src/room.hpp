@@ -32,9 +32,14 @@
 #include <Eigen/Dense>
 #include <algorithm>
 #include <ctime>
+#include <thread>
+#include <atomic>
+#include <limits>
+#include <exception>
 
 #include "common.hpp"
 #include "wall.hpp"
+#include "bvh.hpp"
 
 template<size_t D>
 struct ImageSource
@@ -48,16 +53,11 @@ struct ImageSource
   int order;
   int gen_wall;
   ImageSource *parent;
-  VectorXb visible_mics;
 
   // this is a unit vector from the center of the source pointing
   // in the direction of the path to the microphone
   Vectorf<D> source_impact_dir;
 
-  // This contains the reflection orders with respect to x/y/z axis
-  // for the shoebox image source model
-  Vectori<D> order_xyz;
-
   ImageSource(size_t n_bands)
     : order(0), gen_wall(-1), parent(NULL)
   {
@@ -74,6 +74,112 @@ struct ImageSource
   }
 };
 
+template<size_t D>
+struct ImageSourceArena
+{
+  /*
+   * A structure of arrays to store the image sources found by the image
+   * source model. The k-th image source is in the k-th column of all the
+   * arrays. Only the first `size` columns are in use. The storage grows
+   * geometrically and is kept from one run of the image source model to the
+   * next one, until it is handed over with Room::release_image_sources.
+   */
+
+  size_t size = 0;
+
+  Eigen::Matrix<float,D,Eigen::Dynamic> locs;
+  Eigen::Matrix<int,D,Eigen::Dynamic> orders_xyz;  // shoebox rooms only
+  Eigen::MatrixXf attenuations;
+  MatrixXb visible_mics;
+  Eigen::VectorXi orders;
+  Eigen::VectorXi gen_walls;
+
+  size_t capacity() const { return orders.size(); }
+
+  void clear(size_t n_bands, size_t n_mics)
+  {
+    // empty the arena, the storage is only reallocated if the number
+    // of bands or microphones changed
+    size = 0;
+    if (size_t(attenuations.rows()) != n_bands)
+      attenuations.resize(n_bands, capacity());
+    if (size_t(visible_mics.rows()) != n_mics)
+      visible_mics.resize(n_mics, capacity());
+  }
+
+  void reserve(size_t new_capacity)
+  {
+    if (new_capacity <= capacity())
+      return;
+
+    locs.conservativeResize(Eigen::NoChange, new_capacity);
+    orders_xyz.conservativeResize(Eigen::NoChange, new_capacity);
+    attenuations.conservativeResize(Eigen::NoChange, new_capacity);
+    visible_mics.conservativeResize(Eigen::NoChange, new_capacity);
+    orders.conservativeResize(new_capacity);
+    gen_walls.conservativeResize(new_capacity);
+  }
+
+  void shrink_to_fit()
+  {
+    // releases the storage of the columns that are not in use
+    if (size == capacity())
+      return;
+
+    locs.conservativeResize(Eigen::NoChange, size);
+    orders_xyz.conservativeResize(Eigen::NoChange, size);
+    attenuations.conservativeResize(Eigen::NoChange, size);
+    visible_mics.conservativeResize(Eigen::NoChange, size);
+    orders.conservativeResize(size);
+    gen_walls.conservativeResize(size);
+  }
+
+  void resize(size_t new_size)
+  {
+    reserve(new_size);
+    size = new_size;
+  }
+
+  size_t push_back()
+  {
+    // adds a column at the end and returns its index
+    if (size == capacity())
+      reserve(std::max(size_t(16), 2 * capacity()));
+    return size++;
+  }
+
+  void append(const ImageSourceArena<D> &other)
+  {
+    if (size + other.size > capacity())
+      reserve(std::max(size + other.size, 2 * capacity()));
+
+    locs.middleCols(size, other.size) = other.locs.leftCols(other.size);
+    orders_xyz.middleCols(size, other.size) = other.orders_xyz.leftCols(other.size);
+    attenuations.middleCols(size, other.size) = other.attenuations.leftCols(other.size);
+    visible_mics.middleCols(size, other.size) = other.visible_mics.leftCols(other.size);
+    orders.segment(size, other.size) = other.orders.head(other.size);
+    gen_walls.segment(size, other.size) = other.gen_walls.head(other.size);
+
+    size += other.size;
+  }
+};
+
+template<size_t D>
+struct ReceiverIndex
+{
+  /*
+   * The spatial indices over the receivers of one ray tracing run. They are
+   * built once from the receiver locations and shared by all the rays.
+   */
+  ReceiverBVH<D> bvh;
+
+  // unobstructed(w, k) is true when no obstructing wall can stand between
+  // any point of wall w and receiver k, i.e. when both lie in a convex part
+  // of the room. The occlusion test of the scattered rays is then skipped.
+  // The matrix is empty when there are no obstructing walls.
+  MatrixXb unobstructed;
+};
+
 /*
  * Structure for a room as a list of walls
  * with a few sources and microphones around
@@ -87,10 +193,17 @@ class Room
     std::vector<Wall<D>> walls;
     std::vector<int> obstructing_walls;  // List of obstructing walls
     std::vector<Microphone<D>> microphones;  // The microphones are in the room
+    std::vector<Microphone<D>> detectors;  // The receivers of the reciprocal ray tracing
     float sound_speed = 343.;  // the speed of sound in the room
 
     // Simulation parameters
     int ism_order = 0.;
+    size_t ism_n_threads = 1;  // number of threads for the image source model (0: all cores)
+    // The branches of the tree of image sources are cut when the image source
+    // is farther than ism_max_dist from all the microphones, or when its
+    // attenuation is below ism_min_attenuation in all the bands
+    float ism_max_dist = std::numeric_limits<float>::infinity();
+    float ism_min_attenuation = 0.f;
 
     // Ray tracing parameters
     float energy_thres = 1e-7;
@@ -99,6 +212,13 @@ class Room
     double mic_radius_sq = 0.15f * 0.15f;  // receiver radius in meters
     float mic_hist_res = 0.004;  // in seconds
     bool is_hybrid_sim = true;
+    size_t rt_n_threads = 1;  // number of threads for ray tracing (0: all cores)
+
+    // Use the bounding volume hierarchies for the wall intersection queries
+    // and the receiver indices for the ray tracing instead of testing all
+    // the walls and receivers. The bounding boxes of the walls are tested
+    // in both cases so that the same walls are hit.
+    bool use_bvh = true;
 
     // Special parameters for shoebox rooms
     bool is_shoebox = false;
@@ -111,16 +231,9 @@ class Room
     // 2. A distance after which a ray must have hit at least 1 wall
     float max_dist = 0.;
 
-    // This is a list of image sources
-    Eigen::Matrix<float,D,Eigen::Dynamic> sources;
-    Eigen::VectorXi gen_walls;
-    Eigen::VectorXi orders;
-    Eigen::Matrix<int, D, Eigen::Dynamic> orders_xyz;
-    Eigen::MatrixXf attenuations;
-
-    // This array will get filled by visibility status
-    // its size is n_microphones * n_sources
-    MatrixXb visible_mics;
+    // This is the list of image sources
+    // The visibility status has size n_microphones * n_sources
+    ImageSourceArena<D> image_sources;
 
     // Constructor for general rooms
     Room(
@@ -193,6 +306,13 @@ class Room
           );
     }
 
+    void set_mic_loc(size_t m, const Vectorf<D> &loc)
+    {
+      // moves a microphone, its histograms are reset
+      microphones.at(m).loc = loc;
+      microphones[m].reset();
+    }
+
     void reset_mics()
     {
       for (auto mic = microphones.begin() ; mic != microphones.end() ; ++mic)
@@ -204,6 +324,19 @@ class Room
     // Image source model methods
     int image_source_model(const Vectorf<D> &source_location);
 
+    ImageSourceArena<D> release_image_sources()
+    {
+      /*
+       * Hands over the storage of the image sources to the caller, trimmed
+       * to the image sources in use. The room starts over with an empty
+       * arena that grows again in the next run.
+       */
+      image_sources.shrink_to_fit();
+      ImageSourceArena<D> released = std::move(image_sources);
+      image_sources = ImageSourceArena<D>();
+      return released;
+    }
+
     float get_max_distance();
 
     std::tuple < Vectorf<D>, int, float > next_wall_hit(
@@ -218,14 +351,27 @@ class Room
         const Vectorf<D> &prev_last_hit,
         const Vectorf<D> &hit_point,
         float travel_dist
-        );
+        )
+    {
+      ReceiverIndex<D> index;
+      build_receiver_index(microphones, index);
+      return scat_ray(
+          transmitted, wall, -1, prev_last_hit, hit_point, travel_dist,
+          microphones, index
+          );
+    }
 
     void simul_ray(
         float phi,
         float theta,
         const Vectorf<D> source_pos,
         float energy_0
-        );
+        )
+    {
+      ReceiverIndex<D> index;
+      build_receiver_index(microphones, index);
+      simul_ray(phi, theta, source_pos, energy_0, microphones, index);
+    }
 
     void ray_tracing(
         const Eigen::Matrix<float,D-1,Eigen::Dynamic> &angles,
@@ -243,20 +389,110 @@ class Room
         const Vectorf<D> source_pos
         );
 
+    /*
+     * Traces rays in batches of batch_size until the energy decay curves of
+     * all the microphones change by less than tolerance between two batches,
+     * or max_rays rays are traced.
+     * Returns the number of rays traced and the last relative change.
+     */
+    std::tuple<size_t, float> ray_tracing_adaptive(
+        size_t batch_size,
+        size_t max_rays,
+        float tolerance,
+        const Vectorf<D> source_pos
+        );
+
+    /*
+     * Traces rays from microphone mic to detectors at the source locations.
+     * With a positive tolerance, the rays are traced adaptively.
+     * Returns the number of rays traced and the last relative change.
+     */
+    std::tuple<size_t, float> ray_tracing_reciprocal(
+        size_t mic,
+        const Eigen::Matrix<float,D,Eigen::Dynamic> &source_locs,
+        size_t n_rays,
+        size_t batch_size,
+        float tolerance
+        );
+
     bool contains(const Vectorf<D> point);
 
   private:
-    // We need a stack to store the image sources during the algorithm
-    std::stack<ImageSource<D>> visible_sources;
+    // Bounding volume hierarchies over all the walls and over the
+    // obstructing walls, built in init()
+    WallBVH<D> walls_bvh;
+    WallBVH<D> obstructing_walls_bvh;
+
+    // Ray tracing internal methods, the hits are logged in `mics` and
+    // `index` is the receiver index built from them
+    void build_receiver_index(
+        const std::vector<Microphone<D>> &mics,
+        ReceiverIndex<D> &index
+        ) const;
+
+    bool scat_ray(
+        const Eigen::ArrayXf &transmitted,
+        const Wall<D> &wall,
+        int wall_index,
+        const Vectorf<D> &prev_last_hit,
+        const Vectorf<D> &hit_point,
+        float travel_dist,
+        std::vector<Microphone<D>> &mics,
+        const ReceiverIndex<D> &index
+        );
+
+    void simul_ray(
+        float phi,
+        float theta,
+        const Vectorf<D> source_pos,
+        float energy_0,
+        std::vector<Microphone<D>> &mics,
+        const ReceiverIndex<D> &index
+        );
+
+    template<class Func>
+    void trace_rays(
+        size_t n_rays,
+        const Vectorf<D> &source_pos,
+        float energy_0,
+        std::vector<Microphone<D>> &mics,
+        Func ray_angles
+        );
+
+    // Traces n_rays rays on a Fibonacci sphere (3D) or a circle (2D) shifted
+    // by z_shift (in units of the spacing of the rays) and rotated by phi_shift
+    void trace_fibonacci_rays(
+        size_t n_rays,
+        const Vectorf<D> &source_pos,
+        float energy_0,
+        float z_shift,
+        float phi_shift,
+        std::vector<Microphone<D>> &mics
+        );
+
+    std::tuple<size_t, float> trace_adaptive(
+        size_t batch_size,
+        size_t max_rays,
+        float tolerance,
+        const Vectorf<D> &source_pos,
+        std::vector<Microphone<D>> &mics
+        );
 
     // A specialized method for the shoebox room case
     int image_source_shoebox(const Vectorf<D> &source);
 
     // Image source model internal methods
-    void image_sources_dfs(ImageSource<D> &is, int max_order);
+    void image_sources_dfs(
+        std::vector<ImageSource<D>> &path,
+        size_t depth,
+        int max_order,
+        ImageSourceArena<D> &output
+        );
+    void image_sources_dfs_parallel(ImageSource<D> &is, int max_order);
+    bool reflect_image_source(ImageSource<D> &is, size_t wi, ImageSource<D> &new_is);
+    bool is_pruned(const ImageSource<D> &is) const;
     bool is_visible_dfs(const Vectorf<D> &p, ImageSource<D> &is);
     bool is_obstructed_dfs(const Vectorf<D> &p, ImageSource<D> &is);
-    int fill_sources();
 
 };
 
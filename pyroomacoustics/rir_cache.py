@@ -0,0 +1,248 @@
+"""
+On-disk cache of room impulse responses
+=======================================
+
+Simulating the same rooms again and again, e.g., during the epochs of the
+training of a neural network, is wasteful. The
+:py:class:`~pyroomacoustics.rir_cache.RIRCache` stores the room impulse
+responses computed by :py:meth:`~pyroomacoustics.room.Room.compute_rir` in a
+directory, indexed by a hash of all the parameters of the simulation, so that
+the same simulation in another process or at a later time loads them from disk
+instead of running the simulators.
+
+.. code-block:: python
+
+    import pyroomacoustics as pra
+
+    cache = pra.rir_cache.RIRCache("/tmp/rirs", max_size=2 ** 30)
+
+    room = pra.ShoeBox([6, 5, 3], fs=16000, max_order=10)
+    room.add_source([1.0, 2.0, 1.5])
+    room.add_microphone([4.0, 3.0, 1.2])
+    room.set_rir_options(cache=cache)
+
+    # the first time, the impulse responses are computed and stored
+    room.compute_rir()
+
+    # then, they are loaded from the cache
+    room.compute_rir()
+    print(cache.hits, cache.misses)
+
+The impulse responses of a room are stored in ``.npy`` files that are memory
+mapped when loaded. The total size of the files is bounded, and the least
+recently used entries are deleted first. Since the ray tracing and the
+randomized image source model are random, a cache hit returns the realization
+of the impulse responses that was stored.
+"""
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+_rirs_suffix = ".rirs.npy"
+_lengths_suffix = ".lengths.npy"
+
+
+def hash_parameters(*params):
+    """
+    Computes a stable hash of nested parameters. The parameters can be
+    dictionaries, lists, tuples, numpy arrays, scalars, strings, ``None``,
+    and objects whose attributes are such parameters.
+
+    Returns
+    -------
+    str
+        The hexadecimal SHA-256 digest of the parameters
+    """
+    h = hashlib.sha256()
+    for p in params:
+        _update_hash(h, p)
+    return h.hexdigest()
+
+
+def _update_hash(h, obj):
+
+    if obj is None or isinstance(obj, (bool, int, float, str, np.number)):
+        # the type is part of the hash, so that 1 and 1.0 differ
+        h.update("{}:{!r};".format(type(obj).__name__, obj).encode())
+
+    elif isinstance(obj, np.ndarray):
+        obj = np.ascontiguousarray(obj)
+        h.update("ndarray:{}:{};".format(obj.dtype.str, obj.shape).encode())
+        h.update(obj.tobytes())
+
+    elif isinstance(obj, dict):
+        h.update("dict:{};".format(len(obj)).encode())
+        for key in sorted(obj, key=str):
+            _update_hash(h, key)
+            _update_hash(h, obj[key])
+
+    elif isinstance(obj, (list, tuple)):
+        h.update("list:{};".format(len(obj)).encode())
+        for item in obj:
+            _update_hash(h, item)
+
+    elif hasattr(obj, "__dict__"):
+        h.update("object:{};".format(type(obj).__name__).encode())
+        _update_hash(h, vars(obj))
+
+    else:
+        raise TypeError("Cannot hash an object of type {}".format(type(obj)))
+
+
+class RIRCache(object):
+    """
+    A size-bounded directory of room impulse responses, with least recently
+    used eviction.
+
+    The entries are stored as pairs of ``.npy`` files named after their
+    keys: the impulse responses, zero-padded to the same length, in an array
+    of shape ``(n_mics, n_sources, n_samples)``, and their lengths. The time
+    of the last use of an entry is the modification time of its files, so
+    that a directory can be shared by several processes.
+
+    Parameters
+    ----------
+    directory: str
+        The directory of the cache, created if needed
+    max_size: int, optional
+        The maximum total size of the files in bytes (default: 1 GiB)
+
+    Attributes
+    ----------
+    hits: int
+        The number of impulse responses found in the cache
+    misses: int
+        The number of impulse responses not found in the cache
+    evictions: int
+        The number of entries deleted to bound the size of the cache
+    """
+
+    def __init__(self, directory, max_size=2**30):
+
+        if max_size <= 0:
+            raise ValueError("The maximum size of the cache should be positive")
+
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + _rirs_suffix, base + _lengths_suffix
+
+    def load(self, key):
+        """
+        Loads the impulse responses of a key
+
+        Parameters
+        ----------
+        key: str
+            The key of the entry
+
+        Returns
+        -------
+        list of list of ndarray or None
+            The impulse responses, in the layout of ``Room.rir``, that are
+            read-only memory mapped arrays, or ``None`` if the key is not in
+            the cache
+        """
+        rirs_path, lengths_path = self._paths(key)
+
+        try:
+            lengths = np.load(lengths_path)
+            rirs = np.load(rirs_path, mmap_mode="r")
+            os.utime(rirs_path)
+            os.utime(lengths_path)
+        except (FileNotFoundError, ValueError):
+            # missing or being written by another process
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return [
+            [rirs[m, s, :n] for s, n in enumerate(lengths_mic)]
+            for m, lengths_mic in enumerate(lengths)
+        ]
+
+    def store(self, key, rirs):
+        """
+        Stores impulse responses and evicts the least recently used entries
+        if the cache is too large
+
+        Parameters
+        ----------
+        key: str
+            The key of the entry
+        rirs: list of list of ndarray
+            The impulse responses, in the layout of ``Room.rir``
+        """
+        lengths = np.array([[len(h) for h in rir_mic] for rir_mic in rirs])
+        array = np.zeros(lengths.shape + (np.max(lengths, initial=0),))
+        for m, rir_mic in enumerate(rirs):
+            for s, h in enumerate(rir_mic):
+                array[m, s, : len(h)] = h
+
+        # write to temporary files first so that other processes never read
+        # partial entries
+        for path, value in zip(self._paths(key), [array, lengths]):
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, value)
+            os.replace(tmp_path, path)
+
+        self._evict()
+
+    def _entries(self):
+        """Returns the entries as a list of (last use, size, key) tuples"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(_rirs_suffix):
+                continue
+            key = name[: -len(_rirs_suffix)]
+            try:
+                stats = [os.stat(p) for p in self._paths(key)]
+            except FileNotFoundError:
+                continue
+            entries.append((stats[0].st_mtime, sum(st.st_size for st in stats), key))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        size = sum(e[1] for e in entries)
+
+        for _, entry_size, key in entries:
+            if size <= self.max_size:
+                break
+            self.remove(key)
+            self.evictions += 1
+            size -= entry_size
+
+    def remove(self, key):
+        """Removes an entry from the cache"""
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        """Removes all the entries of the cache"""
+        for _, _, key in self._entries():
+            self.remove(key)
+
+    @property
+    def size(self):
+        """The total size of the entries in bytes"""
+        return sum(e[1] for e in self._entries())
+
+    def __len__(self):
+        return len(self._entries())
+
+    def __contains__(self, key):
+        return all(os.path.exists(p) for p in self._paths(key))
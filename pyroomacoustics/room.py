@@ -397,6 +397,11 @@ The simulator has the following features.
 - Air absorption: The frequency dependent absorption of the air can be turned
   by providing the keyword argument ``air_absorption=True`` to the room
   constructor.
+- Filtered synthesis: With ``room.set_rir_options(synthesis="filtered")``,
+  every image source adds a single filter, the sum of the octave band filters
+  weighted by its band-wise gains, instead of building and filtering one
+  impulse response per band. The air absorption is then applied to every
+  image source according to its distance.
 
 Here is a simple example using the hybrid simulator.
 We suggest to use ``max_order=3`` with the hybrid simulator.
@@ -423,6 +428,54 @@ A few example programs are provided in ``./examples``.
 - ``./examples/room_L_shape_3d_rt.py`` shows how to simulate a polyhedral room
 - ``./examples/room_from_stl.py`` demonstrates how to import a model from an STL file
 
+For rooms with many walls, such as those imported from meshes, the engine
+keeps a bounding volume hierarchy over the walls so that the cost of the
+intersection queries grows slowly with the number of walls. Similarly, the ray
+tracing builds a hierarchy over the microphones so that large arrays and dense
+grids of receivers remain affordable. They are used by default and can be
+turned off to compare with testing all the walls and receivers. The walls are
+then tested against the same bounding boxes, so that the results are the same.
+
+.. code-block:: python
+
+    room.room_engine.use_bvh = False
+
+
+Simulating Many Rooms in Parallel
+---------------------------------
+
+The image source model, the ray tracer, and the geometric queries of the C++
+engine (:py:func:`~pyroomacoustics.room.Room.image_source_model`,
+:py:func:`~pyroomacoustics.room.Room.ray_tracing`, ``room_engine.contains``,
+and ``room_engine.next_wall_hit``) release the Python global interpreter lock
+(GIL) while they run. It is thus possible to simulate *distinct*
+:py:obj:`~pyroomacoustics.room.Room` objects concurrently from a pool of
+threads. The same room object should not be used from several threads at the
+same time.
+
+.. code-block:: python
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    def simulate(room_dim):
+        room = pra.ShoeBox(room_dim, fs=16000, max_order=10)
+        room.add_source([1.0, 1.0, 1.0])
+        room.add_microphone([2.0, 2.0, 1.5])
+        room.compute_rir()
+        return room.rir
+
+    with ThreadPoolExecutor() as pool:
+        rirs = list(pool.map(simulate, list_of_room_dims))
+
+Within a single room, the ray tracer and the image source model of polyhedral
+rooms can also use several threads. This is set with the ``n_threads``
+arguments of :py:func:`~pyroomacoustics.room.Room.set_ray_tracing` and
+:py:func:`~pyroomacoustics.room.Room.set_ism_options`, respectively.
+
+.. code-block:: python
+
+    room.set_ism_options(n_threads=4)
+    room.set_ray_tracing(n_threads=4)
 
 
 Wall Materials
@@ -569,6 +622,40 @@ evaluate the output from blind source separation algorithms. In this case, the
 
     premix = room.simulate(return_premix=True)
 
+Moving sources and microphones
+------------------------------
+
+The sources and microphones can move along trajectories given by their
+positions at a few keyframes. The image source model, and the ray tracing, are
+only run at the keyframes, and the delays and gains of the image sources are
+interpolated in between.
+
+.. code-block:: python
+
+    # the first source moves from (1, 1, 1.5) to (5, 4, 1.5) in two seconds
+    path = np.c_[[1.0, 1.0, 1.5], [3.0, 2.5, 1.5], [5.0, 4.0, 1.5]]
+    room.simulate_trajectory([0.0, 1.0, 2.0], source_positions=[path])
+    mics_signals = room.mic_array.signals
+
+
+Saving and loading
+------------------
+
+A room, together with its image sources, ray tracing histograms, and impulse
+responses, can be saved in a directory with
+:py:meth:`~pyroomacoustics.room.Room.save`, and loaded later without running
+the simulation again. By default, the arrays are memory mapped, so that many
+processes loading the same room share them.
+
+.. code-block:: python
+
+    room.compute_rir()
+    room.save("my_room")
+
+    # later, or in another process
+    room = pra.Room.load("my_room")
+    rir = room.rir[0][0]
+
 
 Reverberation Time
 ------------------
@@ -607,7 +694,10 @@ References
 
 from __future__ import division, print_function
 
+import copy
+import json
 import math
+import os
 import warnings
 
 import numpy as np
@@ -617,12 +707,39 @@ from . import beamforming as bf
 from . import libroom
 from .acoustics import OctaveBandsFactory, rt60_eyring, rt60_sabine
 from .beamforming import MicrophoneArray
+from .convolution import _stack_filters, fft_convolve, fft_convolve_stream
 from .directivities import CardioidFamily, source_angle_shoebox
 from .experimental import measure_rt60
 from .libroom import Wall, Wall2D
 from .parameters import Material, Physics, constants, eps, make_materials
+from .rir_cache import hash_parameters
 from .soundsource import SoundSource
 from .utilities import angle_function
+from .version import __version__
+
+
+# the version of the format of the rooms saved by ``Room.save``
+_room_format_version = 1
+
+# the arrays of the sources that are saved by ``Room.save``
+_source_arrays = [
+    "images",
+    "damping",
+    "orders",
+    "orders_xyz",
+    "walls",
+    "generators",
+    "signal",
+]
+
+
+def _to_json(obj):
+    """Converts the numpy types of the manifest of a saved room"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError("Cannot save an object of type {}".format(type(obj)))
 
 
 def wall_factory(corners, absorption, scattering, name=""):
@@ -645,30 +762,70 @@ def wall_factory(corners, absorption, scattering, name=""):
         raise ValueError("Rooms can only be 2D or 3D")
 
 
-def sequence_generation(volume, duration, c, fs, max_rate=10000):
+def sequence_generation(volume, duration, c, fs, max_rate=10000, rng=None):
+    """
+    Generates the random sequence of signs used to synthesize the late
+    reverberation tail from the ray tracing histograms.
+
+    The non-zero samples are the events of a Poisson process whose rate grows
+    quadratically with time, as the density of reflections in a room, and
+    saturates at ``max_rate``. All the events are drawn at once by mapping
+    uniform points of the integrated rate back to time.
+
+    Parameters
+    ----------
+    volume: float
+        The volume of the room
+    duration: float
+        The duration of the sequence in seconds
+    c: float
+        The speed of sound
+    fs: int
+        The sampling frequency
+    max_rate: float, optional
+        The maximum number of events per second (default: 10000)
+    rng: numpy.random.Generator, optional
+        The random number generator to use. By default, the global random
+        state of numpy is used.
+
+    Returns
+    -------
+    ndarray
+        The sequence, with values in {-1, 0, 1}
+    """
+
+    if rng is None:
+        rng = np.random
 
     # repeated constant
     fpcv = 4 * np.pi * c**3 / volume
 
     # initial time
     t0 = ((2 * np.log(2)) / fpcv) ** (1.0 / 3.0)
-    times = [t0]
 
-    while times[-1] < t0 + duration:
-
-        # uniform random variable
-        z = np.random.rand()
-        # rate of the point process at this time
-        mu = np.minimum(fpcv * (t0 + times[-1]) ** 2, max_rate)
-        # time interval to next point
-        dt = np.log(1 / z) / mu
-
-        times.append(times[-1] + dt)
+    # The rate of the process is mu(t) = min(fpcv * (t0 + t) ** 2, max_rate)
+    # for t0 <= t <= t0 + duration. With u = t0 + t, the integrated rate is
+    # cubic in u up to the saturation point and then linear.
+    u_start = 2 * t0
+    u_end = u_start + duration
+    u_sat = np.clip(np.sqrt(max_rate / fpcv), u_start, u_end)
+    lambda_sat = fpcv / 3.0 * (u_sat**3 - u_start**3)
+    lambda_end = lambda_sat + max_rate * (u_end - u_sat)
+
+    # the events are uniformly distributed in the integrated rate domain
+    n_events = rng.poisson(lambda_end)
+    lambdas = rng.uniform(0.0, lambda_end, size=n_events)
+    u = np.where(
+        lambdas <= lambda_sat,
+        np.cbrt(3.0 * lambdas / fpcv + u_start**3),
+        u_sat + (lambdas - lambda_sat) / max_rate,
+    )
+    times = np.concatenate(([t0], u - t0))
 
     # convert from continuous to discrete time
-    indices = (np.array(times) * fs).astype(np.int64)
-    seq = np.zeros(indices[-1] + 1)
-    seq[indices] = np.random.choice([1, -1], size=len(indices))
+    indices = (times * fs).astype(np.int64)
+    seq = np.zeros(int((t0 + duration) * fs) + 1)
+    seq[indices] = rng.choice([1, -1], size=len(indices))
 
     return seq
 
@@ -888,6 +1045,10 @@ class Room(object):
             "rir_done": False,
         }
 
+        # the positions of the microphones and sources at the last
+        # computation of the impulse responses
+        self._simulated_positions = None
+
         # make it clear the room (C++) engine is not ready yet
         self.room_engine = None
 
@@ -903,6 +1064,12 @@ class Room(object):
         if air_absorption:
             self.set_air_absorption()
 
+        # default values for the image source model parameters
+        self.ism_args = {"n_threads": 1, "max_time": None, "min_attenuation": None}
+
+        # default values for the synthesis of the impulse responses
+        self.rir_args = {"synthesis": "time", "cache": None}
+
         # default values for ray tracing parameters
         self._set_ray_tracing_options(use_ray_tracing=ray_tracing)
 
@@ -943,6 +1110,9 @@ class Room(object):
         else:
             self.room_engine = libroom.Room(*args)
 
+        # set the parameters that are not part of the constructor
+        self._update_room_engine_params()
+
     def _update_room_engine_params(self):
 
         # Now, if it exists, set the parameters of room engine
@@ -959,6 +1129,325 @@ class Room(object):
                     and self.simulator_state["rt_needed"]
                 ),
             )
+            self.room_engine.rt_n_threads = self.rt_args["n_threads"]
+            self.room_engine.ism_n_threads = self.ism_args["n_threads"]
+            if self.ism_args["max_time"] is None:
+                self.room_engine.ism_max_dist = np.inf
+            else:
+                self.room_engine.ism_max_dist = self.c * self.ism_args["max_time"]
+            if self.ism_args["min_attenuation"] is None:
+                self.room_engine.ism_min_attenuation = 0.0
+            else:
+                self.room_engine.ism_min_attenuation = self.ism_args["min_attenuation"]
+
+    def clone(self):
+        """
+        Creates a copy of the room that can be simulated independently of
+        the original. The walls, materials, and signals are shared, whereas
+        the sources, the microphone array, and the simulation state, e.g.,
+        the image sources and the impulse responses, are new.
+
+        Returns
+        -------
+        Room
+            The copy of the room
+        """
+        new = copy.copy(self)
+
+        new.sources = [
+            SoundSource(
+                np.array(src.position),
+                signal=src.signal,
+                delay=src.delay,
+                directivity=src.directivity,
+            )
+            for src in self.sources
+        ]
+
+        if self.mic_array is not None:
+            new.mic_array = copy.copy(self.mic_array)
+            new.mic_array.R = self.mic_array.R.copy()
+            new.mic_array.center = np.array(self.mic_array.center)
+            new.mic_array.signals = None
+
+        new.simulator_state = dict(self.simulator_state)
+        for key in ["ism_done", "rt_done", "rir_done"]:
+            new.simulator_state[key] = False
+        new.ism_args = dict(self.ism_args)
+        new.rt_args = dict(self.rt_args)
+        new.rir_args = dict(self.rir_args)
+        new.wallsId = dict(self.wallsId)
+
+        new.visibility = None
+        new.rir = None
+        new._simulated_positions = None
+        new.__dict__.pop("rt_histograms", None)
+        new.__dict__.pop("rt_convergence", None)
+
+        # the engine is copied without the results of the simulations
+        new.room_engine = copy.deepcopy(self.room_engine)
+
+        return new
+
+    def save(self, path):
+        """
+        Saves the room, its sources and microphones, and the results of the
+        simulation in a directory, that is created if needed. The directory
+        contains
+
+        - ``manifest.json``: the geometry, materials, settings, and positions,
+          and the list of the arrays that are saved
+        - ``sources/<s>/<name>.npy``: the image sources of source ``s``
+          (``images``, ``damping``, ``orders``, ``orders_xyz``, ``walls``,
+          ``generators``), their ``visibility``, and the ``signal``
+        - ``rt_histograms/<m>_<s>.npy``: the ray tracing histograms of
+          microphone ``m`` and source ``s``, stacked
+        - ``rir.npy``: the impulse responses, zero-padded to the same length,
+          with shape ``(n_mics, n_sources, n_samples)``, whose lengths are in
+          the manifest
+        - ``mic_signals.npy``: the signals of the microphones
+
+        The directivities of sources and microphones cannot be saved.
+
+        Parameters
+        ----------
+        path: str
+            The directory where the room is saved
+        """
+        if any(src.directivity is not None for src in self.sources) or (
+            self.mic_array is not None and self.mic_array.directivity is not None
+        ):
+            raise NotImplementedError("Rooms with directivities cannot be saved")
+
+        def save_array(name, array):
+            filename = os.path.join(path, name + ".npy")
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            np.save(filename, array)
+
+        manifest = {
+            "format_version": _room_format_version,
+            "version": __version__,
+            "class": type(self).__name__,
+            "dim": self.dim,
+            "fs": self.fs,
+            "t0": self.t0,
+            "max_order": self.max_order,
+            "sigma2_awgn": self.sigma2_awgn,
+            "max_rand_disp": self.max_rand_disp,
+            "c": self.c,
+            "temperature": self.physics.T,
+            "humidity": self.physics.H,
+            "air_absorption": self.air_absorption,
+            "simulator_state": self.simulator_state,
+            "ism_args": self.ism_args,
+            "rt_args": self.rt_args,
+            "rir_args": {k: v for k, v in self.rir_args.items() if k != "cache"},
+            "use_bvh": self.room_engine.use_bvh,
+            "shoebox_engine": self.room_engine.is_shoebox,
+            "walls": [
+                {
+                    "name": w.name,
+                    "corners": w.corners,
+                    "absorption": w.absorption,
+                    "scattering": w.scatter,
+                }
+                for w in self.walls
+            ],
+            "sources": [],
+            "mics": None,
+            "rt_histograms": None,
+            "rt_convergence": getattr(self, "rt_convergence", None),
+            "rir_lengths": None,
+            "simulated_positions": self._simulated_positions,
+        }
+
+        if hasattr(self, "shoebox_dim"):
+            manifest["shoebox_dim"] = self.shoebox_dim
+            manifest["wall_names"] = self.wall_names
+
+        for s, src in enumerate(self.sources):
+            arrays = [
+                name for name in _source_arrays if getattr(src, name, None) is not None
+            ]
+            for name in arrays:
+                save_array("sources/{}/{}".format(s, name), getattr(src, name))
+            if self.visibility is not None and self.visibility[s] is not None:
+                save_array("sources/{}/visibility".format(s), self.visibility[s])
+                arrays.append("visibility")
+            manifest["sources"].append(
+                {"position": src.position, "delay": src.delay, "arrays": arrays}
+            )
+
+        if self.mic_array is not None:
+            manifest["mics"] = {
+                "positions": self.mic_array.R,
+                "fs": self.mic_array.fs,
+                "signals": self.mic_array.signals is not None,
+            }
+            if self.mic_array.signals is not None:
+                save_array("mic_signals", self.mic_array.signals)
+
+        if getattr(self, "rt_histograms", None) is not None:
+            manifest["rt_histograms"] = [
+                [hists is not None for hists in hists_mic]
+                for hists_mic in self.rt_histograms
+            ]
+            for m, hists_mic in enumerate(self.rt_histograms):
+                for s, hists in enumerate(hists_mic):
+                    if hists is not None:
+                        save_array("rt_histograms/{}_{}".format(m, s), hists)
+
+        if self.rir is not None:
+            manifest["rir_lengths"] = [
+                [len(h) for h in rir_mic] for rir_mic in self.rir
+            ]
+            save_array("rir", _stack_filters(self.rir))
+
+        # the manifest is written last, after all the arrays it refers to
+        with open(os.path.join(path, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2, default=_to_json)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Loads a room saved with :py:meth:`save`. The room is of the class it
+        was saved from, e.g., ``ShoeBox``, and the results of the simulation
+        do not need to be computed again.
+
+        Parameters
+        ----------
+        path: str
+            The directory where the room was saved
+        mmap: bool, optional
+            If ``True`` (default), the arrays, e.g., image sources, histograms,
+            and impulse responses, are read-only memory mapped, so that
+            several processes loading the same room share them. Otherwise,
+            they are loaded in memory.
+
+        Returns
+        -------
+        Room
+            The loaded room
+        """
+        with open(os.path.join(path, "manifest.json"), "r") as f:
+            manifest = json.load(f)
+
+        if manifest["format_version"] > _room_format_version:
+            raise ValueError(
+                "The room was saved with a newer version of pyroomacoustics "
+                "({})".format(manifest["version"])
+            )
+
+        def load_array(name):
+            return np.load(
+                os.path.join(path, name + ".npy"), mmap_mode="r" if mmap else None
+            )
+
+        room_cls = {"Room": Room, "ShoeBox": ShoeBox}[manifest["class"]]
+        room = room_cls.__new__(room_cls)
+
+        room.dim = manifest["dim"]
+        room.walls = [
+            wall_factory(
+                np.array(w["corners"], dtype=np.float32),
+                np.array(w["absorption"], dtype=np.float32),
+                np.array(w["scattering"], dtype=np.float32),
+                name=w["name"],
+            )
+            for w in manifest["walls"]
+        ]
+        room._wall_mapping()
+
+        if "shoebox_dim" in manifest:
+            room.shoebox_dim = np.array(manifest["shoebox_dim"], dtype=np.float32)
+            room.wall_names = manifest["wall_names"]
+
+        state = manifest["simulator_state"]
+        room._var_init(
+            manifest["fs"],
+            manifest["t0"],
+            manifest["max_order"],
+            manifest["sigma2_awgn"],
+            manifest["temperature"],
+            manifest["humidity"],
+            state["air_abs_needed"],
+            state["rt_needed"],
+            state["random_ism_needed"],
+            manifest["max_rand_disp"],
+        )
+        room.c = manifest["c"]
+        room.air_absorption = manifest["air_absorption"]
+        room.ism_args = manifest["ism_args"]
+        room.rt_args = manifest["rt_args"]
+        room.rir_args = dict(manifest["rir_args"], cache=None)
+
+        if manifest["shoebox_engine"]:
+            room._init_room_engine(
+                np.array(room.shoebox_dim, dtype=np.float32),
+                np.array([w.absorption for w in room.walls]).T,
+                np.array([w.scatter for w in room.walls]).T,
+            )
+            room.walls = room.room_engine.walls
+        else:
+            room._init_room_engine()
+        room.room_engine.use_bvh = manifest["use_bvh"]
+
+        room.sources = []
+        for s, src in enumerate(manifest["sources"]):
+            source = SoundSource(np.array(src["position"]), delay=src["delay"])
+            for name in src["arrays"]:
+                if name in _source_arrays:
+                    setattr(source, name, load_array("sources/{}/{}".format(s, name)))
+            room.sources.append(source)
+
+        room.mic_array = None
+        mics = manifest["mics"]
+        if mics is not None:
+            room.add_microphone_array(
+                MicrophoneArray(np.array(mics["positions"]), mics["fs"])
+            )
+            if mics["signals"]:
+                room.mic_array.signals = load_array("mic_signals")
+
+        if any("visibility" in src["arrays"] for src in manifest["sources"]):
+            room.visibility = [
+                load_array("sources/{}/visibility".format(s))
+                if "visibility" in src["arrays"]
+                else None
+                for s, src in enumerate(manifest["sources"])
+            ]
+
+        if manifest["rt_histograms"] is not None:
+            room.rt_histograms = [
+                [
+                    list(load_array("rt_histograms/{}_{}".format(m, s)))
+                    if saved
+                    else None
+                    for s, saved in enumerate(saved_mic)
+                ]
+                for m, saved_mic in enumerate(manifest["rt_histograms"])
+            ]
+
+        if manifest["rt_convergence"] is not None:
+            room.rt_convergence = manifest["rt_convergence"]
+
+        if manifest["rir_lengths"] is not None:
+            rirs = load_array("rir")
+            room.rir = [
+                [rirs[m, s, :n] for s, n in enumerate(lengths_mic)]
+                for m, lengths_mic in enumerate(manifest["rir_lengths"])
+            ]
+
+        positions = manifest["simulated_positions"]
+        if positions is not None:
+            room._simulated_positions = {
+                "mics": np.array(positions["mics"]),
+                "sources": [np.array(p) for p in positions["sources"]],
+            }
+
+        room.simulator_state = state
+
+        return room
 
     @property
     def is_multi_band(self):
@@ -975,14 +1464,38 @@ class Room(object):
         energy_thres=1e-7,
         time_thres=10.0,
         hist_bin_size=0.004,
+        n_threads=1,
+        tolerance=None,
+        batch_size=None,
+        reciprocal=False,
     ):
         """
         Activates the ray tracer.
 
+        By default, ``n_rays`` rays are traced from every source. When a
+        ``tolerance`` is set, the rays are traced in batches of
+        ``batch_size`` rays until the energy decay curves of all the bands of
+        all the microphones change by less than ``tolerance``, relative to
+        their value, between two batches, or until ``n_rays`` rays are traced.
+        The number of rays actually traced and the last relative change for
+        every source are in the ``rt_convergence`` attribute after the
+        simulation.
+
+        When ``reciprocal`` is set and there are more sources than
+        microphones, the rays are traced from the microphones instead, and
+        the hits are logged in spheres of radius ``receiver_radius`` around the
+        sources. By reciprocity, this gives the same histograms for the
+        omnidirectional sources and microphones of the ray tracer with fewer
+        launches. In this case, the entries of ``rt_convergence`` are the
+        largest number of rays and relative change over the microphones.
+        The model of the diffuse scattering of 2D rooms is not reciprocal, so
+        that the rays of 2D rooms are always traced from the sources.
+
         Parameters
         ----------
         n_rays: int, optional
-            The number of rays to shoot in the simulation
+            The number of rays to shoot in the simulation, or the maximum
+            number of rays when ``tolerance`` is set
         receiver_radius: float, optional
             The radius of the sphere around the microphone in which to
             integrate the energy (default: 0.5 m)
@@ -992,6 +1505,19 @@ class Room(object):
             The maximum time of flight of rays (default: 10 s)
         hist_bin_size: float
             The time granularity of bins in the energy histogram (default: 4 ms)
+        n_threads: int, optional
+            The number of threads used to trace the rays (default: 1). When
+            set to 0, one thread per available CPU core is used. The result
+            is deterministic for a fixed number of threads.
+        tolerance: float, optional
+            The relative change of the energy decay curves at which the ray
+            tracing stops (default: ``None``, i.e., ``n_rays`` rays are traced)
+        batch_size: int, optional
+            The number of rays traced between two checks of the convergence
+            (default: ``n_rays // 10``)
+        reciprocal: bool, optional
+            If ``True``, the rays are traced from the microphones when there
+            are more sources than microphones (default: ``False``)
         """
         self._set_ray_tracing_options(
             use_ray_tracing=True,
@@ -1000,6 +1526,10 @@ class Room(object):
             energy_thres=energy_thres,
             time_thres=time_thres,
             hist_bin_size=hist_bin_size,
+            n_threads=n_threads,
+            tolerance=tolerance,
+            batch_size=batch_size,
+            reciprocal=reciprocal,
         )
 
     def _set_ray_tracing_options(
@@ -1010,6 +1540,10 @@ class Room(object):
         energy_thres=1e-7,
         time_thres=10.0,
         hist_bin_size=0.004,
+        n_threads=1,
+        tolerance=None,
+        batch_size=None,
+        reciprocal=False,
         is_init=False,
     ):
         """
@@ -1037,6 +1571,10 @@ class Room(object):
         self.rt_args["receiver_radius"] = receiver_radius
         self.rt_args["hist_bin_size"] = hist_bin_size
 
+        if n_threads < 0:
+            raise ValueError("The number of threads should be non-negative")
+        self.rt_args["n_threads"] = n_threads
+
         # set the histogram bin size so that it is an integer number of samples
         self.rt_args["hist_bin_size_samples"] = math.floor(
             self.fs * self.rt_args["hist_bin_size"]
@@ -1079,8 +1617,100 @@ class Room(object):
 
         self.rt_args["n_rays"] = n_rays
 
+        if tolerance is not None and tolerance <= 0.0:
+            raise ValueError("The tolerance of the ray tracing should be positive")
+        if batch_size is None:
+            batch_size = max(1, n_rays // 10)
+        elif batch_size <= 0:
+            raise ValueError("The batch size of the ray tracing should be positive")
+        self.rt_args["tolerance"] = tolerance
+        self.rt_args["batch_size"] = batch_size
+        self.rt_args["reciprocal"] = reciprocal
+
         self._update_room_engine_params()
 
+    def set_ism_options(self, n_threads=1, max_time=None, min_attenuation=None):
+        """
+        Sets the options of the image source model.
+
+        The tree of image sources of non-shoebox rooms is explored up to
+        ``max_order``. The optional ``max_time`` and ``min_attenuation``
+        criteria cut the branches of the tree that cannot contribute to the
+        response. In shoebox rooms, ``max_time`` restricts the lattice of
+        image sources to those within ``c * max_time`` of the bounding box of
+        the microphones, and ``min_attenuation`` drops the image sources that
+        are too attenuated. This allows to use a larger ``max_order``, e.g.,
+        with ``max_time=room.rt60_theory()``.
+
+        Parameters
+        ----------
+        n_threads: int, optional
+            The number of threads used to explore the tree of image sources
+            of non-shoebox rooms (default: 1). The subtrees of the first
+            order image sources are explored in parallel. When set to 0, one
+            thread per available CPU core is used. The image sources found
+            are the same, and in the same order, for any number of threads.
+            The impulse responses of the microphones are also built from the
+            image sources in parallel.
+        max_time: float, optional
+            The maximum propagation time in seconds. Image sources farther
+            than ``c * max_time`` from all the microphones are dropped,
+            together with all their descendants (default: no limit)
+        min_attenuation: float, optional
+            The minimum attenuation due to the wall reflections, as an
+            amplitude factor (e.g., ``1e-3`` for -60 dB). Image sources
+            attenuated below this value in all the octave bands are dropped,
+            together with all their descendants in non-shoebox rooms
+            (default: no limit)
+        """
+        if n_threads < 0:
+            raise ValueError("The number of threads should be non-negative")
+        if max_time is not None and max_time <= 0:
+            raise ValueError("The maximum propagation time should be positive")
+        if min_attenuation is not None and min_attenuation < 0:
+            raise ValueError("The minimum attenuation should be non-negative")
+
+        self.ism_args["n_threads"] = n_threads
+        self.ism_args["max_time"] = max_time
+        self.ism_args["min_attenuation"] = min_attenuation
+
+        self._update_room_engine_params()
+
+    def set_rir_options(self, synthesis="time", cache=None):
+        """
+        Sets the options of the synthesis of the room impulse responses.
+
+        Parameters
+        ----------
+        synthesis: str, optional
+            How the part of the impulse responses due to the image sources is
+            synthesized from their delays and band-wise gains. With ``"time"``
+            (default), one impulse response is built per octave band and
+            band-pass filtered, and the air absorption is applied to the
+            filtered bands as a decay over time. With ``"filtered"``, the
+            band-wise gains of every image source, including the air
+            absorption at its distance, are interpolated by the frequency
+            responses of the octave filters into a smooth response. Every
+            image source then adds a single filter, the sum of the octave
+            filters weighted by its gains and delayed by its fractional
+            delay, so that a single full band impulse response is built per
+            microphone, without any transform. This is faster when the image
+            sources are sparse in long impulse responses, e.g., with ray
+            tracing, and slower for dense image sources of high orders.
+        cache: RIRCache, optional
+            A :py:class:`~pyroomacoustics.rir_cache.RIRCache` where the
+            impulse responses are stored, indexed by a hash of all the
+            parameters of the simulation. When the impulse responses of the
+            same simulation are found in the cache, they are loaded instead
+            of running the simulators, and the image sources and ray tracing
+            histograms of previous simulations are discarded.
+        """
+        if synthesis not in ["time", "filtered"]:
+            raise ValueError("The synthesis should be either 'time' or 'filtered'")
+
+        self.rir_args["synthesis"] = synthesis
+        self.rir_args["cache"] = cache
+
     def unset_ray_tracing(self):
         """Deactivates the ray tracer"""
         self.simulator_state["rt_needed"] = False
@@ -1967,25 +2597,41 @@ class Room(object):
             sndsrc.set_directivity(directivity)
         return self.add(sndsrc)
 
-    def image_source_model(self):
+    def image_source_model(self, sources=None):
+        """
+        Runs the image source model for the sources of the room
+
+        Parameters
+        ----------
+        sources: list of int, optional
+            The indices of the sources whose image sources are computed. By
+            default, all the sources.
+        """
 
         if not self.simulator_state["ism_needed"]:
             return
 
-        self.visibility = []
+        if sources is None:
+            sources = range(len(self.sources))
+            self.visibility = [None] * len(self.sources)
+        else:
+            self.visibility += [None] * (len(self.sources) - len(self.visibility))
 
-        for source in self.sources:
+        for s in sources:
+
+            source = self.sources[s]
 
             n_sources = self.room_engine.image_source_model(source.position)
 
             if n_sources > 0:
 
-                # Copy to python managed memory
-                source.images = self.room_engine.sources.copy()
-                source.orders = self.room_engine.orders.copy()
-                source.orders_xyz = self.room_engine.orders_xyz.copy()
-                source.walls = self.room_engine.gen_walls.copy()
-                source.damping = self.room_engine.attenuations.copy()
+                # Take over the arrays of the engine, without copy
+                image_sources = self.room_engine.release_image_sources()
+                source.images = image_sources["sources"]
+                source.orders = image_sources["orders"]
+                source.orders_xyz = image_sources["orders_xyz"]
+                source.walls = image_sources["gen_walls"]
+                source.damping = image_sources["attenuations"]
                 source.generators = -np.ones(source.walls.shape)
 
                 # if randomized image method is selected, add a small random
@@ -2002,177 +2648,436 @@ class Room(object):
                     source.images += disp
                                              
   
-                self.visibility.append(self.room_engine.visible_mics.copy())
+                self.visibility[s] = image_sources["visible_mics"]
 
                 # We need to check that microphones are indeed in the room
                 for m in range(self.mic_array.R.shape[1]):
                     # if not, it's not visible from anywhere!
                     if not self.is_inside(self.mic_array.R[:, m]):
-                        self.visibility[-1][m, :] = 0
+                        self.visibility[s][m, :] = 0
 
         # Update the state
         self.simulator_state["ism_done"] = True
 
-    def ray_tracing(self):
+    def ray_tracing(self, sources=None, mics=None):
+        """
+        Runs the ray tracing for the sources of the room
+
+        Parameters
+        ----------
+        sources: list of int, optional
+            The indices of the sources for which rays are traced. By default,
+            all the sources.
+        mics: list of int, optional
+            The indices of the microphones whose histograms are updated. By
+            default, all the microphones.
+        """
 
         if not self.simulator_state["rt_needed"]:
             return
 
+        n_mics = self.mic_array.M
+        n_sources = len(self.sources)
+
         # this will be a list of lists with
         # shape (n_mics, n_src, n_directions, n_bands, n_time_bins)
-        self.rt_histograms = [[] for r in range(self.mic_array.M)]
+        if sources is None and mics is None:
+            self.rt_histograms = [[None] * n_sources for r in range(n_mics)]
+            self.rt_convergence = [None] * n_sources
+        else:
+            self.rt_histograms += [[] for r in range(n_mics - len(self.rt_histograms))]
+            for hists in self.rt_histograms:
+                hists += [None] * (n_sources - len(hists))
+            self.rt_convergence += [None] * (n_sources - len(self.rt_convergence))
+
+        if sources is None:
+            sources = range(n_sources)
+        if mics is None:
+            mics = range(n_mics)
+
+        if self.rt_args["reciprocal"] and self.dim == 3 and len(mics) < len(sources):
+            self._reciprocal_ray_tracing(sources, mics)
+            self.simulator_state["rt_done"] = True
+            return
 
-        for s, src in enumerate(self.sources):
-            self.room_engine.ray_tracing(self.rt_args["n_rays"], src.position)
+        for s in sources:
+            position = self.sources[s].position
+            if self.rt_args["tolerance"] is None:
+                self.room_engine.ray_tracing(self.rt_args["n_rays"], position)
+            else:
+                n_rays, change = self.room_engine.ray_tracing_adaptive(
+                    self.rt_args["batch_size"],
+                    self.rt_args["n_rays"],
+                    self.rt_args["tolerance"],
+                    position,
+                )
+                self.rt_convergence[s] = {"n_rays": n_rays, "tolerance": change}
 
-            for r in range(self.mic_array.M):
-                self.rt_histograms[r].append([])
-                for h in self.room_engine.microphones[r].histograms:
-                    # get a copy of the histogram
-                    self.rt_histograms[r][s].append(h.get_hist())
+            for r in mics:
+                # get a copy of the histograms
+                self.rt_histograms[r][s] = [
+                    h.get_hist() for h in self.room_engine.microphones[r].histograms
+                ]
             # reset all the receivers' histograms
             self.room_engine.reset_mics()
 
         # update the state
         self.simulator_state["rt_done"] = True
 
-    def compute_rir(self):
+    def _reciprocal_ray_tracing(self, sources, mics):
+        """
+        Traces the rays from the microphones to detectors around the sources
+        """
+        source_locs = np.array(
+            [self.sources[s].position for s in sources], dtype=np.float32
+        ).T
+        tolerance = self.rt_args["tolerance"]
+        convergence = {"n_rays": 0, "tolerance": 0.0}
+
+        for r in mics:
+            n_rays, change = self.room_engine.ray_tracing_reciprocal(
+                r,
+                source_locs,
+                self.rt_args["n_rays"],
+                self.rt_args["batch_size"],
+                0.0 if tolerance is None else tolerance,
+            )
+            convergence["n_rays"] = max(convergence["n_rays"], n_rays)
+            convergence["tolerance"] = max(convergence["tolerance"], change)
+
+            for i, s in enumerate(sources):
+                self.rt_histograms[r][s] = [
+                    h.get_hist() for h in self.room_engine.detectors[i].histograms
+                ]
+
+        if tolerance is not None:
+            for s in sources:
+                self.rt_convergence[s] = dict(convergence)
+
+    def move_source(self, source, position):
+        """
+        Moves a source. The next computation of the room impulse responses
+        only updates the image sources, the ray tracing, and the impulse
+        responses of this source.
+
+        Parameters
+        ----------
+        source: int
+            The index of the source
+        position: array_like
+            The new position of the source
+        """
+        position = np.array(position, dtype=float)
+        if position.shape != (self.dim,):
+            raise ValueError("The position should be of shape ({},)".format(self.dim))
+        if not self.is_inside(position):
+            raise ValueError("The source must be inside the room.")
+
+        self.sources[source].position = position
+
+    def move_microphone(self, mic, position):
+        """
+        Moves a microphone. The next computation of the room impulse responses
+        only updates the impulse responses of this microphone. In shoebox
+        rooms, the image sources do not depend on the microphones and are not
+        computed again.
+
+        Parameters
+        ----------
+        mic: int
+            The index of the microphone
+        position: array_like
+            The new position of the microphone
+        """
+        position = np.array(position, dtype=float)
+        if position.shape != (self.dim,):
+            raise ValueError("The position should be of shape ({},)".format(self.dim))
+        if not self.is_inside(position):
+            raise ValueError("The microphone must be inside the room.")
+
+        self.mic_array.R[:, mic] = position
+        self.room_engine.set_mic_loc(mic, position)
+
+    def _find_moved(self):
+        """
+        Returns the sets of indices of the microphones and sources that moved
+        or were added since the last computation of the impulse responses
+        """
+        moved_mics, moved_sources = set(), set()
+
+        positions = self._simulated_positions
+        if positions is None:
+            return moved_mics, moved_sources
+
+        for m, loc in enumerate(self.mic_array.R.T):
+            old = positions["mics"]
+            if m >= old.shape[1] or not np.array_equal(loc, old[:, m]):
+                moved_mics.add(m)
+
+        for s, src in enumerate(self.sources):
+            old = positions["sources"]
+            if s >= len(old) or not np.array_equal(src.position, old[s]):
+                moved_sources.add(s)
+
+        return moved_mics, moved_sources
+
+    def _update_moved(self, moved_mics, moved_sources):
+        """
+        Updates the image sources and the ray tracing after some microphones
+        and sources moved, and returns the pairs of microphone and source
+        whose impulse responses should be computed again
+        """
+        n_mics = self.mic_array.M
+        n_sources = len(self.sources)
+        others = [s for s in range(n_sources) if s not in moved_sources]
+
+        # the microphones may have been moved directly in the array
+        for m in moved_mics:
+            self.room_engine.set_mic_loc(m, self.mic_array.R[:, m])
+
+        # the image sources of shoebox rooms only depend on the microphones
+        # through their visibility, except when they are pruned with the
+        # distance to the microphones, the attenuation does not depend on them
+        pruned = self.ism_args["max_time"] is not None
+        ism_all = len(moved_mics) > 0 and (pruned or not isinstance(self, ShoeBox))
+
+        if self.simulator_state["ism_needed"]:
+            if ism_all:
+                self.image_source_model()
+            else:
+                if len(moved_sources) > 0:
+                    self.image_source_model(sources=sorted(moved_sources))
+                for s in others:
+                    self._update_visibility(s, moved_mics)
+
+        if self.simulator_state["rt_needed"]:
+            if len(moved_sources) > 0:
+                self.ray_tracing(sources=sorted(moved_sources))
+            if len(moved_mics) > 0 and len(others) > 0:
+                self.ray_tracing(sources=others, mics=sorted(moved_mics))
+
+        if ism_all and pruned:
+            return [(m, s) for m in range(n_mics) for s in range(n_sources)]
+
+        return [
+            (m, s)
+            for m in range(n_mics)
+            for s in range(n_sources)
+            if m in moved_mics or s in moved_sources
+        ]
+
+    def _update_visibility(self, source, mics):
+        """
+        Updates the visibility of the image sources of a shoebox room, that
+        are all visible from the microphones inside the room
+        """
+        vis = self.visibility[source]
+        if not vis.flags.writeable:
+            # e.g., memory mapped by Room.load
+            vis = np.array(vis)
+            self.visibility[source] = vis
+        n_mics = self.mic_array.M
+        if vis.shape[0] < n_mics:
+            new_rows = np.ones((n_mics - vis.shape[0], vis.shape[1]), dtype=vis.dtype)
+            vis = np.concatenate((vis, new_rows), axis=0)
+            self.visibility[source] = vis
+        for m in mics:
+            vis[m, :] = 1 if self.is_inside(self.mic_array.R[:, m]) else 0
+
+    def compute_rir(self, tail_sequence="independent", rng=None):
         """
         Compute the room impulse response between every source and microphone.
+
+        When sources or microphones were moved or added since the last call,
+        either with :py:meth:`move_source` and :py:meth:`move_microphone` or
+        by changing their positions directly, only the image sources, ray
+        tracing, and impulse responses that depend on them are computed again.
+
+        Parameters
+        ----------
+        tail_sequence: str, optional
+            How the random sequences used to synthesize the reverberation
+            tails from the ray tracing histograms are obtained. With
+            ``"independent"`` (default), a new sequence is generated for every
+            pair of source and microphone. With ``"shared"``, a single sequence
+            is used for all the pairs. With ``"decorrelated"``, the pairs share
+            the times of the events of a single sequence, but the signs of the
+            events are drawn independently, which is much faster than
+            ``"independent"`` for many pairs.
+        rng: numpy.random.Generator, optional
+            The random number generator used for the reverberation tails. By
+            default, the global random state of numpy is used.
         """
 
-        if self.simulator_state["ism_needed"] and not self.simulator_state["ism_done"]:
-            self.image_source_model()
+        if tail_sequence not in ["independent", "shared", "decorrelated"]:
+            raise ValueError(
+                "The tail sequence should be one of 'independent', 'shared', "
+                "or 'decorrelated'"
+            )
 
-        if self.simulator_state["rt_needed"] and not self.simulator_state["rt_done"]:
-            self.ray_tracing()
+        if rng is None:
+            rng = np.random
+
+        n_mics = self.mic_array.M
+        n_sources = len(self.sources)
+
+        cache = self.rir_args["cache"]
+        if cache is not None:
+            cache_key = self._rir_cache_key(tail_sequence)
+            rirs = cache.load(cache_key)
+            if rirs is not None:
+                self.rir = rirs
+                self._set_simulated_positions()
+                self.simulator_state["rir_done"] = True
+                # the simulators did not run for these positions
+                self.simulator_state["ism_done"] = False
+                self.simulator_state["rt_done"] = False
+                self._clear_simulation_results()
+                return
+
+        state = self.simulator_state
+        moved_mics, moved_sources = self._find_moved()
+        incremental = (
+            state["rir_done"]
+            and (len(moved_mics) > 0 or len(moved_sources) > 0)
+            and (state["ism_done"] or not state["ism_needed"])
+            and (state["rt_done"] or not state["rt_needed"])
+        )
+
+        if incremental:
+            pairs = self._update_moved(moved_mics, moved_sources)
 
-        self.rir = []
+            self.rir += [[] for m in range(n_mics - len(self.rir))]
+            for rir_mic in self.rir:
+                rir_mic += [None] * (n_sources - len(rir_mic))
+
+        else:
+            if state["ism_needed"] and not state["ism_done"]:
+                self.image_source_model()
+
+            if state["rt_needed"] and not state["rt_done"]:
+                self.ray_tracing()
+
+            pairs = [(m, s) for m in range(n_mics) for s in range(n_sources)]
+            self.rir = [[None] * n_sources for m in range(n_mics)]
 
         volume_room = self.get_volume()
 
-        for m, mic in enumerate(self.mic_array.R.T):
-            self.rir.append([])
-            for s, src in enumerate(self.sources):
+        # fractional delay length
+        fdl = constants.get("frac_delay_length")
+        fdl2 = fdl // 2
 
-                """
-                Compute the room impulse response between the source
-                and the microphone whose position is given as an
-                argument.
-                """
-                # fractional delay length
-                fdl = constants.get("frac_delay_length")
-                fdl2 = fdl // 2
-
-                # default, just in case both ism and rt are disabled (should never happen)
-                N = fdl
-
-                if self.simulator_state["ism_needed"]:
-
-                    # compute azimuth and colatitude angles for receiver
-                    if self.mic_array.directivity is not None:
-                        angle_function_array = angle_function(src.images, mic)
-                        azimuth = angle_function_array[0]
-                        colatitude = angle_function_array[1]
-
-                    # compute azimuth and colatitude angles for source
-                    if self.sources[s].directivity is not None:
-                        azimuth_s, colatitude_s = source_angle_shoebox(
-                            image_source_loc=src.images,
-                            wall_flips=abs(src.orders_xyz),
-                            mic_loc=mic,
-                        )
+        # Do band-wise RIR construction
+        is_multi_band = self.is_multi_band
+        bws = self.octave_bands.get_bw() if is_multi_band else [self.fs / 2]
 
-                    # compute the distance from image sources
-                    dist = np.sqrt(np.sum((src.images - mic[:, None]) ** 2, axis=0))
-                    time = dist / self.c
-                    t_max = time.max()
-                    N = int(math.ceil(t_max * self.fs))
+        # the microphones of every source whose impulse responses are computed
+        mic_lists = [[m for m, s2 in pairs if s2 == s] for s in range(n_sources)]
+        mic_lists = [(s, mic_idx) for s, mic_idx in enumerate(mic_lists) if mic_idx]
 
-                else:
-                    t_max = 0.0
+        # The length of all the RIRs, without the fractional delay filter
+        # default, just in case both ism and rt are disabled (should never happen)
+        rir_lengths = {}
+        ism_dist = {}
 
-                if self.simulator_state["rt_needed"]:
+        for s, mic_idx in mic_lists:
+
+            mics = self.mic_array.R[:, mic_idx]
+            lengths = np.full(len(mic_idx), fdl, dtype=int)
+            t_max = np.zeros(len(mic_idx))
+
+            if self.simulator_state["ism_needed"]:
+
+                # compute the distance from image sources to the microphones
+                images = self.sources[s].images
+                dist = np.sqrt(
+                    np.sum((images[:, None, :] - mics[:, :, None]) ** 2, axis=0)
+                )
+                ism_dist[s] = dist
+                t_max = np.max(dist / self.c, axis=1)
+                lengths = np.ceil(t_max * self.fs).astype(int)
+
+            if self.simulator_state["rt_needed"]:
+
+                # the number of samples needed
+                # round up to multiple of the histogram bin size
+                hbss = int(self.rt_args["hist_bin_size_samples"])
+
+                for j, m in enumerate(mic_idx):
 
                     # get the maximum length from the histograms
-                    nz_bins_loc = np.nonzero(self.rt_histograms[m][s][0].sum(axis=0))[0]
+                    hist = self.rt_histograms[m][s][0]
+                    nz_bins_loc = np.nonzero(hist.sum(axis=0))[0]
                     if len(nz_bins_loc) == 0:
                         n_bins = 0
                     else:
                         n_bins = nz_bins_loc[-1] + 1
 
-                    t_max = np.maximum(t_max, n_bins * self.rt_args["hist_bin_size"])
-
-                    # the number of samples needed
-                    # round up to multiple of the histogram bin size
-                    # add the lengths of the fractional delay filter
-                    hbss = int(self.rt_args["hist_bin_size_samples"])
-                    N = int(math.ceil(t_max * self.fs / hbss) * hbss)
-
-                # this is where we will compose the RIR
-                ir = np.zeros(N + fdl)
-
-                # This is the distance travelled wrt time
-                distance_rir = np.arange(N) / self.fs * self.c
-
-                # this is the random sequence for the tail generation
-                seq = sequence_generation(volume_room, N / self.fs, self.c, self.fs)
-                seq = seq[:N]
+                    t = np.maximum(t_max[j], n_bins * self.rt_args["hist_bin_size"])
+                    lengths[j] = int(math.ceil(t * self.fs / hbss) * hbss)
 
-                # Do band-wise RIR construction
-                is_multi_band = self.is_multi_band
-                bws = self.octave_bands.get_bw() if is_multi_band else [self.fs / 2]
-                rir_bands = []
+            rir_lengths[s] = lengths
 
-                for b, bw in enumerate(bws):
+        # with the filtered synthesis, the image source part is already
+        # full band and includes the air absorption
+        filtered_synthesis = self.rir_args["synthesis"] == "filtered"
+        band_wise = self.simulator_state["rt_needed"] or not filtered_synthesis
 
-                    ir_loc = np.zeros_like(ir)
+        if self.simulator_state["ism_needed"]:
+            ism_rirs = {
+                s: self._compute_ism_rirs(s, mic_idx, ism_dist[s], bws, rir_lengths[s])
+                for s, mic_idx in mic_lists
+            }
 
-                    # IS method
-                    if self.simulator_state["ism_needed"]:
+        if self.simulator_state["rt_needed"] and tail_sequence != "independent":
+            # a single sequence long enough for all the pairs
+            max_length = max(np.max(lengths) for lengths in rir_lengths.values())
+            shared_seq = sequence_generation(
+                volume_room, max_length / self.fs, self.c, self.fs, rng=rng
+            )
 
-                        alpha = src.damping[b, :] / dist
+        for s, mic_idx in mic_lists:
+            for j, m in enumerate(mic_idx):
 
-                        if self.mic_array.directivity is not None:
+                N = rir_lengths[s][j]
 
-                            alpha *= self.mic_array.directivity[m].get_response(
-                                azimuth=azimuth,
-                                colatitude=colatitude,
-                                frequency=bw,
-                                degrees=False,
-                            )
+                # this is where we will compose the RIR
+                ir = np.zeros(N + fdl)
 
-                        if self.sources[s].directivity is not None:
-                            alpha *= self.sources[s].directivity.get_response(
-                                azimuth=azimuth_s,
-                                colatitude=colatitude_s,
-                                frequency=bw,
-                                degrees=False,
-                            )
+                # This is the distance travelled wrt time
+                distance_rir = np.arange(N) / self.fs * self.c
 
-                        # Use the Cython extension for the fractional delays
-                        from .build_rir import fast_rir_builder
+                # IS method
+                if self.simulator_state["ism_needed"] and not filtered_synthesis:
+                    rir_bands = ism_rirs[s][j, :, : N + fdl]
+                else:
+                    rir_bands = np.zeros((len(bws), N + fdl))
 
-                        vis = self.visibility[s][m, :].astype(np.int32)
-                        # we add the delay due to the factional delay filter to
-                        # the arrival times to avoid problems when propagation
-                        # is shorter than the delay to to the filter
-                        # hence: time + fdl2
-                        time_adjust = time + fdl2 / self.fs
-                        fast_rir_builder(ir_loc, time_adjust, alpha, vis, self.fs, fdl)
+                # Ray Tracing
+                if self.simulator_state["rt_needed"]:
 
-                        if is_multi_band:
-                            ir_loc = self.octave_bands.analysis(ir_loc, band=b)
+                    # this is the random sequence for the tail generation
+                    if tail_sequence == "independent":
+                        seq = sequence_generation(
+                            volume_room, N / self.fs, self.c, self.fs, rng=rng
+                        )
+                        seq = seq[:N]
+                    elif tail_sequence == "shared":
+                        seq = shared_seq[:N]
+                    else:
+                        seq = shared_seq[:N] * rng.choice([1, -1], size=N)
 
-                        ir += ir_loc
+                    # split the sequence in bands at once
+                    if is_multi_band:
+                        seq_bands = np.ascontiguousarray(
+                            self.octave_bands.analysis(seq).T
+                        )
+                    else:
+                        seq_bands = seq[None, :].copy()
 
-                    # Ray Tracing
-                    if self.simulator_state["rt_needed"]:
+                    for b, bw in enumerate(bws):
 
-                        if is_multi_band:
-                            seq_bp = self.octave_bands.analysis(seq, band=b)
-                        else:
-                            seq_bp = seq.copy()
+                        seq_bp = seq_bands[b]
 
                         # interpolate the histogram and multiply the sequence
                         seq_bp_rot = seq_bp.reshape((-1, hbss))
@@ -2189,13 +3094,10 @@ class Room(object):
                         # The bands should normally sum up to fs / 2
                         seq_bp *= np.sqrt(bw / self.fs * 2.0)
 
-                        ir_loc[fdl2 : fdl2 + N] += seq_bp
-
-                    # keep for further processing
-                    rir_bands.append(ir_loc)
+                        rir_bands[b, fdl2 : fdl2 + N] += seq_bp
 
                 # Do Air absorption
-                if self.simulator_state["air_abs_needed"]:
+                if self.simulator_state["air_abs_needed"] and band_wise:
 
                     # In case this was not multi-band, do the band pass filtering
                     if len(rir_bands) == 1:
@@ -2209,10 +3111,204 @@ class Room(object):
                 # Sum up all the bands
                 np.sum(rir_bands, axis=0, out=ir)
 
-                self.rir[-1].append(ir)
+                if self.simulator_state["ism_needed"] and filtered_synthesis:
+                    ir += ism_rirs[s][j, 0, : N + fdl]
+
+                self.rir[m][s] = ir
 
+        self._set_simulated_positions()
         self.simulator_state["rir_done"] = True
 
+        if cache is not None:
+            cache.store(cache_key, self.rir)
+
+    def _set_simulated_positions(self):
+        """Keeps the positions for which the impulse responses are computed"""
+        self._simulated_positions = {
+            "mics": self.mic_array.R.copy(),
+            "sources": [np.array(src.position) for src in self.sources],
+        }
+
+    def _clear_simulation_results(self):
+        """
+        Discards the image sources and the ray tracing histograms, which are
+        not those of the current positions when the impulse responses are
+        loaded from the cache
+        """
+        self.visibility = None
+        self.__dict__.pop("rt_histograms", None)
+        self.__dict__.pop("rt_convergence", None)
+
+        for source in self.sources:
+            # the same image sources as a new source, i.e., only the source
+            new = SoundSource(source.position)
+            for key in ["images", "damping", "generators", "walls", "orders", "I"]:
+                setattr(source, key, getattr(new, key))
+            source.__dict__.pop("orders_xyz", None)
+
+    def _rir_cache_key(self, tail_sequence):
+        """
+        Returns a hash of all the parameters that determine the impulse
+        responses, used as the key of the cache
+        """
+        return hash_parameters(
+            __version__,
+            type(self).__name__,
+            [(w.corners, w.absorption, w.scatter) for w in self.walls],
+            self.fs,
+            self.c,
+            self.max_order,
+            self.max_rand_disp,
+            self.air_absorption,
+            self.octave_bands.base_freq,
+            self.octave_bands.fs,
+            self.octave_bands.n_fft,
+            self.room_engine.use_bvh,
+            constants.get("frac_delay_length"),
+            {k: v for k, v in self.simulator_state.items() if k.endswith("_needed")},
+            {k: v for k, v in self.rt_args.items() if k != "n_threads"},
+            {k: v for k, v in self.ism_args.items() if k != "n_threads"},
+            {k: v for k, v in self.rir_args.items() if k != "cache"},
+            self.mic_array.R,
+            self.mic_array.directivity,
+            [(src.position, src.directivity) for src in self.sources],
+            tail_sequence,
+        )
+
+    def _compute_ism_rirs(self, source, mic_idx, dist, bws, rir_lengths):
+        """
+        Builds the image source part of the impulse responses of a source
+        for some microphones and all the bands.
+
+        The fractional delays of the image sources are added for all the
+        microphones and bands with a single call to the compiled RIR builder,
+        and the band-pass filters are applied to all the microphones at once.
+        With the filtered synthesis, the air absorption is included
+        in the gains of the image sources, and every image source adds a
+        single filter that is the sum of the band filters weighted by its
+        gains, so that there is a single band in the output.
+
+        Parameters
+        ----------
+        source: int
+            The index of the source
+        mic_idx: list of int
+            The indices of the microphones
+        dist: ndarray (n_mics, n_images)
+            The distances from the image sources to the microphones
+        bws: list of float
+            The bandwidths of the frequency bands
+        rir_lengths: ndarray (n_mics,)
+            The lengths of the impulse responses, without the fractional
+            delay filter
+
+        Returns
+        -------
+        ndarray (n_mics, n_bands, n_samples)
+            The band-wise impulse responses
+        """
+
+        # Use the Cython extension for the fractional delays
+        from .build_rir import fast_rir_builder_filtered, fast_rir_builder_multi
+
+        # fractional delay length
+        fdl = constants.get("frac_delay_length")
+        fdl2 = fdl // 2
+
+        mics = self.mic_array.R[:, mic_idx]
+        n_mics = mics.shape[1]
+        filtered_synthesis = self.rir_args["synthesis"] == "filtered"
+
+        src = self.sources[source]
+        time = dist / self.c
+
+        # the gains of the image sources for all the microphones and bands
+        alpha = src.damping[None, :, :] / dist[:, None, :]
+
+        for j, (m, mic) in enumerate(zip(mic_idx, mics.T)):
+
+            # compute azimuth and colatitude angles for receiver
+            if self.mic_array.directivity is not None:
+                angle_function_array = angle_function(src.images, mic)
+                azimuth = angle_function_array[0]
+                colatitude = angle_function_array[1]
+
+            # compute azimuth and colatitude angles for source
+            if src.directivity is not None:
+                azimuth_s, colatitude_s = source_angle_shoebox(
+                    image_source_loc=src.images,
+                    wall_flips=abs(src.orders_xyz),
+                    mic_loc=mic,
+                )
+
+            for b, bw in enumerate(bws):
+
+                if self.mic_array.directivity is not None:
+                    alpha[j, b] *= self.mic_array.directivity[m].get_response(
+                        azimuth=azimuth,
+                        colatitude=colatitude,
+                        frequency=bw,
+                        degrees=False,
+                    )
+
+                if src.directivity is not None:
+                    alpha[j, b] *= src.directivity.get_response(
+                        azimuth=azimuth_s,
+                        colatitude=colatitude_s,
+                        frequency=bw,
+                        degrees=False,
+                    )
+
+        if filtered_synthesis and self.simulator_state["air_abs_needed"]:
+            # the air absorption at the distance of every image source,
+            # which adds the octave bands to single band simulations
+            air_abs = np.array(self.air_absorption)
+            alpha = alpha * np.exp(-0.5 * air_abs[None, :, None] * dist[:, None, :])
+
+        vis = np.ascontiguousarray(self.visibility[source][mic_idx], dtype=np.int32)
+        # we add the delay due to the factional delay filter to
+        # the arrival times to avoid problems when propagation
+        # is shorter than the delay to to the filter
+        # hence: time + fdl2
+        time_adjust = np.ascontiguousarray(time + fdl2 / self.fs)
+        alpha = np.ascontiguousarray(alpha)
+
+        n_samples = np.max(rir_lengths) + fdl
+
+        if filtered_synthesis and alpha.shape[1] > 1:
+            # every image source adds a single filter that combines its
+            # fractional delay and the band filters weighted by its gains
+            rir = np.zeros((n_mics, n_samples))
+            fast_rir_builder_filtered(
+                rir,
+                time_adjust,
+                alpha,
+                vis,
+                self.octave_bands.get_delay_tables(fdl),
+                self.fs,
+                fdl,
+                n_threads=self.ism_args["n_threads"],
+            )
+            return rir[:, None, :]
+
+        rir = np.zeros((n_mics, alpha.shape[1], n_samples))
+        fast_rir_builder_multi(
+            rir,
+            time_adjust,
+            alpha,
+            vis,
+            self.fs,
+            fdl,
+            n_threads=self.ism_args["n_threads"],
+        )
+
+        # the signals are zero-padded up to the longest RIR, which
+        # does not change the first samples of the filtered signals
+        if rir.shape[1] > 1:
+            rir = self.octave_bands.filter_bands(rir)
+
+        return rir
+
     def simulate(
         self,
         snr=None,
@@ -2221,10 +3317,15 @@ class Room(object):
         callback_mix_kwargs={},
         return_premix=False,
         recompute_rir=False,
+        n_threads=1,
     ):
         r"""
         Simulates the microphone signal at every microphone in the array
 
+        The source signals are convolved with all the room impulse responses
+        at once by :py:func:`pyroomacoustics.convolution.fft_convolve`, which
+        switches to the overlap-save method for long signals.
+
         Parameters
         ----------
         reference_mic: int, optional
@@ -2263,6 +3364,10 @@ class Room(object):
         recompute_rir: bool, optional
             If set to ``True``, the room impulse responses will be recomputed
             prior to simulation
+        n_threads: int, optional
+            The number of threads used for the FFTs of the convolutions
+            (default: 1). When set to 0, one thread per available CPU core is
+            used.
 
         Returns
         -------
@@ -2270,8 +3375,132 @@ class Room(object):
             Depends on the value of ``return_premix`` option
         """
 
-        # import convolution routine
-        from scipy.signal import fftconvolve
+        rirs, src_signals, delays, L = self._prepare_simulation(
+            recompute_rir, n_threads
+        )
+        M, S = rirs.shape[:2]
+
+        # the delayed source signals, zero-padded to the same length
+        n_sources_samples = max(d + len(sig) for d, sig in zip(delays, src_signals))
+        sources = np.zeros((S, n_sources_samples))
+        for s, (d, sig) in enumerate(zip(delays, src_signals)):
+            sources[s, d : d + len(sig)] = sig
+
+        # the length of the convolutions
+        n_conv = sources.shape[1] + rirs.shape[2] - 1
+        workers = -1 if n_threads == 0 else n_threads
+
+        # the signals of the sources at the microphones are only needed
+        # separately for the mix callback, the normalization, or the output
+        need_premix = callback_mix is not None or snr is not None or return_premix
+
+        if need_premix:
+            # the array that will receive all the signals
+            premix_signals = np.zeros((S, M, L))
+            premix_signals[:, :, :n_conv] = fft_convolve(sources, rirs, workers=workers)
+        else:
+            signals = np.zeros((M, L))
+            signals[:, :n_conv] = fft_convolve(
+                sources, rirs, sum_signals=True, workers=workers
+            )
+
+        if callback_mix is not None:
+            # Execute user provided callback
+            signals = callback_mix(premix_signals, **callback_mix_kwargs)
+            self.sigma2_awgn = None
+
+        elif snr is not None:
+            # Normalize all signals so that
+            denom = np.std(premix_signals[:, reference_mic, :], axis=1)
+            premix_signals /= denom[:, None, None]
+            signals = np.sum(premix_signals, axis=0)
+
+            # Compute the variance of the microphone noise
+            self.sigma2_awgn = 10 ** (-snr / 10) * S
+
+        elif need_premix:
+            signals = np.sum(premix_signals, axis=0)
+
+        # add white gaussian noise if necessary
+        if self.sigma2_awgn is not None:
+            signals += np.random.normal(0.0, np.sqrt(self.sigma2_awgn), signals.shape)
+
+        # record the signals in the microphones
+        self.mic_array.record(signals, self.fs)
+
+        if return_premix:
+            return premix_signals
+
+    def simulate_stream(self, block_size=None, recompute_rir=False, n_threads=1):
+        """
+        Simulates the signals of the microphones block by block
+
+        The source signals are convolved with the room impulse responses with
+        the overlap-save method, and the blocks of the microphone signals are
+        yielded as soon as they are computed. The memory used does not depend
+        on the length of the source signals, that can be memory mapped arrays.
+        The concatenation of the blocks is the same as the signals computed
+        by :py:meth:`simulate`, except for the additive noise, if any, whose
+        samples are drawn block by block. The signals are not recorded in the
+        microphone array.
+
+        Parameters
+        ----------
+        block_size: int, optional
+            The number of samples of the blocks. By default, the blocks are
+            about three times longer than the room impulse responses.
+        recompute_rir: bool, optional
+            If set to ``True``, the room impulse responses will be recomputed
+            prior to simulation
+        n_threads: int, optional
+            The number of threads used for the FFTs of the convolutions
+            (default: 1). When set to 0, one thread per available CPU core is
+            used.
+
+        Returns
+        -------
+        generator of ndarray (n_mics, block_size)
+            The consecutive blocks of the microphone signals. The last block
+            may be shorter.
+        """
+        rirs, src_signals, delays, L = self._prepare_simulation(
+            recompute_rir, n_threads
+        )
+        workers = -1 if n_threads == 0 else n_threads
+
+        blocks = fft_convolve_stream(
+            src_signals,
+            rirs,
+            offsets=delays,
+            block_size=block_size,
+            n_samples=L,
+            workers=workers,
+        )
+
+        return self._add_noise_to_blocks(blocks)
+
+    def _add_noise_to_blocks(self, blocks):
+        """Adds white gaussian noise to a stream of signal blocks if needed"""
+        for block in blocks:
+            if self.sigma2_awgn is not None:
+                block += np.random.normal(0.0, np.sqrt(self.sigma2_awgn), block.shape)
+            yield block
+
+    def _prepare_simulation(self, recompute_rir, n_threads):
+        """
+        Checks the room is ready for the simulation and collects its inputs
+
+        Returns
+        -------
+        rirs: ndarray (n_mics, n_sources, n_taps)
+            The room impulse responses, zero-padded to the same length
+        src_signals: list of ndarray
+            The signals of the sources
+        delays: list of int
+            The delays of the sources in samples
+        n_samples: int
+            The length of the microphone signals
+        """
 
         # Throw an error if we are missing some hardware in the room
         if len(self.sources) == 0:
@@ -2279,8 +3508,18 @@ class Room(object):
         if self.mic_array is None:
             raise ValueError("There is no microphone in the room.")
 
+        if n_threads < 0:
+            raise ValueError("The number of threads should be non-negative")
+
         # compute RIR if necessary
-        if self.rir is None or len(self.rir) == 0 or recompute_rir:
+        moved_mics, moved_sources = self._find_moved()
+        if (
+            self.rir is None
+            or len(self.rir) == 0
+            or recompute_rir
+            or len(moved_mics) > 0
+            or len(moved_sources) > 0
+        ):
             self.compute_rir()
 
         # number of mics and sources
@@ -2301,47 +3540,401 @@ class Room(object):
         if L % 2 == 1:
             L += 1
 
-        # the array that will receive all the signals
-        premix_signals = np.zeros((S, M, L))
-
-        # compute the signal at every microphone in the array
-        for m in np.arange(M):
-            for s in np.arange(S):
-                sig = self.sources[s].signal
-                if sig is None:
-                    continue
-                d = int(np.floor(self.sources[s].delay * self.fs))
-                h = self.rir[m][s]
-                premix_signals[s, m, d : d + len(sig) + len(h) - 1] += fftconvolve(
-                    h, sig
+        rirs = np.zeros((M, S, int(max_len_rir)))
+        for m, s in product(range(M), range(S)):
+            rirs[m, s, : len(self.rir[m][s])] = self.rir[m][s]
+
+        src_signals = [src.signal for src in self.sources]
+        delays = [int(np.floor(src.delay * self.fs)) for src in self.sources]
+
+        return rirs, src_signals, delays, L
+
+    def simulate_trajectory(
+        self, times, source_positions=None, mic_positions=None, n_threads=1
+    ):
+        """
+        Simulates the signals of the microphones when the sources and the
+        microphones move
+
+        The positions of the sources and microphones are given at keyframes,
+        and the image source model, as well as the ray tracing if enabled,
+        only runs at the keyframes. The delays and gains of the image sources
+        are interpolated linearly between the keyframes, and the source
+        signals are rendered with time-varying fractional delays by the
+        compiled ``build_rir.fast_trajectory_render`` function, which
+        produces the Doppler effect. The reverberation tails obtained by ray
+        tracing at consecutive keyframes are crossfaded. The cost of the
+        geometry grows with the number of keyframes rather than with the
+        length of the signals.
+
+        The image sources of consecutive keyframes are matched by their
+        reflection indices in shoebox rooms, and by their order, generating
+        wall, and position in other rooms, so that the keyframes should be
+        close enough for the image sources not to move more than the source.
+        The image sources that appear or disappear are faded in or out
+        between two keyframes.
+
+        The signals are recorded in the microphone array, as with
+        :py:meth:`simulate`. The positions of the sources and microphones are
+        restored afterwards, and the image sources and impulse responses are
+        computed again by the next simulation.
+
+        Parameters
+        ----------
+        times: array_like, shape (n_keyframes,)
+            The increasing times of the keyframes, in seconds, on the time
+            axis of the microphone signals
+        source_positions: list of array_like, optional
+            For every source, either the positions at the keyframes, an array
+            of shape ``(dim, n_keyframes)``, or ``None`` for a static source.
+            By default, all the sources are static.
+        mic_positions: array_like, shape (dim, n_mics, n_keyframes), optional
+            The positions of the microphones at the keyframes. By default,
+            the microphones are static.
+        n_threads: int, optional
+            The number of threads of the renderer (default: 1). When set to 0,
+            one thread per available CPU core is used.
+        """
+        from .build_rir import fast_trajectory_render
+
+        if len(self.sources) == 0:
+            raise ValueError("There are no sound sources in the room.")
+        if self.mic_array is None:
+            raise ValueError("There is no microphone in the room.")
+        if n_threads < 0:
+            raise ValueError("The number of threads should be non-negative")
+        if not self.simulator_state["ism_needed"]:
+            raise ValueError("The trajectories require the image source model")
+        if self.simulator_state["random_ism_needed"]:
+            raise NotImplementedError(
+                "The randomized image source model is not supported with "
+                "trajectories."
+            )
+        if self.mic_array.directivity is not None or any(
+            src.directivity is not None for src in self.sources
+        ):
+            raise NotImplementedError("Directivity not supported with trajectories.")
+
+        times = np.asarray(times, dtype=float)
+        if times.ndim != 1 or len(times) == 0 or np.any(np.diff(times) <= 0.0):
+            raise ValueError("The times of the keyframes should be increasing")
+        n_keys = len(times)
+
+        n_mics = self.mic_array.M
+        n_sources = len(self.sources)
+
+        if source_positions is None:
+            source_positions = [None] * n_sources
+        if len(source_positions) != n_sources:
+            raise ValueError("There should be one trajectory per source")
+
+        src_keys = []
+        for src, pos in zip(self.sources, source_positions):
+            if pos is None:
+                pos = np.asarray(src.position, dtype=float)[:, None]
+                pos = np.repeat(pos, n_keys, axis=1)
+            pos = np.asarray(pos, dtype=float)
+            if pos.shape != (self.dim, n_keys):
+                raise ValueError(
+                    "The positions of a source should be of shape (dim, n_keyframes)"
                 )
+            src_keys.append(pos)
 
-        if callback_mix is not None:
-            # Execute user provided callback
-            signals = callback_mix(premix_signals, **callback_mix_kwargs)
-            self.sigma2_awgn = None
+        if mic_positions is None:
+            mic_keys = np.repeat(self.mic_array.R[:, :, None], n_keys, axis=2)
+        else:
+            mic_keys = np.asarray(mic_positions, dtype=float)
+            if mic_keys.shape != (self.dim, n_mics, n_keys):
+                raise ValueError(
+                    "The positions of the microphones should be of shape "
+                    "(dim, n_mics, n_keyframes)"
+                )
 
-        elif snr is not None:
-            # Normalize all signals so that
-            denom = np.std(premix_signals[:, reference_mic, :], axis=1)
-            premix_signals /= denom[:, None, None]
-            signals = np.sum(premix_signals, axis=0)
+        for p in np.concatenate(src_keys + [mic_keys.reshape((self.dim, -1))], 1).T:
+            if not self.is_inside(p):
+                raise ValueError("The trajectories must stay inside the room.")
 
-            # Compute the variance of the microphone noise
-            self.sigma2_awgn = 10 ** (-snr / 10) * S
+        # run the simulators at every keyframe
+        frames = []
+        tails = []
+        src_orig = [src.position for src in self.sources]
+        mics_orig = self.mic_array.R
+        try:
+            for k in range(n_keys):
+                self._set_positions([p[:, k] for p in src_keys], mic_keys[:, :, k])
+
+                self.image_source_model()
+                frames.append(
+                    [
+                        {
+                            "source": src.position,
+                            "images": src.images,
+                            "orders": src.orders,
+                            "orders_xyz": src.orders_xyz,
+                            "walls": src.walls,
+                            "damping": src.damping,
+                            "visibility": vis,
+                        }
+                        for src, vis in zip(self.sources, self.visibility)
+                    ]
+                )
 
+                if self.simulator_state["rt_needed"]:
+                    tails.append(self._compute_tail_rirs())
+
+        finally:
+            self._set_positions(src_orig, mics_orig)
+            self.simulator_state["ism_done"] = False
+            self.simulator_state["rt_done"] = False
+            self.simulator_state["rir_done"] = False
+            self.rir = None
+            self._simulated_positions = None
+
+        fdl = constants.get("frac_delay_length")
+        fdl2 = fdl // 2
+        key_samples = times * self.fs
+
+        # the air absorption splits single band simulations in octave bands
+        air_abs_needed = self.simulator_state["air_abs_needed"]
+        if self.is_multi_band or air_abs_needed:
+            n_bands = self.octave_bands.n_bands
         else:
-            signals = np.sum(premix_signals, axis=0)
+            n_bands = 1
+
+        renders = []
+        for s, src in enumerate(self.sources):
+
+            delays, gains = self._trajectory_image_sources(
+                [f[s] for f in frames], mic_keys, n_bands
+            )
+
+            # the delayed source signal split in bands
+            x = np.zeros(int(np.floor(src.delay * self.fs)) + len(src.signal))
+            x[len(x) - len(src.signal) :] = src.signal
+            if n_bands > 1:
+                x_bands = np.ascontiguousarray(self.octave_bands.analysis(x).T)
+            else:
+                x_bands = x[None, :]
+
+            n_out = len(x) + int(np.floor(np.max(delays))) + fdl2 + 1
+            if self.simulator_state["rt_needed"]:
+                n_out = max(n_out, len(x) + max(t.shape[2] for t in tails) - 1)
+
+            out = np.zeros((n_mics, n_out))
+            fast_trajectory_render(
+                out, x_bands, key_samples, delays, gains, fdl, n_threads=n_threads
+            )
+
+            if self.simulator_state["rt_needed"]:
+                self._add_trajectory_tails(
+                    out, x, key_samples, [t[:, s] for t in tails], n_threads
+                )
+
+            renders.append(out)
+
+        L = max(r.shape[1] for r in renders)
+        if L % 2 == 1:
+            L += 1
+        signals = np.zeros((n_mics, L))
+        for out in renders:
+            signals[:, : out.shape[1]] += out
 
         # add white gaussian noise if necessary
         if self.sigma2_awgn is not None:
             signals += np.random.normal(0.0, np.sqrt(self.sigma2_awgn), signals.shape)
 
-        # record the signals in the microphones
         self.mic_array.record(signals, self.fs)
 
-        if return_premix:
-            return premix_signals
+    def _set_positions(self, source_positions, mic_positions):
+        """Moves the sources and the microphones, also in the room engine"""
+        for src, pos in zip(self.sources, source_positions):
+            src.position = pos
+        self.mic_array.R = mic_positions
+        for m in range(mic_positions.shape[1]):
+            self.room_engine.set_mic_loc(m, mic_positions[:, m])
+
+    def _compute_tail_rirs(self):
+        """
+        Runs the ray tracing and returns the reverberation tails of the
+        impulse responses, without the image sources, in an array of shape
+        ``(n_mics, n_sources, n_taps)``
+        """
+        self.simulator_state["ism_needed"] = False
+        self.simulator_state["rt_done"] = False
+        self.simulator_state["rir_done"] = False
+        try:
+            self.compute_rir()
+        finally:
+            self.simulator_state["ism_needed"] = True
+        return _stack_filters(self.rir)
+
+    def _match_image_sources(self, frames):
+        """
+        Assigns the image sources of one source at consecutive keyframes to
+        tracks
+
+        Parameters
+        ----------
+        frames: list of dict
+            The image sources of the source at every keyframe
+
+        Returns
+        -------
+        n_tracks: int
+            The number of tracks
+        tracks: list of ndarray
+            The track of every image source of every keyframe
+        """
+        tracks = []
+
+        if isinstance(self, ShoeBox):
+            # the lattice indices identify the image sources
+            index = {}
+            for f in frames:
+                keys = map(tuple, f["orders_xyz"].T)
+                ids = [index.setdefault(key, len(index)) for key in keys]
+                tracks.append(np.array(ids, dtype=int))
+            return len(index), tracks
+
+        # the image sources move at most as much as the source, and the
+        # closest one with the same order and generating wall is matched,
+        # among a few neighbors since distinct image sources can coincide
+        n_tracks = 0
+        for k, f in enumerate(frames):
+            n_images = f["images"].shape[1]
+            ids = -np.ones(n_images, dtype=int)
+
+            prev = frames[k - 1] if k > 0 else None
+            if prev is not None and n_images > 0 and prev["images"].shape[1] > 0:
+                radius = np.linalg.norm(f["source"] - prev["source"]) + 1e-3
+                tree = spatial.cKDTree(prev["images"].T)
+                n_nn = min(4, prev["images"].shape[1])
+                dist, nearest = tree.query(
+                    f["images"].T, k=n_nn, distance_upper_bound=radius
+                )
+                dist = dist.reshape((n_images, -1))
+                nearest = nearest.reshape((n_images, -1))
+
+                # an image source continues at most one track
+                taken = np.zeros(prev["images"].shape[1], dtype=bool)
+                for c in range(n_nn):
+                    j = np.nonzero((ids < 0) & np.isfinite(dist[:, c]))[0]
+                    cand = nearest[j, c]
+                    ok = (
+                        (prev["orders"][cand] == f["orders"][j])
+                        & (prev["walls"][cand] == f["walls"][j])
+                        & ~taken[cand]
+                    )
+                    j, cand = j[ok], cand[ok]
+                    cand, first = np.unique(cand, return_index=True)
+                    ids[j[first]] = tracks[-1][cand]
+                    taken[cand] = True
+
+            new = ids < 0
+            ids[new] = np.arange(n_tracks, n_tracks + np.count_nonzero(new))
+            n_tracks += np.count_nonzero(new)
+            tracks.append(ids)
+
+        return n_tracks, tracks
+
+    def _trajectory_image_sources(self, frames, mic_keys, n_bands):
+        """
+        Computes the delays and gains of the tracks of the image sources of
+        one source at the keyframes
+
+        Parameters
+        ----------
+        frames: list of dict
+            The image sources of the source at every keyframe
+        mic_keys: ndarray (dim, n_mics, n_keyframes)
+            The positions of the microphones at the keyframes
+        n_bands: int
+            The number of frequency bands of the gains
+
+        Returns
+        -------
+        delays: ndarray (n_mics, n_tracks, n_keyframes)
+            The delays in samples, including the half length of the fractional
+            delay filter
+        gains: ndarray (n_mics, n_tracks, n_keyframes, n_bands)
+            The gains in every frequency band
+        """
+        n_keys = len(frames)
+        n_mics = mic_keys.shape[1]
+        n_tracks, tracks = self._match_image_sources(frames)
+
+        images = np.full((self.dim, n_tracks, n_keys), np.nan)
+        damping = np.zeros((n_tracks, n_keys, n_bands))
+        visibility = np.zeros((n_mics, n_tracks, n_keys))
+        for k, (f, ids) in enumerate(zip(frames, tracks)):
+            images[:, ids, k] = f["images"]
+            damping[ids, k, :] = f["damping"].T
+            visibility[:, ids, k] = f["visibility"]
+
+        # the missing image sources stay at the position of the closest
+        # keyframe where they exist, with a zero gain
+        present = ~np.isnan(images[0])
+        last = np.maximum.accumulate(np.where(present, np.arange(n_keys), -1), 1)
+        first = np.argmax(present, axis=1)
+        last = np.where(last < 0, first[:, None], last)
+        images = np.take_along_axis(images, last[None, :, :], axis=2)
+
+        dist = np.sqrt(
+            np.sum((images[:, None, :, :] - mic_keys[:, :, None, :]) ** 2, axis=0)
+        )
+        fdl2 = constants.get("frac_delay_length") // 2
+        delays = np.ascontiguousarray(dist * self.fs / self.c + fdl2)
+
+        gains = damping[None, :, :, :] * (visibility / dist)[:, :, :, None]
+        if self.simulator_state["air_abs_needed"]:
+            air_abs = np.array(self.air_absorption)
+            gains *= np.exp(-0.5 * air_abs * dist[:, :, :, None])
+
+        return delays, np.ascontiguousarray(gains)
+
+    def _add_trajectory_tails(self, out, x, key_samples, tails, n_threads):
+        """
+        Adds the signal of one source convolved with the reverberation tails
+        of the keyframes, crossfaded linearly between the keyframes
+
+        Parameters
+        ----------
+        out: ndarray (n_mics, n_samples)
+            The microphone signals
+        x: ndarray
+            The delayed signal of the source
+        key_samples: ndarray
+            The times of the keyframes in samples
+        tails: list of ndarray (n_mics, n_taps)
+            The reverberation tails at every keyframe
+        """
+        n_keys = len(key_samples)
+        n_out = out.shape[1]
+        workers = -1 if n_threads == 0 else n_threads
+
+        for k, tail in enumerate(tails):
+
+            # the samples where the weight of this keyframe is not zero
+            n0 = 0 if k == 0 else int(np.ceil(key_samples[k - 1]))
+            n1 = n_out if k == n_keys - 1 else int(np.ceil(key_samples[k + 1]))
+            n0, n1 = max(0, n0), min(n_out, n1)
+            if n0 >= n1:
+                continue
+
+            start = max(0, n0 - tail.shape[1] + 1)
+            segment = x[start : min(n1, len(x))]
+            if len(segment) == 0:
+                continue
+
+            y = fft_convolve(
+                segment[None, :], tail[:, None, :], sum_signals=True, workers=workers
+            )
+            y = y[:, n0 - start : n1 - start]
+
+            weights = np.interp(
+                np.arange(n0, n0 + y.shape[1]), key_samples, np.eye(n_keys)[k]
+            )
+            out[:, n0 : n0 + y.shape[1]] += weights * y
 
     def direct_snr(self, x, source=0):
         """Computes the direct Signal-to-Noise Ratio"""
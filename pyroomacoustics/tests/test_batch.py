@@ -0,0 +1,92 @@
+"""
+Tests the simulation of batches of rooms on a pool of worker processes
+against the simulation of the rooms one by one.
+"""
+import os
+import tempfile
+
+import numpy as np
+import pyroomacoustics as pra
+from pyroomacoustics.batch import BatchSimulator, simulate_batch
+
+fs = 16000
+
+
+def make_spec(i):
+    return {
+        "room_dim": [6.0, 5.0, 3.0],
+        "fs": fs,
+        "max_order": 3,
+        "materials": pra.Material(0.1 + 0.1 * i),
+        "use_rand_ism": True,
+        "sources": [[1.0 + 0.5 * i, 1.0, 1.5]],
+        "mics": np.c_[[4.0, 1.5, 1.2], [4.5, 2.0, 1.7]],
+    }
+
+
+def reference(i, seed):
+    # the same seeding as the workers
+    seed_seq = np.random.SeedSequence(seed, spawn_key=(i,))
+    rng = np.random.default_rng(seed_seq)
+    np.random.seed(seed_seq.generate_state(4))
+
+    spec = make_spec(i)
+    room = pra.ShoeBox(
+        spec["room_dim"],
+        fs=fs,
+        max_order=3,
+        materials=spec["materials"],
+        use_rand_ism=True,
+    )
+    room.add_source(spec["sources"][0])
+    room.add_microphone_array(spec["mics"])
+    room.compute_rir(rng=rng)
+    return room.rir
+
+
+def test_batch():
+    specs = [make_spec(i) for i in range(5)]
+    # an invalid room, with the source outside
+    specs[3]["sources"] = [[10.0, 1.0, 1.5]]
+
+    with BatchSimulator(n_workers=2, seed=7) as simulator:
+        results = simulator.map(iter(specs))
+        unordered = list(simulator.imap(specs, ordered=False))
+
+    assert [r.index for r in results] == list(range(5))
+    assert sorted(r.index for r in unordered) == list(range(5))
+
+    for i, result in enumerate(results):
+        if i == 3:
+            assert result.rirs is None and "ValueError" in result.error
+            continue
+
+        assert result.error is None
+        for rir_mic, ref_mic in zip(result.rirs, reference(i, 7)):
+            for h, h_ref in zip(rir_mic, ref_mic):
+                assert np.allclose(h, h_ref)
+
+
+def test_simulate_batch():
+    results = simulate_batch([make_spec(0), make_spec(1)], n_workers=1, seed=3)
+    assert len(results) == 2
+    assert isinstance(results[0].rirs[1][0], np.ndarray)
+    assert np.allclose(results[1].rirs[0][0], reference(1, 3)[0][0])
+
+
+def test_files_removed():
+    with tempfile.TemporaryDirectory() as directory:
+        with BatchSimulator(
+            n_workers=2, seed=3, directory=directory, max_pending=1
+        ) as simulator:
+            results = simulator.map([make_spec(i) for i in range(4)])
+            # the files are removed once they are mapped
+            assert os.listdir(directory) == []
+
+        assert np.allclose(results[2].rirs[0][0], reference(2, 3)[0][0])
+
+
+if __name__ == "__main__":
+    test_batch()
+    test_simulate_batch()
+    test_files_removed()
@@ -190,6 +190,88 @@ def test_errors():
         pass
 
 
+def test_build_rir_multi():
+    """Tests that the multi-channel builder matches the single channel one"""
+
+    if not build_rir_available:
+        return
+
+    n_bands = 2
+    N = int(np.ceil(times.max() * fs) + fdl)
+
+    # the same image sources with different gains in every band
+    alpha = np.stack([alphas, -0.5 * alphas], axis=1)
+
+    rir = np.zeros((times.shape[0], n_bands, N))
+    build_rir.fast_rir_builder_multi(rir, times, alpha, visibilities, fs, fdl)
+
+    for m in range(times.shape[0]):
+        for b in range(n_bands):
+            ir = np.zeros(N)
+            build_rir.fast_rir_builder(
+                ir, times[m], alpha[m, b], visibilities[m], fs, fdl
+            )
+            assert np.allclose(ir, rir[m, b])
+
+
+def test_build_rir_threads_float32():
+    """Tests the multi-threaded builder and the single precision output"""
+
+    if not build_rir_available:
+        return
+
+    N = int(np.ceil(times.max() * fs) + fdl)
+    t, a, v = times.ravel(), alphas.ravel(), visibilities.ravel()
+
+    ir_ref = np.zeros(N)
+    build_rir.fast_rir_builder(ir_ref, t, a, v, fs, fdl)
+
+    for n_threads in [0, 2, 4]:
+        ir = np.zeros(N)
+        build_rir.fast_rir_builder(ir, t, a, v, fs, fdl, n_threads=n_threads)
+        assert np.allclose(ir, ir_ref)
+
+    ir = np.zeros(N, dtype=np.float32)
+    build_rir.fast_rir_builder(ir, t, a, v, fs, fdl, n_threads=2)
+    assert np.allclose(ir, ir_ref, atol=1e-6)
+
+    # the interpolation tables are only computed once
+    tables = build_rir.get_interpolation_tables(fdl, 20)
+    assert tables is build_rir.get_interpolation_tables(fdl, 20)
+
+
+def test_build_rir_filtered():
+    """
+    Tests that the builder of the filtered image sources matches the band-wise
+    builder followed by the band-pass filters, including the image sources
+    whose filters start before the first sample
+    """
+
+    if not build_rir_available:
+        return
+
+    octave_bands = pra.acoustics.OctaveBandsFactory(fs=fs)
+    n_bands = octave_bands.n_bands
+    N = int(np.ceil(times.max() * fs) + fdl)
+
+    alpha = alphas[:, None, :] * np.linspace(1.0, 0.2, n_bands)[None, :, None]
+    alpha[0, 1, :] = 0.0
+
+    rir_bands = np.zeros((times.shape[0], n_bands, N))
+    build_rir.fast_rir_builder_multi(rir_bands, times, alpha, visibilities, fs, fdl)
+    rir_ref = np.sum(octave_bands.filter_bands(rir_bands), axis=1)
+
+    tables = octave_bands.get_delay_tables(fdl)
+    assert tables is octave_bands.get_delay_tables(fdl)
+
+    for n_threads in [1, 2]:
+        rir = np.zeros((times.shape[0], N))
+        build_rir.fast_rir_builder_filtered(
+            rir, times, alpha, visibilities, tables, fs, fdl, n_threads=n_threads
+        )
+        assert np.allclose(rir, rir_ref)
+
+
 if __name__ == "__main__":
 
     import matplotlib.pyplot as plt
@@ -0,0 +1,96 @@
+"""
+Tests the batched convolution of signals with a bank of filters against the
+convolution of every pair of signal and filter.
+"""
+import numpy as np
+from scipy.signal import fftconvolve
+
+from pyroomacoustics.convolution import fft_convolve, fft_convolve_stream
+
+n_signals, n_channels, n_taps = 3, 4, 101
+
+
+def reference(signals, filters):
+    return np.array(
+        [
+            [fftconvolve(signals[s], filters[m, s]) for m in range(n_channels)]
+            for s in range(n_signals)
+        ]
+    )
+
+
+def check_method(n_samples, **kwargs):
+    signals = np.random.randn(n_signals, n_samples)
+    filters = np.random.randn(n_channels, n_signals, n_taps)
+    expected = reference(signals, filters)
+
+    premix = fft_convolve(signals, filters, **kwargs)
+    assert premix.shape == expected.shape
+    assert np.allclose(premix, expected)
+
+    mix = fft_convolve(signals, filters, sum_signals=True, **kwargs)
+    assert np.allclose(mix, np.sum(expected, axis=0))
+
+
+def test_direct():
+    check_method(500, method="direct")
+
+
+def test_overlap_save():
+    check_method(3000, method="overlap-save")
+    check_method(3000, method="overlap-save", block_size=n_taps)
+    check_method(50, method="overlap-save", block_size=256)
+
+
+def test_auto_workers():
+    # long enough to use the overlap-save method
+    check_method(5000, workers=2)
+
+
+def test_stream():
+    signals = [np.random.randn(1000), np.random.randn(300), np.random.randn(700)]
+    offsets = [0, 50, 500]
+    filters = np.random.randn(n_channels, n_signals, n_taps)
+
+    delayed = np.zeros((n_signals, 1200))
+    for s, (x, o) in enumerate(zip(signals, offsets)):
+        delayed[s, o : o + len(x)] = x
+    expected = np.sum(reference(delayed, filters), axis=0)
+
+    blocks = fft_convolve_stream(
+        signals, filters, offsets=offsets, block_size=128, n_samples=1400
+    )
+    output = np.concatenate(list(blocks), axis=1)
+
+    assert output.shape == (n_channels, 1400)
+    assert np.allclose(output[:, : expected.shape[1]], expected)
+    assert np.allclose(output[:, expected.shape[1] :], 0.0)
+
+
+def test_errors():
+    signals = np.random.randn(n_signals, 200)
+    filters = np.random.randn(n_channels, n_signals, n_taps)
+
+    for kwargs in [
+        {"method": "overlap-add"},
+        {"method": "overlap-save", "block_size": n_taps - 1},
+    ]:
+        try:
+            fft_convolve(signals, filters, **kwargs)
+            assert False, "Invalid options should raise an error"
+        except ValueError:
+            pass
+
+    try:
+        fft_convolve(signals[:2], filters)
+        assert False, "Mismatched filters should raise an error"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    test_direct()
+    test_overlap_save()
+    test_auto_workers()
+    test_stream()
+    test_errors()
@@ -0,0 +1,91 @@
+"""
+Tests that the distance and attenuation criteria of the image source model of
+polyhedral rooms only remove the image sources that do not satisfy them.
+"""
+import numpy as np
+import pyroomacoustics as pra
+
+corners = np.array([[0, 0], [6, 0], [6, 5], [3, 5], [3, 2.5], [0, 2.5]]).T
+source_loc = [1.0, 1.0, 1.5]
+mic_locs = np.c_[[5.0, 1.0, 1.2], [4.5, 4.0, 1.7]]
+max_order = 5
+
+
+material = pra.Material(
+    energy_absorption={
+        "coeffs": [0.5, 0.55, 0.6, 0.65, 0.7, 0.75],
+        "center_freqs": [125, 250, 500, 1000, 2000, 4000],
+    }
+)
+
+# the image sources without pruning
+room_ref = pra.Room.from_corners(
+    corners, fs=16000, materials=material, max_order=max_order
+)
+room_ref.extrude(3.0, materials=material)
+room_ref.add_source(source_loc)
+room_ref.add_microphone_array(mic_locs)
+room_ref.image_source_model()
+
+
+def check_subset(room, keep):
+    s_ref, s = room_ref.sources[0], room.sources[0]
+    assert 0 < np.sum(keep) < len(keep)
+    assert np.array_equal(s_ref.images[:, keep], s.images)
+    assert np.array_equal(s_ref.orders[keep], s.orders)
+    assert np.array_equal(s_ref.damping[:, keep], s.damping)
+    assert np.array_equal(room_ref.visibility[0][:, keep], room.visibility[0])
+
+
+def test_max_time():
+
+    max_time = 0.05
+
+    room = pra.Room.from_corners(
+        corners, fs=16000, materials=material, max_order=max_order
+    )
+    room.extrude(3.0, materials=material)
+    room.set_ism_options(max_time=max_time)
+    room.add_source(source_loc)
+    room.add_microphone_array(mic_locs)
+    room.image_source_model()
+
+    images = room_ref.sources[0].images
+    dist = np.linalg.norm(images[:, None, :] - mic_locs[:, :, None], axis=0)
+    keep = np.min(dist, axis=0) <= room_ref.c * max_time
+
+    check_subset(room, keep)
+
+
+def test_min_attenuation():
+
+    min_attenuation = 0.4
+
+    room = pra.Room.from_corners(
+        corners, fs=16000, materials=material, max_order=max_order
+    )
+    room.extrude(3.0, materials=material)
+    room.set_ism_options(min_attenuation=min_attenuation, n_threads=2)
+    room.add_source(source_loc)
+    room.add_microphone_array(mic_locs)
+    room.image_source_model()
+
+    keep = np.max(room_ref.sources[0].damping, axis=0) >= min_attenuation
+
+    check_subset(room, keep)
+
+
+def test_invalid_options():
+    room = pra.Room.from_corners(corners, fs=16000, materials=material)
+    for kwargs in [{"max_time": -1.0}, {"min_attenuation": -0.5}]:
+        try:
+            room.set_ism_options(**kwargs)
+            assert False, "Invalid ISM options should raise an error"
+        except ValueError:
+            pass
+
+
+if __name__ == "__main__":
+    test_max_time()
+    test_min_attenuation()
+    test_invalid_options()
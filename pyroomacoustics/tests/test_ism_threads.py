@@ -0,0 +1,61 @@
+"""
+Tests that the multi-threaded image source model of polyhedral rooms finds
+exactly the same image sources, in the same order, as the single-threaded one.
+"""
+import numpy as np
+import pyroomacoustics as pra
+
+corners = np.array([[0, 0], [6, 0], [6, 5], [3, 5], [3, 2.5], [0, 2.5]]).T
+source_loc = [1.0, 1.0, 1.5]
+mic_locs = np.c_[[5.0, 1.0, 1.2], [4.5, 4.0, 1.7]]
+
+
+material = pra.Material(energy_absorption=0.2, scattering=0.1)
+
+
+def compare_rooms(room1, room2):
+    s1, s2 = room1.sources[0], room2.sources[0]
+    assert s1.images.shape[1] > 0
+    assert np.array_equal(s1.images, s2.images)
+    assert np.array_equal(s1.orders, s2.orders)
+    assert np.array_equal(s1.walls, s2.walls)
+    assert np.array_equal(s1.damping, s2.damping)
+    assert np.array_equal(room1.visibility[0], room2.visibility[0])
+
+
+def test_threads_match_single_thread():
+
+    # 0 threads means one per core
+    for n_threads, ray_tracing in [(3, False), (4, True), (0, False)]:
+
+        rooms = []
+        for n in [1, n_threads]:
+            room = pra.Room.from_corners(
+                corners,
+                fs=16000,
+                materials=material,
+                max_order=4,
+                ray_tracing=ray_tracing,
+            )
+            room.extrude(3.0, materials=material)
+            room.set_ism_options(n_threads=n)
+            room.add_source(source_loc)
+            room.add_microphone_array(mic_locs)
+            room.image_source_model()
+            rooms.append(room)
+
+        compare_rooms(rooms[0], rooms[1])
+
+
+def test_negative_threads():
+    room = pra.Room.from_corners(corners, fs=16000, materials=material)
+    try:
+        room.set_ism_options(n_threads=-1)
+        assert False, "A negative number of threads should raise an error"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    test_threads_match_single_thread()
+    test_negative_threads()
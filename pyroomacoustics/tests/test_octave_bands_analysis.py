@@ -0,0 +1,71 @@
+"""
+Tests that the octave filter bank analysis computed with a single transform
+of the input matches the filtering of the input by every band-pass filter.
+"""
+import numpy as np
+import pyroomacoustics as pra
+from scipy.signal import fftconvolve
+
+fs = 16000
+octave_bands = pra.acoustics.OctaveBandsFactory(fs=fs)
+n_bands = octave_bands.n_bands
+
+
+def reference(x, band):
+    return fftconvolve(x, octave_bands.filters[:, band], mode="same")
+
+
+def test_analysis():
+    x = np.random.randn(1000)
+
+    output = octave_bands.analysis(x)
+    assert output.shape == (len(x), n_bands)
+    for b in range(n_bands):
+        assert np.allclose(output[:, b], reference(x, b))
+
+    assert np.allclose(octave_bands.analysis(x, band=2), reference(x, 2))
+
+
+def test_analysis_batch():
+    # shorter than the filters, so that the whole filter matters
+    x = np.random.randn(3, 2, 300)
+
+    output = octave_bands.analysis(x)
+    assert output.shape == x.shape + (n_bands,)
+    for i in range(x.shape[0]):
+        for j in range(x.shape[1]):
+            assert np.allclose(output[i, j], octave_bands.analysis(x[i, j]))
+
+
+def test_filter_bands():
+    x = np.random.randn(4, n_bands, 700)
+
+    output = octave_bands.filter_bands(x)
+    assert output.shape == x.shape
+    for i in range(x.shape[0]):
+        for b in range(n_bands):
+            assert np.allclose(output[i, b], reference(x[i, b], b))
+
+
+def test_synthesis():
+    x = np.random.randn(2, n_bands, 500)
+
+    output = octave_bands.synthesis(x)
+    assert output.shape == (2, 500)
+    assert np.allclose(output, np.sum(octave_bands.filter_bands(x), axis=-2))
+
+
+def test_filter_spectra_bounded():
+    bands = pra.acoustics.OctaveBandsFactory(fs=fs)
+    for n_samples in range(100, 2000, 100):
+        x = np.random.randn(n_bands, n_samples)
+        assert np.allclose(bands.filter_bands(x)[0], reference(x[0], 0))
+    assert len(bands._filter_spectra) == bands._max_filter_spectra
+
+
+if __name__ == "__main__":
+    test_analysis()
+    test_analysis_batch()
+    test_filter_bands()
+    test_synthesis()
+    test_filter_spectra_bounded()
@@ -0,0 +1,85 @@
+"""
+Tests the block by block partitioned convolution against the convolution of
+the whole signals, and the crossfade when the impulse responses are replaced.
+"""
+import numpy as np
+import pyroomacoustics as pra
+from pyroomacoustics.convolution import PartitionedConvolver, fft_convolve
+
+n_sources, n_mics, n_taps = 2, 3, 1000
+block_size = 128
+
+
+def run(convolver, signals):
+    n_blocks = signals.shape[1] // block_size
+    return np.concatenate(
+        [
+            convolver.process(signals[:, b * block_size : (b + 1) * block_size]).copy()
+            for b in range(n_blocks)
+        ],
+        axis=1,
+    )
+
+
+def test_process():
+    signals = np.random.randn(n_sources, 40 * block_size)
+    filters = np.random.randn(n_mics, n_sources, n_taps)
+
+    convolver = PartitionedConvolver(filters, block_size)
+    output = run(convolver, signals)
+
+    expected = fft_convolve(signals, filters, sum_signals=True)
+    assert np.allclose(output, expected[:, : signals.shape[1]])
+
+    assert convolver.n_blocks == 40
+    assert 0.0 < convolver.max_block_time <= convolver.total_time
+
+
+def test_set_rirs():
+    signals = np.random.randn(n_sources, 30 * block_size)
+    filters = np.random.randn(n_mics, n_sources, n_taps)
+    new_filters = np.random.randn(n_mics, n_sources, n_taps // 2)
+
+    convolver = PartitionedConvolver(filters, block_size)
+    before = run(convolver, signals[:, : 10 * block_size])
+    convolver.set_rirs(new_filters)
+    after = run(convolver, signals[:, 10 * block_size :])
+
+    old = fft_convolve(signals, filters, sum_signals=True)
+    new = fft_convolve(signals, new_filters, sum_signals=True)
+    assert np.allclose(before, old[:, : 10 * block_size])
+
+    # the first block after the swap goes from the old to the new responses
+    fade = 0.5 * (1.0 - np.cos(np.pi * np.arange(block_size) / block_size))
+    crossfade = slice(10 * block_size, 11 * block_size)
+    expected = (1.0 - fade) * old[:, crossfade] + fade * new[:, crossfade]
+    assert np.allclose(after[:, :block_size], expected)
+    assert np.allclose(after[:, block_size:], new[:, 11 * block_size : 30 * block_size])
+
+
+def test_from_room():
+    room = pra.ShoeBox([5.0, 4.0, 3.0], fs=16000, max_order=4)
+    room.add_source([1.0, 1.0, 1.5])
+    room.add_source([2.0, 3.0, 1.2])
+    room.add_microphone([3.5, 2.0, 1.4])
+
+    convolver = PartitionedConvolver.from_room(room, 256)
+    assert convolver.n_mics == 1 and convolver.n_sources == 2
+
+    try:
+        convolver.set_rirs(np.zeros((1, 2, convolver.n_partitions * 256 + 1)))
+        assert False, "Longer impulse responses should raise an error"
+    except ValueError:
+        pass
+
+    try:
+        convolver.process(np.zeros((1, 256)))
+        assert False, "Blocks of the wrong shape should raise an error"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    test_process()
+    test_set_rirs()
+    test_from_room()
@@ -0,0 +1,94 @@
+"""
+Tests the adaptive ray tracing, that traces rays in batches until the energy
+decay curves of the microphones converge.
+"""
+import numpy as np
+import pytest
+import pyroomacoustics as pra
+
+room_dim = np.array([6.0, 5.0, 3.0])
+source_loc = np.array([2.0, 1.0, 1.5])
+mic_locs = np.c_[[4.0, 1.5, 1.2], [4.5, 2.0, 1.7]]
+material = pra.Material(energy_absorption=0.2, scattering=0.1)
+
+
+def test_first_batch_matches_fixed_count():
+    # a single batch traces the same rays as the fixed ray count
+    for dim in [2, 3]:
+        room = pra.ShoeBox(room_dim[:dim], fs=16000, materials=material, max_order=2)
+        room.set_ray_tracing(
+            receiver_radius=0.5, n_rays=2000, tolerance=1e-9, batch_size=2000
+        )
+        room.add_source(source_loc[:dim])
+        room.add_microphone_array(mic_locs[:dim])
+        room.ray_tracing()
+        assert room.rt_convergence[0]["n_rays"] == 2000
+
+        expected = pra.ShoeBox(
+            room_dim[:dim], fs=16000, materials=material, max_order=2
+        )
+        expected.set_ray_tracing(receiver_radius=0.5, n_rays=2000)
+        expected.add_source(source_loc[:dim])
+        expected.add_microphone_array(mic_locs[:dim])
+        expected.ray_tracing()
+
+        for h_mic, h_exp_mic in zip(room.rt_histograms, expected.rt_histograms):
+            assert np.allclose(h_mic[0][0], h_exp_mic[0][0], rtol=1e-5)
+
+
+def test_convergence():
+    for dim in [2, 3]:
+        room = pra.ShoeBox(room_dim[:dim], fs=16000, materials=material, max_order=2)
+        room.set_ray_tracing(
+            receiver_radius=0.5, n_rays=50000, tolerance=0.1, batch_size=1000
+        )
+        room.add_source(source_loc[:dim])
+        room.add_microphone_array(mic_locs[:dim])
+        room.ray_tracing()
+
+        info = room.rt_convergence[0]
+        assert info["n_rays"] < 50000
+        assert info["n_rays"] % 1000 == 0
+        assert info["tolerance"] <= 0.1
+
+        # the histograms have the scale of a fixed number of rays
+        expected = pra.ShoeBox(
+            room_dim[:dim], fs=16000, materials=material, max_order=2
+        )
+        expected.set_ray_tracing(receiver_radius=0.5, n_rays=info["n_rays"])
+        expected.add_source(source_loc[:dim])
+        expected.add_microphone_array(mic_locs[:dim])
+        expected.ray_tracing()
+        for h_mic, h_exp_mic in zip(room.rt_histograms, expected.rt_histograms):
+            energy = np.sum(h_mic[0][0])
+            assert abs(energy - np.sum(h_exp_mic[0][0])) < 0.1 * energy
+
+
+def test_budget():
+    room = pra.ShoeBox(room_dim, fs=16000, materials=material, max_order=2)
+    room.set_ray_tracing(
+        receiver_radius=0.5, n_rays=3000, tolerance=1e-6, batch_size=1000
+    )
+    room.add_source(source_loc)
+    room.add_microphone_array(mic_locs)
+    room.ray_tracing()
+    assert room.rt_convergence[0]["n_rays"] == 3000
+    assert room.rt_convergence[0]["tolerance"] > 1e-6
+
+
+def test_simulate():
+    room = pra.ShoeBox(room_dim, fs=16000, materials=material, max_order=2)
+    room.set_ray_tracing(receiver_radius=0.5, n_rays=20000, tolerance=0.1)
+    room.add_source(source_loc)
+    room.add_microphone_array(mic_locs)
+    room.compute_rir()
+    assert room.rt_args["batch_size"] == 2000
+    assert len(room.rir) == 2
+
+
+def test_invalid_options():
+    room = pra.ShoeBox(room_dim, fs=16000, materials=material, max_order=2)
+    with pytest.raises(ValueError):
+        room.set_ray_tracing(n_rays=1000, tolerance=0.0)
+    with pytest.raises(ValueError):
+        room.set_ray_tracing(n_rays=1000, tolerance=0.1, batch_size=0)
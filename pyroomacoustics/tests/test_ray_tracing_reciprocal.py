@@ -0,0 +1,116 @@
+"""
+Tests that tracing the rays from the microphones to the sources gives the same
+histograms as tracing them from the sources, by reciprocity.
+"""
+import numpy as np
+import pyroomacoustics as pra
+
+room_dim = [6.0, 5.0, 3.0]
+source_locs = [
+    [1.0, 1.0, 1.5],
+    [2.0, 4.0, 1.0],
+    [5.0, 1.0, 2.0],
+    [3.0, 3.0, 2.5],
+]
+mic_loc = [4.0, 3.0, 1.2]
+specular = pra.Material(energy_absorption=0.2, scattering=0.0)
+diffuse = pra.Material(energy_absorption=0.2, scattering=0.2)
+
+
+def get_hists(room, m, s):
+    return room.rt_histograms[m][s][0]
+
+
+def trim(h1, h2):
+    n = min(h1.shape[1], h2.shape[1])
+    # any extra bins should be empty
+    assert np.all(h1[:, n:] == 0.0) and np.all(h2[:, n:] == 0.0)
+    return h1[:, :n], h2[:, :n]
+
+
+def check_decay_curves(forward, reciprocal, tol):
+    # the rays are not the same in both directions, but the energy decay
+    # curves should agree
+    for s in range(len(source_locs)):
+        h1, h2 = trim(get_hists(forward, 0, s), get_hists(reciprocal, 0, s))
+        edc1 = np.cumsum(h1[:, ::-1], axis=1)[:, ::-1]
+        edc2 = np.cumsum(h2[:, ::-1], axis=1)[:, ::-1]
+        assert np.max(np.abs(edc1 - edc2)) < tol * np.max(edc1)
+
+
+def test_reciprocal_specular():
+    rooms = []
+    for reciprocal in [False, True]:
+        room = pra.ShoeBox(room_dim, fs=16000, materials=specular, max_order=2)
+        room.set_ray_tracing(n_rays=10000, reciprocal=reciprocal)
+        for loc in source_locs:
+            room.add_source(loc)
+        room.add_microphone(mic_loc)
+        room.ray_tracing()
+        rooms.append(room)
+    check_decay_curves(rooms[0], rooms[1], 0.02)
+
+
+def test_reciprocal_scattering():
+    rooms = []
+    for reciprocal in [False, True]:
+        room = pra.ShoeBox(room_dim, fs=16000, materials=diffuse, max_order=2)
+        room.set_ray_tracing(n_rays=10000, reciprocal=reciprocal)
+        for loc in source_locs:
+            room.add_source(loc)
+        room.add_microphone(mic_loc)
+        room.ray_tracing()
+        rooms.append(room)
+    check_decay_curves(rooms[0], rooms[1], 0.05)
+
+
+def test_reciprocal_2d_forward():
+    # the rays of 2D rooms are always traced from the sources
+    rooms = []
+    for reciprocal in [False, True]:
+        room = pra.ShoeBox(room_dim[:2], fs=16000, materials=diffuse, max_order=2)
+        room.set_ray_tracing(n_rays=10000, reciprocal=reciprocal)
+        for loc in source_locs:
+            room.add_source(loc[:2])
+        room.add_microphone(mic_loc[:2])
+        room.ray_tracing()
+        rooms.append(room)
+
+    for s in range(len(source_locs)):
+        assert np.array_equal(get_hists(rooms[0], 0, s), get_hists(rooms[1], 0, s))
+
+
+def test_reciprocal_move_microphone():
+    new_loc = [3.0, 2.0, 1.0]
+
+    rooms = []
+    for mic in [mic_loc, new_loc]:
+        room = pra.ShoeBox(room_dim, fs=16000, materials=diffuse, max_order=2)
+        room.set_ray_tracing(n_rays=10000, reciprocal=True)
+        for loc in source_locs:
+            room.add_source(loc)
+        room.add_microphone(mic)
+        rooms.append(room)
+    room, expected = rooms
+
+    room.compute_rir()
+    room.move_microphone(0, new_loc)
+    room.compute_rir()
+    expected.ray_tracing()
+
+    for s in range(len(source_locs)):
+        h1, h2 = trim(get_hists(room, 0, s), get_hists(expected, 0, s))
+        assert np.allclose(h1, h2)
+
+
+def test_reciprocal_adaptive():
+    room = pra.ShoeBox(room_dim, fs=16000, materials=specular, max_order=2)
+    room.set_ray_tracing(n_rays=10000, reciprocal=True, tolerance=0.1, batch_size=1000)
+    for loc in source_locs:
+        room.add_source(loc)
+    room.add_microphone(mic_loc)
+    room.ray_tracing()
+
+    for info in room.rt_convergence:
+        assert info["n_rays"] <= 10000
+        assert info["n_rays"] % 1000 == 0
@@ -0,0 +1,68 @@
+"""
+Tests that the multi-threaded ray tracer produces the same energy histograms
+as the single-threaded one, and that it is deterministic for a fixed number
+of threads.
+"""
+import numpy as np
+import pyroomacoustics as pra
+
+room_dim = [6.0, 5.0, 3.0]
+source_loc = [2.0, 3.0, 1.5]
+mic_locs = np.c_[[4.0, 1.5, 1.2], [4.5, 2.0, 1.7]]
+
+
+def make_histograms(n_threads, shoebox=True):
+
+    material = pra.Material(energy_absorption=0.2, scattering=0.1)
+
+    if shoebox:
+        room = pra.ShoeBox(room_dim, fs=16000, materials=material, max_order=2)
+    else:
+        corners = np.array([[0, 0], [6, 0], [6, 5], [3, 5], [3, 2.5], [0, 2.5]]).T
+        room = pra.Room.from_corners(corners, fs=16000, materials=material, max_order=2)
+        room.extrude(3.0, materials=material)
+
+    room.set_ray_tracing(n_rays=5000, receiver_radius=0.5, n_threads=n_threads)
+    room.add_source([2.0, 1.0, 1.5])
+    room.add_microphone_array(mic_locs)
+    room.ray_tracing()
+
+    return room.rt_histograms
+
+
+def compare_histograms(hist1, hist2, exact=False):
+    for h1_mic, h2_mic in zip(hist1, hist2):
+        for h1_src, h2_src in zip(h1_mic, h2_mic):
+            for h1, h2 in zip(h1_src, h2_src):
+                n = min(h1.shape[1], h2.shape[1])
+                # any extra bins should be empty
+                assert np.all(h1[:, n:] == 0.0) and np.all(h2[:, n:] == 0.0)
+                if exact:
+                    assert np.array_equal(h1[:, :n], h2[:, :n])
+                else:
+                    assert np.allclose(h1[:, :n], h2[:, :n], rtol=1e-4, atol=1e-10)
+
+
+def test_threads_match_single_thread_shoebox():
+    compare_histograms(make_histograms(1), make_histograms(4))
+
+
+def test_threads_match_single_thread_polyhedral():
+    compare_histograms(
+        make_histograms(1, shoebox=False), make_histograms(3, shoebox=False)
+    )
+
+
+def test_threads_deterministic():
+    compare_histograms(make_histograms(4), make_histograms(4), exact=True)
+
+
+def test_all_cores():
+    compare_histograms(make_histograms(1), make_histograms(0))
+
+
+if __name__ == "__main__":
+    test_threads_match_single_thread_shoebox()
+    test_threads_match_single_thread_polyhedral()
+    test_threads_deterministic()
+    test_all_cores()
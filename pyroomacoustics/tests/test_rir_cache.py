@@ -0,0 +1,130 @@
+"""
+Tests the on-disk cache of room impulse responses: hits and misses, keys that
+depend on the parameters of the simulation, and the eviction of the least
+recently used entries.
+"""
+import os
+import tempfile
+
+import numpy as np
+import pyroomacoustics as pra
+from pyroomacoustics.rir_cache import RIRCache, hash_parameters
+
+fs = 16000
+room_dim = [6.0, 5.0, 3.0]
+sources = [[1.0, 1.0, 1.5], [2.0, 3.0, 1.2]]
+mic_locs = np.c_[[4.0, 1.5, 1.2], [4.5, 2.0, 1.7]]
+
+
+def test_hit_miss():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = RIRCache(directory)
+
+        rooms = []
+        for _ in range(2):
+            room = pra.ShoeBox(
+                room_dim, fs=fs, max_order=4, materials=pra.Material(0.3)
+            )
+            for loc in sources:
+                room.add_source(loc)
+            room.add_microphone_array(mic_locs)
+            room.set_rir_options(cache=cache)
+            room.compute_rir()
+            rooms.append(room)
+        room, room2 = rooms
+
+        # the second room with the same parameters does not run the simulators
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert len(cache) == 1
+        assert not room2.simulator_state["ism_done"]
+        for rir_mic, rir_mic2 in zip(room.rir, room2.rir):
+            for h, h2 in zip(rir_mic, rir_mic2):
+                assert np.array_equal(h, h2)
+
+        # the image sources are not those of a simulation
+        for src in room2.sources:
+            assert src.images.shape == (3, 1)
+            assert np.allclose(src.images[:, 0], src.position)
+
+        # any change of the parameters is a miss
+        for absorption, mic_z, n_rays, use_bvh in [
+            (0.2, 1.2, None, True),
+            (0.3, 1.3, None, True),
+            (0.3, 1.2, 1000, True),
+            (0.3, 1.2, None, False),
+        ]:
+            room3 = pra.ShoeBox(
+                room_dim, fs=fs, max_order=4, materials=pra.Material(absorption)
+            )
+            for loc in sources:
+                room3.add_source(loc)
+            room3.add_microphone_array(np.c_[[4.0, 1.5, mic_z], [4.5, 2.0, 1.7]])
+            room3.set_rir_options(cache=cache)
+            if n_rays is not None:
+                room3.set_ray_tracing(n_rays=n_rays)
+            room3.room_engine.use_bvh = use_bvh
+            room3.compute_rir()
+        assert (cache.hits, cache.misses) == (1, 5)
+
+        # the signals can be simulated from the cached responses
+        for src in room2.sources:
+            src.add_signal(np.random.randn(1000))
+        room2.simulate()
+
+
+def test_eviction():
+    rooms = []
+    for absorption in [0.3, 0.2, 0.1]:
+        room = pra.ShoeBox(
+            room_dim, fs=fs, max_order=4, materials=pra.Material(absorption)
+        )
+        for loc in sources:
+            room.add_source(loc)
+        room.add_microphone_array(mic_locs)
+        rooms.append(room)
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = RIRCache(directory)
+        rooms[0].set_rir_options(cache=cache)
+        rooms[0].compute_rir()
+        entry_size = cache.size
+
+        # room for two entries only
+        cache = RIRCache(directory, max_size=int(2.5 * entry_size))
+        for room in rooms:
+            room.set_rir_options(cache=cache)
+        rooms[1].compute_rir()
+
+        # use the first entry, so that the second is the oldest
+        old_time = os.path.getmtime(directory)
+        for name in os.listdir(directory):
+            os.utime(os.path.join(directory, name), (old_time - 10, old_time - 10))
+        rooms[0].compute_rir()
+        assert cache.hits == 1
+
+        rooms[2].compute_rir()
+        assert cache.evictions == 1
+        assert len(cache) == 2
+        assert cache.size <= cache.max_size
+
+        rooms[0].compute_rir()
+        assert cache.hits == 2
+
+        cache.clear()
+        assert len(cache) == 0
+
+
+def test_hash_parameters():
+    a = np.arange(4.0)
+    assert hash_parameters(a, {"x": 1, "y": [None, "z"]}) == hash_parameters(
+        a.copy(), {"y": [None, "z"], "x": 1}
+    )
+    assert hash_parameters(1) != hash_parameters(1.0)
+    assert hash_parameters(a) != hash_parameters(a.astype(np.float32))
+    assert hash_parameters(a) != hash_parameters(a.reshape((2, 2)))
+
+
+if __name__ == "__main__":
+    test_hit_miss()
+    test_eviction()
+    test_hash_parameters()
@@ -0,0 +1,60 @@
+"""
+Tests that the filtered synthesis of the image source part of the impulse
+responses gives the same result as the band-wise synthesis.
+"""
+import numpy as np
+import pyroomacoustics as pra
+
+material = pra.Material(
+    energy_absorption={
+        "coeffs": [0.1, 0.2, 0.3, 0.4, 0.5, 0.6],
+        "center_freqs": [125, 250, 500, 1000, 2000, 4000],
+    },
+    scattering=0.1,
+)
+mic_locs = np.c_[[4.0, 1.5, 1.2], [4.5, 2.0, 1.7], [1.0, 4.0, 2.0]]
+
+
+def compute_rir(synthesis, air_absorption):
+    room = pra.ShoeBox(
+        [6.0, 5.0, 3.0],
+        fs=16000,
+        materials=material,
+        max_order=8,
+        air_absorption=air_absorption,
+    )
+    room.set_rir_options(synthesis=synthesis)
+    room.add_source([2.0, 3.0, 1.5])
+    room.add_microphone_array(mic_locs)
+    room.compute_rir()
+    return [rir[0] for rir in room.rir]
+
+
+def test_filtered_synthesis():
+    for h_time, h_filt in zip(
+        compute_rir("time", False), compute_rir("filtered", False)
+    ):
+        assert np.allclose(h_time, h_filt)
+
+
+def test_filtered_synthesis_air_absorption():
+    # the air absorption is applied per image source rather than as a decay
+    # over time of the bands, which is very close
+    for h_time, h_filt in zip(compute_rir("time", True), compute_rir("filtered", True)):
+        assert h_time.shape == h_filt.shape
+        assert np.linalg.norm(h_time - h_filt) < 1e-2 * np.linalg.norm(h_time)
+
+
+def test_invalid_synthesis():
+    room = pra.ShoeBox([6.0, 5.0, 3.0])
+    try:
+        room.set_rir_options(synthesis="wavelet")
+        assert False, "An unknown synthesis should raise an error"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    test_filtered_synthesis()
+    test_filtered_synthesis_air_absorption()
+    test_invalid_synthesis()
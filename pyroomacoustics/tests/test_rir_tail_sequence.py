@@ -0,0 +1,94 @@
+"""
+Tests the random sequence used to synthesize the reverberation tail from the
+ray tracing histograms, and the options to share it between the pairs of
+sources and microphones.
+"""
+import numpy as np
+import pyroomacoustics as pra
+from pyroomacoustics.room import sequence_generation
+
+fs = 16000
+c = 343.0
+
+# two microphones at the same location have the same histograms, so that
+# their tails only differ by their random sequences
+mic_locs = np.c_[[4.0, 1.5, 1.2], [4.0, 1.5, 1.2]]
+
+
+def test_sequence():
+
+    duration = 0.5
+    seq = sequence_generation(90.0, duration, c, fs, rng=np.random.default_rng(1))
+    seq2 = sequence_generation(90.0, duration, c, fs, rng=np.random.default_rng(1))
+
+    assert np.array_equal(seq, seq2)
+    assert len(seq) >= duration * fs
+    assert np.all(np.isin(seq, [-1, 0, 1]))
+
+    # in this room, the rate saturates at 10000 events per second after
+    # about 50 ms, so that a sample of the second half of the sequence is
+    # non-zero with probability 1 - exp(-10000 / fs)
+    tail = seq[len(seq) // 2 :]
+    p = 1.0 - np.exp(-10000 / fs)
+    n_expected = p * len(tail)
+    n_std = np.sqrt(n_expected * (1.0 - p))
+    assert abs(np.count_nonzero(tail) - n_expected) < 5 * n_std
+
+
+def test_tail_modes():
+
+    rirs = {}
+    for mode in ["independent", "shared", "decorrelated"]:
+
+        # only the ray tracing, in a single band
+        room = pra.ShoeBox(
+            [6.0, 5.0, 3.0],
+            fs=fs,
+            materials=pra.Material(0.2, 0.1),
+            max_order=-1,
+            ray_tracing=True,
+        )
+        room.set_ray_tracing(n_rays=1000)
+        room.add_source([2.0, 3.0, 1.5])
+        room.add_microphone_array(mic_locs)
+
+        room.compute_rir(tail_sequence=mode, rng=np.random.default_rng(2))
+        rirs[mode] = [rir[0] for rir in room.rir]
+
+        # the same generator gives the same responses
+        room.compute_rir(tail_sequence=mode, rng=np.random.default_rng(2))
+        for h1, rir in zip(rirs[mode], room.rir):
+            assert np.array_equal(h1, rir[0])
+
+    # the events of independent sequences are at different times
+    h1, h2 = rirs["independent"]
+    assert not np.array_equal(h1 != 0, h2 != 0)
+
+    # a single sequence is used for all the pairs
+    h1, h2 = rirs["shared"]
+    assert np.count_nonzero(h1) > 0
+    assert np.array_equal(h1, h2)
+
+    # the decorrelated sequences keep the events of the shared sequence
+    # and only flip their signs
+    h1, h2 = rirs["decorrelated"]
+    assert not np.array_equal(h1, h2)
+    for h_shared, h in zip(rirs["shared"], rirs["decorrelated"]):
+        assert np.array_equal(np.abs(h_shared), np.abs(h))
+
+
+def test_invalid_mode():
+    room = pra.ShoeBox([6.0, 5.0, 3.0], fs=fs, ray_tracing=True)
+    room.add_source([2.0, 3.0, 1.5])
+    room.add_microphone_array(mic_locs)
+    try:
+        room.compute_rir(tail_sequence="correlated")
+        assert False, "An unknown tail sequence mode should raise an error"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    test_sequence()
+    test_tail_modes()
+    test_invalid_mode()
@@ -0,0 +1,154 @@
+"""
+Tests that moving or adding microphones and sources after the computation of
+the room impulse responses only updates the impulse responses that depend on
+them, and gives the same responses as a new room.
+"""
+import numpy as np
+import pyroomacoustics as pra
+
+fs = 16000
+room_dim = [6.0, 5.0, 3.0]
+corners = np.array([[0, 0], [6, 0], [6, 5], [0, 5]]).T
+material = pra.Material(0.3)
+sources = [[1.0, 1.0, 1.5], [2.0, 3.0, 1.2]]
+mics = [[4.0, 1.5, 1.2], [4.5, 2.0, 1.7]]
+
+
+def check_same_rirs(room1, room2):
+    assert len(room1.rir) == len(room2.rir)
+    for rir_mic1, rir_mic2 in zip(room1.rir, room2.rir):
+        assert len(rir_mic1) == len(rir_mic2)
+        for h1, h2 in zip(rir_mic1, rir_mic2):
+            assert h1.shape == h2.shape
+            assert np.allclose(h1, h2)
+
+
+def test_move():
+    for polyhedral in [False, True]:
+        if polyhedral:
+            room = pra.Room.from_corners(
+                corners, fs=fs, max_order=3, materials=material
+            )
+            room.extrude(3.0, materials=material)
+        else:
+            room = pra.ShoeBox(room_dim, fs=fs, max_order=6, materials=material)
+        for loc in sources:
+            room.add_source(loc)
+        room.add_microphone_array(np.array(mics).T)
+
+        room.compute_rir()
+        images = room.sources[0].images
+        unchanged = room.rir[0][0]
+
+        room.move_microphone(1, [3.0, 3.0, 1.0])
+        room.compute_rir()
+        new_mics = [mics[0], [3.0, 3.0, 1.0]]
+
+        # only the responses of the microphone that moved are computed
+        assert room.rir[0][0] is unchanged
+        if not polyhedral:
+            assert room.sources[0].images is images
+
+        room.move_source(0, [5.0, 4.0, 2.0])
+        room.compute_rir()
+        new_sources = [[5.0, 4.0, 2.0], sources[1]]
+
+        if polyhedral:
+            expected = pra.Room.from_corners(
+                corners, fs=fs, max_order=3, materials=material
+            )
+            expected.extrude(3.0, materials=material)
+        else:
+            expected = pra.ShoeBox(room_dim, fs=fs, max_order=6, materials=material)
+        for loc in new_sources:
+            expected.add_source(loc)
+        expected.add_microphone_array(np.array(new_mics).T)
+        expected.compute_rir()
+        check_same_rirs(room, expected)
+
+
+def test_move_min_attenuation():
+    # the attenuation of the image sources does not depend on the microphones
+    room = pra.ShoeBox(room_dim, fs=fs, max_order=6, materials=material)
+    room.set_ism_options(min_attenuation=0.4)
+    for loc in sources:
+        room.add_source(loc)
+    room.add_microphone_array(np.array(mics).T)
+    room.compute_rir()
+    images = room.sources[0].images
+    unchanged = room.rir[0][0]
+
+    room.move_microphone(1, [3.0, 3.0, 1.0])
+    room.compute_rir()
+    assert room.rir[0][0] is unchanged
+    assert room.sources[0].images is images
+
+    expected = pra.ShoeBox(room_dim, fs=fs, max_order=6, materials=material)
+    expected.set_ism_options(min_attenuation=0.4)
+    for loc in sources:
+        expected.add_source(loc)
+    expected.add_microphone_array(np.c_[mics[0], [3.0, 3.0, 1.0]])
+    expected.compute_rir()
+    check_same_rirs(room, expected)
+
+
+def test_mutate_and_add():
+    room = pra.ShoeBox(room_dim, fs=fs, max_order=6, materials=material)
+    for loc in sources:
+        room.add_source(loc)
+    room.add_microphone_array(np.array(mics).T)
+    room.compute_rir()
+
+    room.mic_array.R[:, 0] = [1.0, 4.0, 2.0]
+    room.add_source([3.0, 1.0, 1.0])
+    room.add_microphone([2.0, 2.0, 2.0])
+    room.compute_rir()
+
+    expected = pra.ShoeBox(room_dim, fs=fs, max_order=6, materials=material)
+    for loc in sources + [[3.0, 1.0, 1.0]]:
+        expected.add_source(loc)
+    expected.add_microphone_array(np.c_[[1.0, 4.0, 2.0], mics[1], [2.0, 2.0, 2.0]])
+    expected.compute_rir()
+    check_same_rirs(room, expected)
+
+
+def test_simulate_after_move():
+    signals = [np.random.randn(fs // 4) for _ in sources]
+
+    room = pra.ShoeBox(room_dim, fs=fs, max_order=6, materials=material)
+    for loc, signal in zip(sources, signals):
+        room.add_source(loc, signal=signal)
+    room.add_microphone_array(np.array(mics).T)
+    room.simulate()
+
+    room.move_source(1, [5.0, 1.0, 1.0])
+    room.simulate()
+
+    expected = pra.ShoeBox(room_dim, fs=fs, max_order=6, materials=material)
+    for loc, signal in zip([sources[0], [5.0, 1.0, 1.0]], signals):
+        expected.add_source(loc, signal=signal)
+    expected.add_microphone_array(np.array(mics).T)
+    expected.simulate()
+    assert np.allclose(room.mic_array.signals, expected.mic_array.signals)
+
+
+def test_move_errors():
+    room = pra.ShoeBox(room_dim, fs=fs, max_order=6, materials=material)
+    for loc in sources:
+        room.add_source(loc)
+    room.add_microphone_array(np.array(mics).T)
+    for move in [room.move_source, room.move_microphone]:
+        for position in [[7.0, 1.0, 1.0], [1.0, 1.0]]:
+            try:
+                move(0, position)
+                assert False, "Invalid positions should raise an error"
+            except ValueError:
+                pass
+
+
+if __name__ == "__main__":
+    test_move()
+    test_move_min_attenuation()
+    test_mutate_and_add()
+    test_simulate_after_move()
+    test_move_errors()
@@ -0,0 +1,202 @@
+"""
+Tests the pickling of the rooms and walls, and the cloning of rooms.
+"""
+import pickle
+
+import numpy as np
+import pyroomacoustics as pra
+from pyroomacoustics import libroom
+
+fs = 16000
+room_dim = [6.0, 5.0, 3.0]
+corners = np.array([[0, 0], [6, 0], [6, 5], [2, 5], [2, 3], [0, 3]]).T
+source_loc = np.array([1.0, 1.0, 1.5])
+mic_locs = np.c_[[4.0, 1.5, 1.2], [4.5, 2.0, 1.7]]
+material = pra.Material(0.3)
+
+
+def simulate(room):
+    # the diffuse tail of the ray tracing is random
+    room.compute_rir(rng=np.random.default_rng(0))
+
+
+def check_same_rirs(room1, room2):
+    assert len(room1.rir) == len(room2.rir)
+    for rir_mic1, rir_mic2 in zip(room1.rir, room2.rir):
+        assert len(rir_mic1) == len(rir_mic2)
+        for h1, h2 in zip(rir_mic1, rir_mic2):
+            assert h1.shape == h2.shape
+            assert np.allclose(h1, h2)
+
+
+def test_pickle_wall():
+    walls = [
+        libroom.Wall(
+            np.array([[0, 1, 1, 0], [0, 0, 1, 1], [0, 0, 0, 0]], dtype=np.float32),
+            np.array([0.1, 0.2], dtype=np.float32),
+            np.array([0.3, 0.4], dtype=np.float32),
+            "floor",
+        ),
+        libroom.Wall2D(
+            np.array([[0, 1], [0, 0]], dtype=np.float32),
+            np.array([0.5], dtype=np.float32),
+            np.array([0.0], dtype=np.float32),
+            "south",
+        ),
+    ]
+
+    for wall in walls:
+        new_wall = pickle.loads(pickle.dumps(wall))
+        assert type(new_wall) is type(wall)
+        assert new_wall.name == wall.name
+        assert np.array_equal(new_wall.corners, wall.corners)
+        assert np.array_equal(new_wall.absorption, wall.absorption)
+        assert np.array_equal(new_wall.scatter, wall.scatter)
+        assert np.allclose(new_wall.normal, wall.normal)
+
+
+def test_pickle_engine():
+    # a shoebox room with ray tracing, an L shaped room, and a 2D room
+    rooms = [
+        pra.ShoeBox(
+            room_dim,
+            fs=fs,
+            max_order=6,
+            materials=pra.Material("hard_surface"),
+            ray_tracing=True,
+            air_absorption=True,
+        ),
+        pra.Room.from_corners(corners, fs=fs, max_order=3, materials=material),
+        pra.ShoeBox(room_dim[:2], fs=fs, max_order=8, materials=pra.Material(0.2)),
+    ]
+    rooms[0].set_ray_tracing(n_rays=2000)
+    rooms[1].extrude(3.0, materials=material)
+    for room in rooms:
+        room.add_source(source_loc[: room.dim])
+        room.add_microphone_array(mic_locs[: room.dim])
+
+    for room in rooms:
+        room.set_ism_options(n_threads=2, max_time=0.1, min_attenuation=0.01)
+        engine = room.room_engine
+        engine.use_bvh = False
+
+        new_engine = pickle.loads(pickle.dumps(engine))
+
+        assert type(new_engine) is type(engine)
+        assert new_engine.is_shoebox == engine.is_shoebox
+        assert new_engine.obstructing_walls == engine.obstructing_walls
+        for w1, w2 in zip(engine.walls, new_engine.walls):
+            assert w1.name == w2.name
+            assert np.array_equal(w1.corners, w2.corners)
+            assert np.array_equal(w1.absorption, w2.absorption)
+        for m1, m2 in zip(engine.microphones, new_engine.microphones):
+            assert np.array_equal(m1.loc, m2.loc)
+        for name in ["ism_n_threads", "ism_max_dist", "ism_min_attenuation"]:
+            assert getattr(new_engine, name) == getattr(engine, name)
+        assert not new_engine.use_bvh
+
+        # the image sources are the same
+        loc = room.sources[0].position
+        assert engine.image_source_model(loc) == new_engine.image_source_model(loc)
+        assert np.array_equal(engine.sources, new_engine.sources)
+
+
+def test_pickle_room():
+    # a shoebox room with ray tracing, an L shaped room, and a 2D room
+    rooms = [
+        pra.ShoeBox(
+            room_dim,
+            fs=fs,
+            max_order=6,
+            materials=pra.Material("hard_surface"),
+            ray_tracing=True,
+            air_absorption=True,
+        ),
+        pra.Room.from_corners(corners, fs=fs, max_order=3, materials=material),
+        pra.ShoeBox(room_dim[:2], fs=fs, max_order=8, materials=pra.Material(0.2)),
+    ]
+    rooms[0].set_ray_tracing(n_rays=2000)
+    rooms[1].extrude(3.0, materials=material)
+    for room in rooms:
+        room.add_source(source_loc[: room.dim])
+        room.add_microphone_array(mic_locs[: room.dim])
+
+    for room in rooms:
+        new_room = pickle.loads(pickle.dumps(room))
+
+        assert type(new_room) is type(room)
+        assert len(new_room.room_engine.microphones) == room.mic_array.nmic
+
+        simulate(room)
+        simulate(new_room)
+        check_same_rirs(room, new_room)
+
+
+def test_pickle_simulated_room():
+    room = pra.Room.from_corners(corners, fs=fs, max_order=3, materials=material)
+    room.extrude(3.0, materials=material)
+    room.add_source(source_loc)
+    room.add_microphone_array(mic_locs)
+    simulate(room)
+    new_room = pickle.loads(pickle.dumps(room))
+    check_same_rirs(room, new_room)
+
+    # the unpickled room can be simulated again after a move
+    room.move_source(0, [1.5, 1.0, 1.5])
+    new_room.move_source(0, [1.5, 1.0, 1.5])
+    simulate(room)
+    simulate(new_room)
+    check_same_rirs(room, new_room)
+
+
+def test_clone():
+    # a shoebox room with ray tracing, an L shaped room, and a 2D room
+    rooms = [
+        pra.ShoeBox(
+            room_dim,
+            fs=fs,
+            max_order=6,
+            materials=pra.Material("hard_surface"),
+            ray_tracing=True,
+            air_absorption=True,
+        ),
+        pra.Room.from_corners(corners, fs=fs, max_order=3, materials=material),
+        pra.ShoeBox(room_dim[:2], fs=fs, max_order=8, materials=pra.Material(0.2)),
+    ]
+    rooms[0].set_ray_tracing(n_rays=2000)
+    rooms[1].extrude(3.0, materials=material)
+    for room in rooms:
+        room.add_source(source_loc[: room.dim])
+        room.add_microphone_array(mic_locs[: room.dim])
+
+    for room in rooms:
+        simulate(room)
+        rir = room.rir[0][0].copy()
+
+        clone = room.clone()
+        assert clone.walls is room.walls
+        assert clone.rir is None
+        assert clone.room_engine is not room.room_engine
+
+        # the clone gives the same impulse responses
+        simulate(clone)
+        check_same_rirs(room, clone)
+
+        # and is independent of the original
+        new_loc = np.array([2.0, 1.0, 1.0])[: room.dim]
+        clone.move_source(0, new_loc)
+        clone.move_microphone(0, np.array([3.0, 3.0, 1.0])[: room.dim])
+        simulate(clone)
+        assert not np.allclose(room.sources[0].position, new_loc)
+        assert not np.allclose(room.mic_array.R, clone.mic_array.R)
+
+        simulate(room)
+        assert np.allclose(room.rir[0][0], rir)
+
+
+if __name__ == "__main__":
+    test_pickle_wall()
+    test_pickle_engine()
+    test_pickle_room()
+    test_pickle_simulated_room()
+    test_clone()
@@ -0,0 +1,107 @@
+"""
+Tests that a room saved with ``Room.save`` and loaded with ``Room.load`` has
+the same geometry, settings, and simulation results as the original.
+"""
+import os
+import tempfile
+
+import numpy as np
+import pyroomacoustics as pra
+
+fs = 16000
+room_dim = [6.0, 5.0, 3.0]
+corners = np.array([[0, 0], [6, 0], [6, 5], [2, 5], [2, 3], [0, 3]]).T
+source_loc = np.array([1.0, 1.0, 1.5])
+mic_locs = np.c_[[4.0, 1.5, 1.2], [4.5, 2.0, 1.7]]
+material = pra.Material(0.3)
+signal = np.random.default_rng(0).standard_normal(1000)
+
+
+def check_same_rirs(room1, room2):
+    assert len(room1.rir) == len(room2.rir)
+    for rir_mic1, rir_mic2 in zip(room1.rir, room2.rir):
+        assert len(rir_mic1) == len(rir_mic2)
+        for h1, h2 in zip(rir_mic1, rir_mic2):
+            assert h1.shape == h2.shape
+            assert np.allclose(h1, h2)
+
+
+def test_save_load():
+    # a shoebox room with ray tracing, an L shaped room, and a 2D room
+    rooms = [
+        pra.ShoeBox(
+            room_dim,
+            fs=fs,
+            max_order=6,
+            materials=pra.Material("hard_surface"),
+            ray_tracing=True,
+            air_absorption=True,
+        ),
+        pra.Room.from_corners(corners, fs=fs, max_order=3, materials=material),
+        pra.ShoeBox(room_dim[:2], fs=fs, max_order=8, materials=pra.Material(0.2)),
+    ]
+    rooms[0].set_ray_tracing(n_rays=2000)
+    rooms[1].extrude(3.0, materials=material)
+    for room in rooms:
+        room.add_source(source_loc[: room.dim], signal=signal)
+        room.add_microphone_array(mic_locs[: room.dim])
+
+    for room in rooms:
+        room.simulate()
+
+        with tempfile.TemporaryDirectory() as path:
+            room.save(path)
+            assert os.path.exists(os.path.join(path, "manifest.json"))
+
+            for mmap in [True, False]:
+                new_room = pra.Room.load(path, mmap=mmap)
+
+                assert type(new_room) is type(room)
+                assert new_room.simulator_state == room.simulator_state
+                assert new_room.c == room.c
+                assert [w.name for w in new_room.walls] == [w.name for w in room.walls]
+                for w1, w2 in zip(room.walls, new_room.walls):
+                    assert np.array_equal(w1.corners, w2.corners)
+                    assert np.array_equal(w1.absorption, w2.absorption)
+
+                assert isinstance(new_room.rir[0][0], np.memmap) == mmap
+                check_same_rirs(room, new_room)
+                assert np.allclose(room.sources[0].images, new_room.sources[0].images)
+                assert np.allclose(room.mic_array.signals, new_room.mic_array.signals)
+                if room.simulator_state["rt_needed"]:
+                    assert np.allclose(
+                        room.rt_histograms[1][0][0], new_room.rt_histograms[1][0][0]
+                    )
+
+            # the memory mapped results are updated after a move
+            new_room = pra.Room.load(path)
+            loc = np.array([3.0, 3.0, 1.0])[: room.dim]
+            room.move_microphone(0, loc)
+            new_room.move_microphone(0, loc)
+            room.compute_rir(rng=np.random.default_rng(0))
+            new_room.compute_rir(rng=np.random.default_rng(0))
+            check_same_rirs(room, new_room)
+
+            # release the memory maps before the directory is deleted
+            del new_room
+
+
+def test_save_not_simulated():
+    room = pra.Room.from_corners(corners, fs=fs, max_order=3, materials=material)
+    room.extrude(3.0, materials=material)
+    room.add_source(source_loc, signal=signal)
+    room.add_microphone_array(mic_locs)
+
+    with tempfile.TemporaryDirectory() as path:
+        room.save(path)
+        new_room = pra.Room.load(path)
+
+    assert new_room.rir is None
+    room.compute_rir()
+    new_room.compute_rir()
+    check_same_rirs(room, new_room)
+
+
+if __name__ == "__main__":
+    test_save_load()
+    test_save_not_simulated()
@@ -0,0 +1,45 @@
+"""
+Tests that rooms can be simulated concurrently from several threads since
+the room engine releases the GIL.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pyroomacoustics as pra
+
+room_dims = [[4.0 + 0.5 * i, 5.0, 3.0] for i in range(6)]
+
+
+def simulate(room_dim):
+
+    room = pra.ShoeBox(
+        room_dim,
+        fs=16000,
+        materials=pra.Material(energy_absorption=0.3, scattering=0.1),
+        max_order=3,
+    )
+    room.set_ray_tracing(n_rays=2000)
+    room.add_source([1.0, 1.5, 1.2])
+    room.add_microphone_array(np.c_[[2.5, 3.0, 1.5], [2.6, 3.0, 1.5]])
+
+    room.image_source_model()
+    room.ray_tracing()
+
+    return room.sources[0].images, room.rt_histograms
+
+
+def test_thread_pool():
+
+    serial = [simulate(d) for d in room_dims]
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        parallel = list(pool.map(simulate, room_dims))
+
+    for (images_s, hist_s), (images_p, hist_p) in zip(serial, parallel):
+        assert np.array_equal(images_s, images_p)
+        for h_s, h_p in zip(hist_s, hist_p):
+            assert np.array_equal(h_s[0][0], h_p[0][0])
+
+
+if __name__ == "__main__":
+    test_thread_pool()
@@ -0,0 +1,85 @@
+"""
+Tests that the time-bounded image source model of shoebox rooms generates
+exactly the image sources of the full model that are within the distance
+budget of the bounding box of the microphones, in the same order. The same
+holds for the image sources that are not attenuated below the minimum
+attenuation.
+"""
+import numpy as np
+import pyroomacoustics as pra
+
+max_order = 20
+max_time = 0.05
+min_attenuation = 0.5
+
+room_dim = [6.0, 5.0, 3.0]
+source_loc = [2.0, 3.0, 1.5]
+mic_locs = np.c_[[4.0, 1.5, 1.2], [4.5, 2.0, 1.7]]
+material = pra.Material(energy_absorption=0.1, scattering=0.1)
+
+
+def check_subset(room_ref, room, keep):
+
+    s_ref, s = room_ref.sources[0], room.sources[0]
+
+    assert 0 < np.sum(keep) < len(keep)
+    assert np.array_equal(s_ref.images[:, keep], s.images)
+    assert np.array_equal(s_ref.orders[keep], s.orders)
+    assert np.array_equal(s_ref.orders_xyz[:, keep], s.orders_xyz)
+    assert np.array_equal(s_ref.damping[:, keep], s.damping)
+    assert np.array_equal(room_ref.visibility[0][:, keep], room.visibility[0])
+
+
+def test_bounded():
+
+    for dim in [2, 3]:
+
+        # the full model and the time-bounded one
+        rooms = []
+        for ism_options in [{}, {"max_time": max_time}]:
+            room = pra.ShoeBox(
+                room_dim[:dim], fs=16000, materials=material, max_order=max_order
+            )
+            room.set_ism_options(**ism_options)
+            room.add_source(source_loc[:dim])
+            room.add_microphone_array(mic_locs[:dim])
+            room.image_source_model()
+            rooms.append(room)
+        room_ref, room = rooms
+
+        s_ref = room_ref.sources[0]
+
+        # distance from the image sources to the bounding box of the microphones
+        lower = np.min(room_ref.mic_array.R, axis=1, keepdims=True)
+        upper = np.max(room_ref.mic_array.R, axis=1, keepdims=True)
+        gap = np.maximum(0.0, np.maximum(lower - s_ref.images, s_ref.images - upper))
+        keep = np.linalg.norm(gap, axis=0) <= room_ref.c * max_time
+
+        check_subset(room_ref, room, keep)
+
+
+def test_min_attenuation():
+
+    for dim in [2, 3]:
+
+        # the full model and the one bounded by the attenuation
+        rooms = []
+        for ism_options in [{}, {"min_attenuation": min_attenuation}]:
+            room = pra.ShoeBox(
+                room_dim[:dim], fs=16000, materials=material, max_order=max_order
+            )
+            room.set_ism_options(**ism_options)
+            room.add_source(source_loc[:dim])
+            room.add_microphone_array(mic_locs[:dim])
+            room.image_source_model()
+            rooms.append(room)
+        room_ref, room = rooms
+
+        keep = np.max(room_ref.sources[0].damping, axis=0) >= min_attenuation
+
+        check_subset(room_ref, room, keep)
+
+
+if __name__ == "__main__":
+    test_bounded()
+    test_min_attenuation()
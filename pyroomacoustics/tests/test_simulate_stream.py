@@ -0,0 +1,70 @@
+"""
+Tests that the block by block simulation of the microphone signals gives the
+same signals as the simulation of the whole signals at once.
+"""
+import numpy as np
+import pyroomacoustics as pra
+
+fs = 16000
+
+
+rng = np.random.RandomState(0)
+signals = [rng.randn(3 * fs), rng.randn(fs)]
+mic_locs = np.c_[[4.0, 1.5, 1.2], [4.5, 2.0, 1.7]]
+
+
+def test_simulate_stream():
+    room = pra.ShoeBox([6.0, 5.0, 3.0], fs=fs, materials=pra.Material(0.3), max_order=6)
+    room.add_source([1.0, 1.0, 1.5], signal=signals[0])
+    room.add_source([2.0, 3.0, 1.2], signal=signals[1], delay=0.1)
+    room.add_microphone_array(mic_locs)
+    room.simulate()
+    expected = room.mic_array.signals
+
+    for block_size in [None, 1000, 4096]:
+        blocks = list(room.simulate_stream(block_size=block_size))
+
+        if block_size is not None:
+            assert all(b.shape == (2, block_size) for b in blocks[:-1])
+
+        output = np.concatenate(blocks, axis=1)
+        assert output.shape == expected.shape
+        assert np.allclose(output, expected)
+
+
+def test_simulate_stream_noise():
+    room = pra.ShoeBox(
+        [6.0, 5.0, 3.0],
+        fs=fs,
+        materials=pra.Material(0.3),
+        max_order=6,
+        sigma2_awgn=1e-2,
+    )
+    room.add_source([1.0, 1.0, 1.5], signal=signals[0])
+    room.add_source([2.0, 3.0, 1.2], signal=signals[1], delay=0.1)
+    room.add_microphone_array(mic_locs)
+    room.simulate()
+    expected = room.mic_array.signals
+
+    output = np.concatenate(list(room.simulate_stream(block_size=2048)), axis=1)
+
+    # only the noise differs
+    noise = output - expected
+    assert abs(np.var(noise) - 2e-2) < 2e-3
+
+
+def test_simulate_stream_errors():
+    room = pra.ShoeBox([6.0, 5.0, 3.0], fs=fs)
+    room.add_source([1.0, 1.0, 1.5], signal=signals[0])
+    room.add_microphone_array(mic_locs)
+    try:
+        room.simulate_stream(block_size=0)
+        assert False, "A block size of zero should raise an error"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    test_simulate_stream()
+    test_simulate_stream_noise()
+    test_simulate_stream_errors()
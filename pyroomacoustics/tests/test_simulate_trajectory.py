@@ -0,0 +1,107 @@
+"""
+Tests the simulation of moving sources and microphones with image sources
+interpolated between keyframes.
+"""
+import numpy as np
+import pyroomacoustics as pra
+
+fs = 16000
+fdl2 = pra.constants.get("frac_delay_length") // 2
+
+
+rng = np.random.RandomState(0)
+signals = [rng.randn(fs // 2), rng.randn(fs // 4)]
+mic_locs = np.c_[[4.0, 1.5, 1.2], [4.5, 2.0, 1.7]]
+material = pra.Material(0.3)
+
+
+def test_static_keyframes():
+    # without motion, the trajectories give the same signals as simulate
+    corners = np.array([[0, 0], [6, 0], [6, 5], [0, 5]]).T
+    for polyhedral in [False, True]:
+        if polyhedral:
+            room = pra.Room.from_corners(
+                corners, fs=fs, max_order=3, materials=material
+            )
+            room.extrude(3.0, materials=material)
+        else:
+            room = pra.ShoeBox([6.0, 5.0, 3.0], fs=fs, max_order=3, materials=material)
+        room.add_source([1.0, 1.0, 1.5], signal=signals[0])
+        room.add_source([2.0, 3.0, 1.2], signal=signals[1], delay=0.1)
+        room.add_microphone_array(mic_locs)
+
+        room.simulate()
+        expected = room.mic_array.signals.copy()
+
+        room.simulate_trajectory([0.0, 0.2, 0.4])
+        assert room.mic_array.signals.shape == expected.shape
+        assert np.allclose(room.mic_array.signals, expected)
+
+
+def test_moving_source_delay():
+    # a click emitted by a source moving away from the microphone
+    room = pra.ShoeBox([20.0, 5.0, 3.0], fs=fs, max_order=0)
+    signal = np.zeros(fs)
+    emission = 8000
+    signal[emission] = 1.0
+    room.add_source([2.0, 2.5, 1.5], signal=signal)
+    room.add_microphone([1.0, 2.5, 1.5])
+
+    path = np.c_[[2.0, 2.5, 1.5], [18.0, 2.5, 1.5]]
+    room.simulate_trajectory([0.0, 1.0], source_positions=[path])
+
+    # the click is received at n such that n - delay(n) is the emission
+    n = np.arange(room.mic_array.signals.shape[1])
+    dist = 1.0 + 16.0 * np.clip(n / fs, 0.0, 1.0)
+    arrival = np.argmin(np.abs(n - dist / room.c * fs - fdl2 - emission))
+    assert abs(np.argmax(np.abs(room.mic_array.signals[0])) - arrival) <= 1
+
+    # the positions are restored
+    assert np.allclose(room.sources[0].position, [2.0, 2.5, 1.5])
+
+
+def test_moving_microphones_ray_tracing():
+    room = pra.ShoeBox(
+        [6.0, 5.0, 3.0], fs=fs, max_order=3, materials=material, ray_tracing=True
+    )
+    room.set_ray_tracing(n_rays=1000)
+    room.add_source([1.0, 1.0, 1.5], signal=signals[0])
+    room.add_source([2.0, 3.0, 1.2], signal=signals[1], delay=0.1)
+    room.add_microphone_array(mic_locs)
+
+    mics = np.repeat(room.mic_array.R[:, :, None], 3, axis=2)
+    mics[0, :, 2] -= 1.0
+    path = np.c_[[1.0, 1.0, 1.5], [3.0, 2.0, 1.5], [5.0, 4.0, 1.5]]
+    room.simulate_trajectory(
+        [0.0, 0.2, 0.4], source_positions=[path, None], mic_positions=mics
+    )
+
+    assert room.mic_array.signals.shape[0] == 2
+    assert np.all(np.isfinite(room.mic_array.signals))
+    assert np.allclose(room.mic_array.R, mics[:, :, 0])
+
+
+def test_trajectory_errors():
+    room = pra.ShoeBox([6.0, 5.0, 3.0], fs=fs, max_order=3, materials=material)
+    room.add_source([1.0, 1.0, 1.5], signal=signals[0])
+    room.add_source([2.0, 3.0, 1.2], signal=signals[1], delay=0.1)
+    room.add_microphone_array(mic_locs)
+    path = np.c_[[1.0, 1.0, 1.5], [7.0, 1.0, 1.5]]
+
+    for kwargs in [
+        {"times": [0.0, 0.0]},
+        {"times": [0.0, 0.1], "source_positions": [path[:, :1], None]},
+        {"times": [0.0, 0.1], "source_positions": [path, None]},
+    ]:
+        try:
+            room.simulate_trajectory(**kwargs)
+            assert False, "Invalid trajectories should raise an error"
+        except ValueError:
+            pass
+
+
+if __name__ == "__main__":
+    test_static_keyframes()
+    test_moving_source_delay()
+    test_moving_microphones_ray_tracing()
+    test_trajectory_errors()
@@ -0,0 +1,95 @@
+"""
+Tests the storage of the image sources in the room engine. The arrays are
+views of the storage of the engine, which is reused from one run of the image
+source model to the next one.
+"""
+import numpy as np
+import pyroomacoustics as pra
+
+corners = np.array([[0, 0], [6, 0], [6, 5], [3, 5], [3, 2.5], [0, 2.5]]).T
+mic_locs = np.c_[[5.0, 1.0, 1.2], [4.5, 4.0, 1.7]]
+material = pra.Material(0.2)
+
+attributes = [
+    "sources",
+    "orders",
+    "orders_xyz",
+    "attenuations",
+    "gen_walls",
+    "visible_mics",
+]
+
+
+def engine_arrays(engine):
+    return {attr: np.array(getattr(engine, attr)) for attr in attributes}
+
+
+def test_views():
+    room = pra.Room.from_corners(corners, fs=16000, materials=material, max_order=3)
+    room.extrude(3.0, materials=material)
+    room.add_microphone_array(mic_locs)
+    n = room.room_engine.image_source_model(np.array([1.0, 1.0, 1.5]))
+    assert n > 0
+    for attr in attributes:
+        arr = getattr(room.room_engine, attr)
+        assert arr.shape[-1] == n
+        assert not arr.flags["OWNDATA"]
+        assert not arr.flags["WRITEABLE"]
+
+
+def test_reuse():
+
+    sources = [np.array([4.0, 4.0, 2.0]), np.array([1.0, 1.0, 1.5])]
+
+    # the second run finds fewer image sources than the first one
+    room = pra.Room.from_corners(corners, fs=16000, materials=material, max_order=4)
+    room.extrude(3.0, materials=material)
+    room.add_microphone_array(mic_locs)
+    for n_threads in [1, 3]:
+        room.room_engine.ism_n_threads = n_threads
+
+        room.room_engine.image_source_model(sources[0])
+        room.room_engine.image_source_model(sources[1])
+        reused = engine_arrays(room.room_engine)
+
+        fresh_room = pra.Room.from_corners(
+            corners, fs=16000, materials=material, max_order=4
+        )
+        fresh_room.extrude(3.0, materials=material)
+        fresh_room.add_microphone_array(mic_locs)
+        fresh_room.room_engine.image_source_model(sources[1])
+        fresh = engine_arrays(fresh_room.room_engine)
+
+        for attr in attributes:
+            assert np.array_equal(reused[attr], fresh[attr])
+
+
+def test_release():
+    room = pra.Room.from_corners(corners, fs=16000, materials=material, max_order=3)
+    room.extrude(3.0, materials=material)
+    room.add_microphone_array(mic_locs)
+    engine = room.room_engine
+
+    n = engine.image_source_model(np.array([1.0, 1.0, 1.5]))
+    expected = engine_arrays(engine)
+
+    released = engine.release_image_sources()
+    for attr in attributes:
+        arr = released[attr]
+        assert arr.shape[-1] == n
+        assert arr.flags["WRITEABLE"]
+        assert np.array_equal(arr, expected[attr])
+
+    # the engine starts over with an empty storage
+    assert engine.sources.shape[1] == 0
+
+    # and the released arrays are not affected by the next runs
+    engine.image_source_model(np.array([4.0, 4.0, 2.0]))
+    for attr in attributes:
+        assert np.array_equal(released[attr], expected[attr])
+
+
+if __name__ == "__main__":
+    test_views()
+    test_reuse()
+    test_release()
@@ -0,0 +1,56 @@
+"""
+Tests that the receiver index of the ray tracing gives the same histograms as
+testing all the receivers.
+"""
+import numpy as np
+import pyroomacoustics as pra
+
+# an L shaped room and a grid of receivers in both of its arms
+corners = np.array([[0, 0], [6, 0], [6, 5], [2, 5], [2, 3], [0, 3]]).T
+grid = np.meshgrid(np.linspace(0.5, 5.5, 6), np.linspace(0.5, 2.5, 3), [1.0, 2.0])
+mic_locs = np.array([g.ravel() for g in grid])
+
+source_loc = [1.0, 1.0, 1.5]
+
+
+material = pra.Material(energy_absorption=0.2, scattering=0.2)
+
+
+def test_receiver_bvh_shoebox():
+
+    rooms = []
+    for use_bvh in [False, True]:
+        room = pra.ShoeBox([6.0, 5.0, 3.0], fs=16000, materials=material, max_order=1)
+        room.set_ray_tracing(n_rays=2000, receiver_radius=0.3)
+        room.add_source(source_loc)
+        room.add_microphone_array(mic_locs)
+        room.room_engine.use_bvh = use_bvh
+        room.ray_tracing()
+        rooms.append(room)
+
+    for h1_mic, h2_mic in zip(rooms[0].rt_histograms, rooms[1].rt_histograms):
+        assert np.array_equal(h1_mic[0][0], h2_mic[0][0])
+
+
+def test_receiver_bvh_non_convex():
+
+    rooms = []
+    for use_bvh in [False, True]:
+        room = pra.Room.from_corners(
+            corners, fs=16000, materials=material, max_order=1, ray_tracing=True
+        )
+        room.extrude(3.0, materials=material)
+        room.set_ray_tracing(n_rays=2000, receiver_radius=0.3)
+        room.add_source(source_loc)
+        room.add_microphone_array(mic_locs)
+        room.room_engine.use_bvh = use_bvh
+        room.ray_tracing()
+        rooms.append(room)
+
+    for h1_mic, h2_mic in zip(rooms[0].rt_histograms, rooms[1].rt_histograms):
+        assert np.array_equal(h1_mic[0][0], h2_mic[0][0])
+
+
+if __name__ == "__main__":
+    test_receiver_bvh_shoebox()
+    test_receiver_bvh_non_convex()
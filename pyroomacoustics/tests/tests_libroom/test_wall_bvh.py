@@ -0,0 +1,79 @@
+"""
+Tests that the bounding volume hierarchy used for the wall intersection
+queries gives exactly the same results as testing all the walls.
+"""
+import numpy as np
+import pyroomacoustics as pra
+
+# a star shaped room with many walls
+n_corners = 40
+angles = np.arange(n_corners) * 2 * np.pi / n_corners
+radius = np.where(np.arange(n_corners) % 2 == 0, 5.0, 3.5)
+corners = np.array([radius * np.cos(angles), radius * np.sin(angles)]) + 6.0
+
+source_loc = [6.5, 5.5, 1.5]
+mic_locs = np.c_[[4.0, 7.0, 1.2], [8.0, 6.5, 1.7]]
+
+
+# the same room with and without the bounding volume hierarchy
+material = pra.Material(energy_absorption=0.2, scattering=0.1)
+rooms = []
+for use_bvh in [False, True]:
+    room = pra.Room.from_corners(
+        corners, fs=16000, materials=material, max_order=3, ray_tracing=True
+    )
+    room.extrude(3.0, materials=material)
+    room.set_ray_tracing(n_rays=2000, receiver_radius=0.5)
+    room.add_source(source_loc)
+    room.add_microphone_array(mic_locs)
+    room.room_engine.use_bvh = use_bvh
+    rooms.append(room)
+
+
+def test_next_wall_hit():
+
+    np.random.seed(0)
+    for i in range(500):
+        start = np.random.rand(3) * [12.0, 12.0, 3.0]
+        end = np.random.rand(3) * [12.0, 12.0, 3.0]
+        scattered = bool(i % 2)
+
+        r1, r2 = [
+            room.room_engine.next_wall_hit(start, end, scattered) for room in rooms
+        ]
+        assert r1[1] == r2[1]
+        if r1[1] >= 0:
+            # the other outputs are only meaningful when a wall is hit
+            assert r1[2] == r2[2]
+            assert np.array_equal(r1[0], r2[0])
+
+
+def test_contains():
+
+    np.random.seed(1)
+    for i in range(500):
+        p = np.random.rand(3) * [12.0, 12.0, 4.0] - [0.0, 0.0, 0.5]
+        assert rooms[0].room_engine.contains(p) == rooms[1].room_engine.contains(p)
+
+
+def test_image_sources_and_rays():
+
+    for room in rooms:
+        room.image_source_model()
+        room.ray_tracing()
+
+    s1, s2 = [room.sources[0] for room in rooms]
+    assert np.array_equal(s1.images, s2.images)
+    assert np.array_equal(s1.damping, s2.damping)
+    assert np.array_equal(rooms[0].visibility[0], rooms[1].visibility[0])
+
+    # both paths test the same bounding boxes and polygons
+    for h1_mic, h2_mic in zip(rooms[0].rt_histograms, rooms[1].rt_histograms):
+        for h1, h2 in zip(h1_mic[0], h2_mic[0]):
+            assert np.array_equal(h1, h2)
+
+
+if __name__ == "__main__":
+    test_next_wall_hit()
+    test_contains()
+    test_image_sources_and_rays()
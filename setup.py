@@ -49,6 +49,8 @@ libroom_files = [
         "room.cpp",
         "wall.hpp",
         "wall.cpp",
+        "bvh.hpp",
+        "bvh.cpp",
         "microphone.hpp",
         "geometry.hpp",
         "geometry.cpp",
@@ -139,12 +141,23 @@ class BuildExt(build_ext):
             opts.append(cpp_flag(self.compiler))
             if has_flag(self.compiler, "-fvisibility=hidden"):
                 opts.append("-fvisibility=hidden")
+            if has_flag(self.compiler, "-pthread"):
+                opts.append("-pthread")
         elif ct == "msvc":
             opts.append('/DVERSION_INFO=\\"%s\\"' % self.distribution.get_version())
+        # the RIR builder runs in parallel when OpenMP is available
+        openmp_opts = []
+        if ct == "unix" and has_flag(self.compiler, "-fopenmp"):
+            openmp_opts.append("-fopenmp")
+        elif ct == "msvc":
+            openmp_opts.append("/openmp")
         for ext in self.extensions:
             if ext.language == "c++":
                 ext.extra_compile_args += opts
                 ext.extra_link_args += opts
+            if ext.name == "pyroomacoustics.build_rir":
+                ext.extra_compile_args += openmp_opts
+                ext.extra_link_args += [o for o in openmp_opts if ct == "unix"]
         build_ext.build_extensions(self)
 
 